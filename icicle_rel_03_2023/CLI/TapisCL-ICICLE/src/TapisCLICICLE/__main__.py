@@ -1,9 +1,13 @@
-import socket
-import asyncio
-from TapisCLICICLE.client.cli import CLI
+import sys
+from TapisCLICICLE.client import oneShot
 
 
 def client_start():
+    if len(sys.argv) > 1: # scripted one shot commands skip the interactive client when the server is already authenticated
+        exit_status = oneShot.run('127.0.0.1', 30000, sys.argv[1:])
+        if exit_status is not None:
+            sys.exit(exit_status)
+    from TapisCLICICLE.client.cli import CLI
     client_object = CLI('127.0.0.1', 30000)
     client_object.main()
 
@@ -12,4 +16,4 @@ if __name__ == "__main__":
     client_start()
 
 # server = Server(socket.gethostbyname(socket.gethostname()), 30000)
-# asyncio.run(server.main())
\ No newline at end of file
+# asyncio.run(server.main())
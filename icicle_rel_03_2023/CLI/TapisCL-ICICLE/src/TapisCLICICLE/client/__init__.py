@@ -1,4 +0,0 @@
-try:
-    from ..socketopts import schemas
-except:
-    from .. import socketopts
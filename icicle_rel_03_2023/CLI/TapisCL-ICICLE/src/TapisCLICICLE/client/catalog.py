@@ -0,0 +1,29 @@
+"""
+ARGUMENT CATALOG
+The client's disk copy of the server's argument catalog. The parser built from it is shared with the server, which parses batch files
+"""
+import os
+import json
+
+if __name__ != "__main__":
+    from ..utilities import localCache
+    from ..socketopts.argumentParser import argument_default, build_parser
+
+
+def catalog_file() -> str:
+    return os.path.join(localCache.cache_path('catalog'), 'arguments.json')
+
+
+def load_catalog() -> dict:
+    try:
+        with open(catalog_file(), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'hash':None, 'arguments':None}
+
+
+def save_catalog(catalog_hash: str, arguments: dict):
+    temporary_file = f"{catalog_file()}.tmp"
+    with open(temporary_file, 'w') as f:
+        json.dump({'hash':catalog_hash, 'arguments':arguments}, f)
+    os.replace(temporary_file, catalog_file())
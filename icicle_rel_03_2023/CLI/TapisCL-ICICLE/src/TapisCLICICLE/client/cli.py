@@ -7,15 +7,17 @@ import time
 import traceback
 import subprocess
 import pprint
+import typing
+import itertools
 
-import pyfiglet
 from blessed import Terminal
 
 if __name__ != "__main__":
-    from . import handlers
-    from ..socketopts import socketOpts, schemas
+    from . import handlers, catalog
+    from ..socketopts import socketOpts, schemas, transport
+    from ..socketopts.framing import CATALOG_HASH_VERSION
     from ..commands import decorators
-    from ..utilities import killableThread, exceptions
+    from ..utilities import exceptions, localCache
 
 
 __location__ = os.path.realpath(
@@ -43,6 +45,8 @@ class ClientSideConnection(socketOpts.ClientSocketOpts, handlers.Handlers):
 
 class CLI(handlers.Handlers):
     debug=False
+    SERVER_STARTUP_TIMEOUT = 30 # seconds to wait for a newly started server to report it is listening
+    PIPELINE_DEPTH = 32 # most pipelined commands in flight at once, so neither end's socket buffers fill up
     """
     Receive user input, either direct from bash environment or from the custom interface, then parse these commands and send them to the server to be executed. 
     """
@@ -52,10 +56,12 @@ class CLI(handlers.Handlers):
         self.term = Terminal()
         print(f"{self.term.color_rgb(0, 0, 255)}{ENTRANCE_MESSAGE}{self.term.normal}")
         self.ip, self.port = IP, PORT
-        self.connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM) 
+        self.connection = None
+        self.request_counter = itertools.count()
 
         # set up argparse
         self.parser = None
+        self.one_shot = len(sys.argv) > 1 # a one shot command only needs the arguments it was given
 
         setup_message = schemas.ResponseData(request_content={'setup_success':True})
         try:
@@ -63,7 +69,7 @@ class CLI(handlers.Handlers):
             self.connection.send(setup_message)
         except ConnectionAbortedError:
             print("Server timed out during authentication. Try again")
-            sys.exit(0)
+            sys.exit(1)
         except (KeyboardInterrupt, Exception) as e:
             error_str = traceback.format_exc()
             if self.debug:
@@ -72,7 +78,7 @@ class CLI(handlers.Handlers):
             setup_message.error = str(e)
             setup_message.request_content['setup_success'] = False
             self.connection.send(setup_message)
-            sys.exit(0)
+            sys.exit(1)
 
         self.pwd = ""
         self.current_system = ""
@@ -80,68 +86,71 @@ class CLI(handlers.Handlers):
     def parser_error(self, args):
         print(f"Ignoring unrecognized arguments: {args}")
     
-    def configure_parser(self, arguments):
-        parser = argparse.ArgumentParser(description="Command Line Argument Parser", exit_on_error=False, usage=argparse.SUPPRESS, add_help=False, conflict_handler='resolve')
-        parser.add_argument('command_selection')
-        parser.add_argument('positionals', nargs='*')
-        parser.error = self.parser_error
-        
-        for arg_name, arg in arguments.items():
-            if (arg['action'] == 'store_true' and arg['arg_type'] == 'standard') or (arg['arg_type'] == 'form' and arg['flattening_type'] == 'FLATTEN'):
-                default = False
-            elif (arg['action'] == 'store_false' and arg['arg_type'] == 'standard') or (arg['arg_type'] != 'standard' and arg['required']):
-                default = True
-            else:
-                default = None
-            parser.add_argument(f"-{arg['truncated_arg']}", arg['full_arg'],
-                                action=arg['action'], default=default)
-        return parser
-
-    def initialize_server(self): 
+    def configure_parser(self, arguments, only: list[str] | None = None):
+        return catalog.build_parser(arguments, self.parser_error, only=only)
+
+    def receive_catalog(self, catalog_hash: str) -> dict:
         """
-        detect client operating system. The local server intitialization is different between unix and windows based systems
+        the argument catalog is cached on disk under its hash, and the server only sends it when the hashes differ. Servers from before
+        CATALOG_HASH_VERSION always send it
         """
-        if 'win' in sys.platform:
-            os.system(rf"pythonw {server_path} 1>stdout.txt 2>stderr.txt")
-        elif 'darwin' in sys.platform:
-            subprocess.Popen(['python3', server_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True, preexec_fn=os.setsid)
-        else: # unix based
-            subprocess.Popen(['nohup', 'python3', server_path, '&'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        cached_catalog = catalog.load_catalog()
+        if self.connection.protocol_version >= CATALOG_HASH_VERSION:
+            self.connection.send(schemas.ResponseData(request_content={'catalog_hash':cached_catalog['hash']}))
+            if cached_catalog['hash'] == catalog_hash:
+                return cached_catalog['arguments']
+        arguments: schemas.ResponseData = self.connection.receive()
+        catalog.save_catalog(catalog_hash, arguments.request_content)
+        return arguments.request_content
+
+    def initialize_server(self) -> int | None:
+        """
+        start the background server detached from this terminal. On unix the server inherits the write end of a pipe and signals it once
+        listening, the read end is returned to wait on
+        """
+        output = open(os.path.join(localCache.cache_path('logs'), 'server_output.log'), 'a')
+        if sys.platform == 'win32':
+            subprocess.Popen(['pythonw', server_path], stdout=output, stderr=output,
+                             creationflags=subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP)
+            output.close()
+            return None
+        ready_read, ready_write = os.pipe()
+        environment = dict(os.environ, **{transport.READY_FD_VARIABLE:str(ready_write)})
+        subprocess.Popen([sys.executable, server_path], stdout=output, stderr=output, stdin=subprocess.DEVNULL,
+                         pass_fds=(ready_write,), env=environment, start_new_session=True)
+        os.close(ready_write)
+        output.close()
+        return ready_read
 
     #@decorators.AnimatedLoading
     def connection_initialization(self):
         """
-        start the local server through the client
+        connect to the local server, starting it first if it isnt running
         """
-        startup_flag = False
-        timeout_time = time.time() + 30 # server setup timeout. If expires, there is a problem!
-        while True:
-            if time.time() > timeout_time: # connection timeout condition
+        try:
+            connection = transport.connect(self.ip, self.port) # server already running, nothing to spawn
+        except OSError:
+            spawned_at = time.time()
+            ready_fd = self.initialize_server()
+            if not transport.wait_for_ready(ready_fd, self.SERVER_STARTUP_TIMEOUT, since=spawned_at):
                 sys.stdout.write("\r[-] Connection timeout")
-                sys.exit(0)
-            try:
-                self.connection.connect((self.ip, self.port)) 
-                self.connection = ClientSideConnection(self.connection, debug=self.debug)
-                if startup_flag:
-                    startup.kill()
-                break
-            except Exception as e:
-                if not startup_flag:
-                    startup = killableThread.KillableThread(target=self.initialize_server, daemon=True) # run the server setup on a separate thread
-                    startup.start() 
-                    startup_flag = True # set the flag to true so the thread runs only once
-                    continue
+                sys.exit(1)
+            connection = transport.connect(self.ip, self.port)
+        self.connection = ClientSideConnection(connection, debug=self.debug)
+        self.connection.negotiate_framing()
 
     def auth(self):
         while True:
             server_auth_request: schemas.AuthRequest = self.connection.receive()
             if not server_auth_request.message and not server_auth_request.request_content:
                 self.print_response(server_auth_request.error)
-                sys.exit(0)
+                sys.exit(1)
             elif server_auth_request.auth_request_type == "success":
                 self.print_response(server_auth_request.message)
                 return server_auth_request.message['username'], server_auth_request.message['url']
             form_response = self.universal_message_handler(server_auth_request, self.term)
+            if server_auth_request.auth_request_type == "device_code" and not server_auth_request.request_content:
+                continue # the server polls for the token itself and sends success once the code is entered
             if not form_response:
                 break
             client_response_request = schemas.AuthRequest(auth_request_type=server_auth_request.auth_request_type, request_content=form_response)
@@ -158,8 +167,8 @@ class CLI(handlers.Handlers):
             username, url = self.auth()
         else:
             username, url = connection_info.username, connection_info.url
-        arguments: schemas.ResponseData = self.connection.receive()
-        self.parser = self.configure_parser(arguments.request_content)
+        arguments = self.receive_catalog(connection_info.catalog_hash)
+        self.parser = self.configure_parser(arguments, only=sys.argv[1:] if self.one_shot else None)
 
         return username, url # return the username and url
 
@@ -170,6 +179,15 @@ class CLI(handlers.Handlers):
         self.connection.send(command_request)
         while True:
             command_response = self.connection.receive()
+            if command_response.schema_type == 'StreamData':
+                self.print_rows(command_response.rows)
+                continue
+            if command_response.schema_type == 'BatchItem':
+                self.print_batch_item(command_response.index, command_response.message, command_response.error)
+                continue
+            if command_response.schema_type == 'ProgressData':
+                self.print_progress(command_response.label, command_response.transferred, command_response.total)
+                continue
             if isinstance(command_response, schemas.ResponseData):
                 self.url, self.username = command_response.url, command_response.active_username
                 self.pwd, self.current_system = command_response.pwd, command_response.system
@@ -177,15 +195,80 @@ class CLI(handlers.Handlers):
                     raise exceptions.Shutdown()
             handled_response = self.universal_message_handler(command_response, self.term)
             if not handled_response:
-                break
+                return command_response
             handled_response = schemas.FormResponse(request_content=handled_response)
             self.connection.send(handled_response)
 
+    def submit_many(self, commands: list[dict]) -> list[schemas.ResponseData]:
+        """
+        send several commands without waiting for each response. The server runs them concurrently and answers in any order. Responses are
+        matched up by request id and returned in the order the commands were given, and forms are filled in as they arrive
+        """
+        request_ids = [str(next(self.request_counter)) for _ in commands]
+        positions = {request_id:index for index, request_id in enumerate(request_ids)}
+        responses: list[schemas.ResponseData] = [None] * len(commands)
+        streamed_rows: dict[str, list] = dict()
+        sent = received = 0
+        while received < len(commands):
+            while sent < len(commands) and sent - received < self.PIPELINE_DEPTH:
+                self.connection.send(schemas.CommandData(request_content=commands[sent], request_id=request_ids[sent]))
+                sent += 1
+            response = self.connection.receive()
+            if response.schema_type == 'StreamData': # responses are returned whole, so collect the rows of streamed results
+                streamed_rows.setdefault(response.request_id, []).extend(response.rows)
+                continue
+            if response.schema_type == 'BatchItem':
+                self.print_batch_item(response.index, response.message, response.error)
+                continue
+            if response.schema_type == 'ProgressData': # several transfers would redraw the same line, so only their results print
+                continue
+            if response.schema_type == 'ResponseData':
+                if response.exit_status:
+                    raise exceptions.Shutdown()
+                if response.request_id in streamed_rows:
+                    response.message = {"message":streamed_rows.pop(response.request_id)}
+                self.url, self.username = response.url, response.active_username
+                self.pwd, self.current_system = response.pwd, response.system
+                responses[positions[response.request_id]] = response
+                received += 1
+                continue
+            filled_form = self.universal_message_handler(response, self.term)
+            if filled_form:
+                self.connection.send(schemas.FormResponse(request_content=filled_form, request_id=response.request_id))
+        return responses
+
+    def submit_batch(self, commands: list[dict], concurrency: int | None = None, on_item: typing.Callable | None = None) -> tuple[list[schemas.BatchItem], dict]:
+        """
+        run a list of commands in one request. The server runs up to concurrency of them at once and streams each result back as it finishes,
+        on_item is called with each as it arrives. Returns the results in the order of commands, and the server's summary
+        """
+        self.connection.send(schemas.BatchData(request_content={'commands':commands, 'concurrency':concurrency}))
+        items: list[schemas.BatchItem] = [None] * len(commands)
+        while True:
+            response = self.connection.receive()
+            if response.schema_type == 'BatchItem':
+                items[response.index] = response
+                if on_item:
+                    on_item(response)
+                continue
+            if response.schema_type == 'ProgressData':
+                continue
+            if response.exit_status:
+                raise exceptions.Shutdown()
+            if response.error:
+                raise RuntimeError(response.error)
+            return items, response.message['message']
+
     def terminal_cli(self):
+        """
+        run the command given on the command line and exit, with status 1 if it failed or the server was lost along the way
+        """
+        exit_status = 1
         try:
             kwargs = self.parser.parse_args()
             kwargs = vars(kwargs)
-            self.interface(kwargs)
+            response = self.interface(kwargs)
+            exit_status = 1 if response is not None and response.error else 0
             kwargs = vars(self.parser.parse_args(['exit']))
             response_message = schemas.CommandData(request_content=kwargs)
             self.connection.send(response_message)
@@ -195,12 +278,15 @@ class CLI(handlers.Handlers):
             #if self.debug:
             print(error_str)
             print(e)
-            error_message = schemas.ResponseData(error=str(e))
-            self.connection.send(error_message)
+            try:
+                self.connection.send(schemas.ResponseData(error=str(e)))
+            except OSError: # the server is already gone
+                pass
         finally:
-            sys.exit(0)
+            sys.exit(exit_status)
 
     def cli_window(self):
+        import pyfiglet # only the interactive window prints the banner
         title = pyfiglet.figlet_format("-----------\nTapisCLICICLE\n-----------", font="slant") # print the title when CLI is accessed
         print(title)
         print(r"""Enter 'exit' to exit the client
@@ -209,8 +295,11 @@ class CLI(handlers.Handlers):
         while True:
             try:
                 time.sleep(0.01)
-                kwargs: dict = vars(self.parser.parse_args(str(input(f"[{self.username}@{self.url}][{self.current_system}]{self.pwd} ")).split(" ")))
-                self.interface(kwargs)
+                command_line = str(input(f"[{self.username}@{self.url}][{self.current_system}]{self.pwd} "))
+                commands = [command.strip() for command in command_line.split(';') if command.strip()] if ';' in command_line else [command_line]
+                for command in commands: # commands separated by semicolons run one after another, as in a shell
+                    kwargs: dict = vars(self.parser.parse_args(command.split(" ")))
+                    self.interface(kwargs)
             except KeyboardInterrupt:
                 continue
             except exceptions.Shutdown:
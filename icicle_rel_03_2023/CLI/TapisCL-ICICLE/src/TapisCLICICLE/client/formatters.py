@@ -0,0 +1,53 @@
+"""
+FORMATTERS
+Printing of server responses, kept apart from the interactive handlers so the one shot client can print without loading prompt_toolkit
+"""
+
+
+class Formatters:
+    """
+    Format received dictionaries in the client code
+    """
+    def print_response(self, input_data, depth: int=0):
+        if isinstance(input_data, (list, set, tuple)):
+            for data in input_data:
+                if isinstance(data, (list, dict, set, tuple)):
+                    print("\n")
+                self.print_response(data, depth=depth+1)
+        elif isinstance(input_data, dict):
+            for name, data in input_data.items():
+                if isinstance(data, (int, str)):
+                    print(("  " * depth) + f"{name}: {data}")
+                    continue
+                print(("  " * depth) + f"{name}: ")
+                self.print_response(data, depth=depth+1)
+        elif isinstance(input_data, (int, str)):
+            print(f"{depth * '  '}{input_data}")
+        if depth == 0:
+            print("\n")
+
+    def print_rows(self, rows: list):
+        """
+        print rows of a streamed result as they arrive, laid out the same as the rows of a list result
+        """
+        for row in rows:
+            if isinstance(row, (list, dict, set, tuple)):
+                print("\n")
+            self.print_response(row, depth=1)
+
+    def print_progress(self, label: str, transferred: int, total: int | None):
+        """
+        a transfer's progress, redrawn in place on one line until it completes
+        """
+        if total:
+            line = f"{label}: {transferred / 2**20:.1f} / {total / 2**20:.1f} MiB ({transferred * 100 // total}%)"
+        else:
+            line = f"{label}: {transferred / 2**20:.1f} MiB"
+        print(f"\r{line}", end='\n' if total is not None and transferred >= total else '', flush=True)
+
+    def print_batch_item(self, index: int, message: dict, error: str):
+        """
+        a batch streams results in the order commands finish, so each is labelled with the command's line in the batch
+        """
+        print(f"[{index}] {'FAILED' if error else 'OK'}")
+        self.print_response(error if error else message)
@@ -14,6 +14,7 @@ from blessed import Terminal
 
 if __name__ != "__main__":
     from ..socketopts import schemas
+    from .formatters import Formatters
 
 
 __location__ = os.path.realpath(
@@ -21,29 +22,6 @@ __location__ = os.path.realpath(
 saved_command = os.path.join(__location__, r'entered_command.json')
 
 
-class Formatters:
-    """
-    Format received dictionaries in the client code
-    """
-    def print_response(self, input_data, depth: int=0):
-        if isinstance(input_data, (list, set, tuple)):
-            for data in input_data:
-                if isinstance(data, (list, dict, set, tuple)):
-                    print("\n")
-                self.print_response(data, depth=depth+1)
-        elif isinstance(input_data, dict):
-            for name, data in input_data.items():
-                if isinstance(data, (int, str)):
-                    print(("  " * depth) + f"{name}: {data}")
-                    continue
-                print(("  " * depth) + f"{name}: ")
-                self.print_response(data, depth=depth+1)
-        elif isinstance(input_data, (int, str)):
-            print(f"{depth * '  '}{input_data}")
-        if depth == 0:
-            print("\n")
-
-
 class ParserTypeLenEnforcer:
     def __init__(self, name: str=str(), size: tuple=(0, 0), data_type: str='string', choices: list=list()):
         self.arg_name = name
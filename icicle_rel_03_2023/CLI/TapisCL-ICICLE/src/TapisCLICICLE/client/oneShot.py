@@ -0,0 +1,92 @@
+"""
+ONE SHOT
+Runs a single command against an already authenticated server in one request and response, for scripts calling the CLI in a loop.
+Only the standard library is loaded up front. The interactive handlers are imported only if the command asks for form input
+"""
+import json
+import socket
+
+if __name__ != "__main__":
+    from . import catalog
+    from .formatters import Formatters
+    from ..socketopts import transport
+    from ..socketopts.framing import FRAME_HEADER, ONE_SHOT_PREAMBLE
+
+
+def recv_exactly(connection: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = connection.recv_into(view[received:])
+        if not count:
+            raise ConnectionResetError("Server closed the connection")
+        received += count
+    return bytes(buffer)
+
+
+def send_frame(connection: socket.socket, data: dict, preamble: bytes = b''):
+    payload = json.dumps(data).encode()
+    connection.sendall(preamble + FRAME_HEADER.pack(len(payload)) + payload)
+
+
+def receive_frame(connection: socket.socket) -> dict:
+    size, = FRAME_HEADER.unpack(recv_exactly(connection, FRAME_HEADER.size))
+    return json.loads(recv_exactly(connection, size))
+
+
+def fill_form(request: dict) -> dict:
+    """
+    the rare one shot command that needs input gets the full interactive handlers
+    """
+    from blessed import Terminal
+    from .handlers import Handlers
+    from ..socketopts.socketOpts import schema_types
+    message = schema_types[request['schema_type']].construct(**request)
+    return Handlers().universal_message_handler(message, Terminal())
+
+
+def run(ip: str, port: int, argv: list[str]) -> int | None:
+    """
+    returns the exit status, or None when the full client is needed instead: no cached catalog, no running server, the server isnt
+    authenticated, or the catalog changed. Losing the server part way through, or a truncated frame, is a failure like any command error
+    """
+    cached_catalog = catalog.load_catalog()
+    if not cached_catalog['arguments']:
+        return None
+    parser = catalog.build_parser(cached_catalog['arguments'], lambda args: print(f"Ignoring unrecognized arguments: {args}"), only=argv)
+    kwargs = vars(parser.parse_args(argv))
+    try:
+        connection = transport.connect(ip, port)
+    except OSError:
+        return None
+    formatter = Formatters()
+    try:
+        with connection:
+            send_frame(connection, {'schema_type':'CommandData', 'request_content':kwargs, 'catalog_hash':cached_catalog['hash']}, preamble=ONE_SHOT_PREAMBLE)
+            while True:
+                response = receive_frame(connection)
+                if response['schema_type'] == 'StreamData':
+                    formatter.print_rows(response['rows'])
+                    continue
+                if response['schema_type'] == 'ProgressData':
+                    formatter.print_progress(response['label'], response['transferred'], response['total'])
+                    continue
+                if response['schema_type'] == 'BatchItem':
+                    formatter.print_batch_item(response['index'], response['message'], response['error'])
+                    continue
+                if response.get('request_content') and response['schema_type'] != 'ResponseData':
+                    send_frame(connection, {'schema_type':'FormResponse', 'request_content':fill_form(response)})
+                    continue
+                break
+    except (OSError, ValueError) as e: # the server went away mid request, or sent a frame that doesnt parse
+        formatter.print_response(f"Lost the server mid command: {e}")
+        return 1
+    if response.get('request_content', {}).get('one_shot_available') is False:
+        return None
+    if response.get('message'):
+        formatter.print_response(response['message'])
+    if response.get('error'):
+        formatter.print_response(response['error'])
+        return 1
+    return 0
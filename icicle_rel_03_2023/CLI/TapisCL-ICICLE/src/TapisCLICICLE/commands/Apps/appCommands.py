@@ -53,6 +53,7 @@ class update_app(create_app):
     """
     @help: update app with the select attributes
     """
+    invalidates = ['get_app']
     updateable_form_retriever = AppUpdatingRetriever()
     supports_config_file = True
     required_arguments = [
@@ -156,14 +157,17 @@ class get_apps(baseCommand.BaseCommand):
             'ALL'
         ])
     ]
+    paginated = True
     async def run(self, *args, **kwargs):
-        return self.t.apps.getApps(**kwargs)
+        async for app in self.paginate(self.t.apps.getApps, kwargs, listType=kwargs.get('listType', None)): # apps share ids across versions, so they are paged by skip
+            yield app
     
 
 class get_app(baseCommand.BaseCommand):
     """
     @help: get a specific app
     """
+    cache_ttl = 30
     return_fields = ['id', 'version', 'containerImage']
     required_arguments = [
         Argument('appId', size_limit=(1, 80), positional=True),
@@ -191,6 +195,7 @@ class enable_app(is_app_enabled):
     """
     @help: enable the app
     """
+    invalidates = ['get_app']
     async def run(self, *args, **kwargs):
         return self.t.apps.enableApp(**kwargs)
     
@@ -199,6 +204,7 @@ class disable_app(is_app_enabled):
     """
     @help: disable the app
     """
+    invalidates = ['get_app']
     async def run(self, *args, **kwargs):
         return self.t.apps.disableApp(**kwargs)
     
@@ -207,6 +213,7 @@ class delete_app(baseCommand.BaseCommand):
     """
     @help: delete the app
     """
+    invalidates = ['get_app']
     required_arguments = [
         Argument('appId', size_limit=(1, 80), positional=True),
         Argument('confirm', arg_type='confirmation')
@@ -219,6 +226,7 @@ class undelete_app(is_app_enabled):
     """
     @help: undo a deletion of an app
     """
+    invalidates = ['get_app']
     async def run(self, *args, **kwargs):
         return self.t.apps.undeleteApp(**kwargs)
     
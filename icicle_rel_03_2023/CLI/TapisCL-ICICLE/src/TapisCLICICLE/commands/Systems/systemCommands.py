@@ -58,16 +58,17 @@ class get_systems(baseCommand.BaseCommand):
     optional_arguments = [
         Argument('listType', choices=['OWNED', 'SHARED_PUBLIC', 'ALL'])
     ]
+    paginated = True
     async def run(self, *args, **kwargs):
-        pprint.pprint(kwargs)
-        systems = self.t.systems.getSystems(**kwargs)
-        return systems
+        async for system in self.paginate(self.t.systems.getSystems, kwargs, cursor='startAfter', listType=kwargs.get('listType', None)):
+            yield system
     
 
 class get_system(baseCommand.BaseCommand):
     """
     @help: get information on a selected system
     """
+    cache_ttl = 30
     return_fields = ['id', 'systemType', 'host', 'enabled']
     command_opt = [commandOpts.CHECK_EXPLICIT_ID('systemId')]
     required_arguments=[
@@ -230,6 +231,7 @@ class create_system(baseCommand.BaseCommand, SystemAuth):
     this command will automatically create and upload the ssh keys
     """
     supports_config_file=True
+    run_in_executor=False # system auth prompts the client for credentials
     required_arguments=[
         Argument('id', size_limit=(1, 80), positional=True),
         Argument('systemType', choices=["LINUX", "S3", "IRODS", "GLOBUS"], description=
@@ -338,6 +340,7 @@ class update_system(baseCommand.BaseCommand):
     """
     @help: update a system with new information
     """
+    invalidates = ['get_system']
     updateable_form_retriever = SystemUpdatingRetriever()
     command_opt = [commandOpts.CHECK_EXPLICIT_ID('systemId')]
     required_arguments=[
@@ -417,6 +420,7 @@ class enable_system(is_system_enabled):
     """
     @help: enable a system
     """
+    invalidates = ['get_system']
     async def run(self, *args, **kwargs):
         return self.t.systems.enableSystem(**kwargs)
     
@@ -425,6 +429,7 @@ class disable_system(is_system_enabled):
     """
     @help: disable a system
     """
+    invalidates = ['get_system']
     async def run(self, *args, **kwargs):
         return self.t.systems.disableSystem(**kwargs)
     
@@ -433,6 +438,7 @@ class delete_system(baseCommand.BaseCommand):
     """
     @help: delete the selected system
     """
+    invalidates = ['get_system']
     command_opt = [commandOpts.CHECK_EXPLICIT_ID('systemId')]
     required_arguments=[
         Argument('systemId', size_limit=(1, 80), positional=True),
@@ -449,6 +455,7 @@ class undelete_system(baseCommand.BaseCommand):
     """
     @help: undo deletion
     """
+    invalidates = ['get_system']
     required_arguments=[
         Argument('systemId', size_limit=(1, 80), positional=True),
     ]
@@ -75,7 +75,7 @@ class Validators:
         self.check_size_limit_followed(value)
         if self.choices and value not in self.choices:
             raise ValueError(f"The value for argument {self.argument} must be in the list {self.choices}")
-        if self.arg_type != 'bool' and isinstance(value, bool):
+        if isinstance(value, bool) and not (self.data_type == 'bool' and value): # unset flags are dropped, but a set store_true flag is kept
             return None
         return value
     
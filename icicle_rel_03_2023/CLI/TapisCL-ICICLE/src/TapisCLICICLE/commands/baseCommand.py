@@ -3,6 +3,8 @@ import inspect
 import abc
 import ast
 import json
+import asyncio
+from concurrent.futures import Executor
 from typing import Type
 import typing
 from abc import abstractmethod, ABC
@@ -11,7 +13,7 @@ from pprint import pprint, pformat
 from datetime import datetime
 
 # I finally understand. Imported at the top level by serverRun, so it can only see packages from that vantage point
-from utilities import exceptions
+from utilities import exceptions, executionContext
 from commands.arguments.argument import Argument, ALLOWED_ARG_TYPES
 from socketopts import schemas
 from commands import dataFormatters
@@ -58,8 +60,8 @@ class CommandMetaClass(abc.ABCMeta):
     def __check_run(self, name, attrs):
         if 'run' not in list(attrs.keys()):
             raise AttributeError(f"The command {name} requires a 'run()' method")
-        elif not inspect.iscoroutinefunction(attrs['run']):
-            raise AttributeError(f"The run method of the command {name} must be a coroutine")
+        elif not inspect.iscoroutinefunction(attrs['run']) and not inspect.isasyncgenfunction(attrs['run']):
+            raise AttributeError(f"The run method of the command {name} must be a coroutine, or an async generator for commands that stream their results")
     
     def __check_command_args(self, name, attrs):
         run_params = get_args(attrs['run'])
@@ -88,10 +90,78 @@ class UpdatableFormRetriever(abc.ABC):
         pass
 
 
+class Paginator:
+    """
+    walks a paged Tapis listing, so nothing is cut off at the service's default page size. While the rows of one page are consumed, the
+    next page is already being fetched on pool, the server's prefetch pool. Without a pool each page is fetched once the last is used up.
+    cursor is how the listing is paged: 'skip' and 'offset' count the rows already read, 'startAfter' continues after the order_by value
+    of the last row read
+    """
+    PAGE_SIZE = 100
+    DEFAULT_LIMIT = 100 # rows returned when neither --limit nor --all is given
+    prefetch = True
+    def __init__(self, fetch: typing.Callable, cursor: typing.Literal['skip', 'offset', 'startAfter'] = 'skip', limit: int | None = None,
+                 page_size: int | None = None, order_by: str = 'id', pool: Executor | None = None, **query):
+        self.fetch = fetch
+        self.pool = pool
+        self.cursor = cursor
+        self.limit = limit
+        self.page_size = page_size or self.PAGE_SIZE
+        self.order_by = order_by
+        self.query = {name:value for name, value in query.items() if value is not None}
+        self.more_available = False # the listing stopped at the limit with a full page, so there are probably more rows
+
+    def page_arguments(self, position: int, last_row, size: int) -> dict:
+        arguments = dict(self.query, limit=size)
+        if self.cursor == 'startAfter':
+            arguments['orderBy'] = self.order_by
+            if last_row is not None:
+                arguments['startAfter'] = getattr(last_row, self.order_by)
+        else:
+            arguments[self.cursor] = position
+        return arguments
+
+    def fetch_page(self, position: int, last_row, size: int):
+        arguments = self.page_arguments(position, last_row, size)
+        if self.prefetch and self.pool is not None:
+            return asyncio.wrap_future(self.pool.submit(self.fetch, **arguments))
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(self.fetch(**arguments))
+        return future
+
+    async def __aiter__(self):
+        remaining = self.limit
+        position = 0
+        size = min(self.page_size, remaining) if remaining is not None else self.page_size
+        page = self.fetch_page(position, None, size)
+        try:
+            while page is not None:
+                rows = list(await page)
+                position += len(rows)
+                if remaining is not None:
+                    remaining -= len(rows)
+                full_page = len(rows) == size
+                page = None
+                if full_page and remaining != 0:
+                    size = min(self.page_size, remaining) if remaining is not None else self.page_size
+                    page = self.fetch_page(position, rows[-1], size) # fetched while this page's rows are consumed
+                self.more_available = full_page and remaining == 0
+                for row in rows:
+                    yield row
+        finally:
+            if page is not None:
+                page.cancel()
+
+
 class BaseCommand(ABC, HelpStringRetriever, metaclass=CommandMetaClass):
     return_fields: list = []
     command_opt: list = None
     supports_config_file: bool = False
+    paginated: bool = False # run() lists a paged Tapis collection through paginate(), and takes the --limit and --all arguments
+    run_in_executor: bool = True # run() makes blocking tapipy calls, so it runs on the command executor. Set False if run() talks to the connection
+    timeout: float | None = None # seconds before the command is abandoned. None uses the executor default
+    cache_ttl: float | None = None # seconds a result of this read-only command is reused for the same tenant, user and arguments. Takes --no-cache
+    invalidates: list[str] = [] # cached commands whose results this command changes, e.g. delete_pod invalidates get_pod
     required_arguments: list[Argument] | dict = list()
     optional_arguments: list[Argument] | dict = list()
     default_arguments = [Argument('connection', arg_type='silent'),
@@ -100,15 +170,23 @@ class BaseCommand(ABC, HelpStringRetriever, metaclass=CommandMetaClass):
                             Argument('positionals', arg_type='silent')]
     updateable_form_retriever: UpdatableFormRetriever = None
     def __init__(self):
-        self.t = None
-        self.username = None
-        self.password = None
+        self.session_t = None
+        self.session_username = None
+        self.session_password = None
         self.server = None
+        self.streaming = inspect.isasyncgenfunction(self.run) # run() yields result rows, which are sent to the client as they are produced
         self.arguments = dict()
         self.return_formatter: dataFormatters.BaseDataFormatter = dataFormatters.BaseDataFormatter(self.return_fields)
         self.required_arguments += self.default_arguments
         if self.supports_config_file:
             self.optional_arguments.append(Argument('file'))
+        if self.paginated:
+            self.optional_arguments = list(self.optional_arguments) + [Argument('limit', data_type='int'), 
+                                                                       Argument('all', action='store_true', mutually_exclusive_with='limit', description='list every result')]
+        if self.cache_ttl:
+            no_cache = Argument('no_cache', action='store_true', description='ignore cached results and ask Tapis again')
+            no_cache.full_arg = '--no-cache'
+            self.optional_arguments = list(self.optional_arguments) + [no_cache]
         if self.required_arguments:
             for argument in self.required_arguments:
                 argument.is_required(True)
@@ -177,7 +255,8 @@ class BaseCommand(ABC, HelpStringRetriever, metaclass=CommandMetaClass):
         """
         existing_values = dict() # If it aint broke, dont fix it. This code sucks but I cant meet the deadline if I try fixing this abomination
         if self.updateable_form_retriever:
-            existing_values = self.return_formatter.obj_to_dict(self.updateable_form_retriever(self.t, **kwargs))
+            existing_values = await self.server.command_executor.run_blocking(self.updateable_form_retriever, self.t, timeout=self.timeout, **kwargs)
+            existing_values = self.return_formatter.obj_to_dict(existing_values)
             to_pop = []
             reformatted_default_values = dict()
             for argument in self.form_arguments:
@@ -239,13 +318,55 @@ class BaseCommand(ABC, HelpStringRetriever, metaclass=CommandMetaClass):
 
     def set_t_and_creds(self, t, username, password, server):
         """
-        whenever the tenant or user changes, the new tapis object with the new credentials must be passed to each command to ensure they are operating on the currect user
+        whenever the tenant or user changes, the new tapis object with the new credentials must be passed to each command to ensure they are operating on the currect user.
+        These are the session defaults, connections run commands with the credentials in their own execution context
         """
-        self.t = t
-        self.username = username
-        self.password = password
+        self.session_t = t
+        self.session_username = username
+        self.session_password = password
         self.server = server
 
+    @property
+    def t(self):
+        """
+        the tapis client of the connection running this command. Commands are shared by every connection, so never store it on the instance
+        """
+        context = executionContext.current_context()
+        return context.t if context else self.session_t
+
+    @property
+    def username(self):
+        context = executionContext.current_context()
+        return context.username if context else self.session_username
+
+    @property
+    def password(self):
+        context = executionContext.current_context()
+        return context.password if context else self.session_password
+
+    @property
+    def tenant(self):
+        context = executionContext.current_context()
+        return context.url if context else None
+
+    def cache_arguments(self, kwargs: dict) -> dict:
+        """
+        the arguments that select what a command reads or changes, for keying and invalidating cached results
+        """
+        return {name:value for name, value in kwargs.items() if name not in ('connection', 'verbose', 'help', 'positionals', 'no_cache')}
+
+    async def paginate(self, fetch: typing.Callable, kwargs: dict, **options):
+        """
+        the rows of a paged Tapis listing, up to --limit rows, every row with --all, or Paginator.DEFAULT_LIMIT rows otherwise. If the
+        default limit cut the listing short, the last row says so
+        """
+        limit = None if kwargs.get('all', False) else kwargs.get('limit', Paginator.DEFAULT_LIMIT)
+        paginator = Paginator(fetch, limit=limit, pool=self.server.prefetch_pool, **options)
+        async for row in paginator:
+            yield row
+        if paginator.more_available and 'limit' not in kwargs:
+            yield f"Showing the first {limit} results, use --limit or --all to see more"
+
     def update_args_with_truncated(self, truncated_args_dict):
         """
         when the command group finishes processing all the truncated arguments, they get passed back here to be processed and assigned
@@ -305,6 +426,52 @@ class BaseCommand(ABC, HelpStringRetriever, metaclass=CommandMetaClass):
         """
         pass
 
+    async def execute_run(self, kwargs):
+        """
+        run the command, on the command executor unless the command needs the event loop
+        """
+        if self.streaming:
+            return self.stream_run(kwargs)
+        cache = self.server.result_cache
+        arguments = self.cache_arguments(kwargs)
+        if self.cache_ttl and not kwargs.pop('no_cache', False):
+            hit, result = cache.get(self.__class__.__name__, self.tenant, self.username, arguments)
+            if hit:
+                return result
+        if not self.run_in_executor:
+            result = await self.run(**kwargs)
+        else:
+            result = await self.server.command_executor.run_coroutine(self.run, timeout=self.timeout, **kwargs)
+        if inspect.isasyncgen(result): # a run that returns rows, like a recursive upload, streams them for this call only
+            return self.stream_returned_rows(result, kwargs, arguments)
+        if self.cache_ttl:
+            cache.put(self.__class__.__name__, self.tenant, self.username, arguments, result, self.cache_ttl)
+        for command in self.invalidates:
+            cache.invalidate(command, self.tenant, arguments)
+        return result
+
+    async def stream_returned_rows(self, rows, kwargs, arguments):
+        """
+        the rows returned by run, each formatted as it is produced. Whatever the command changed is invalidated once they are all sent
+        """
+        try:
+            async for row in rows:
+                yield self.return_formatter(row, kwargs['verbose'])
+        finally:
+            for command in self.invalidates:
+                self.server.result_cache.invalidate(command, self.tenant, arguments)
+
+    async def stream_run(self, kwargs):
+        """
+        the rows of a streaming command, each formatted as it is produced
+        """
+        if self.run_in_executor:
+            rows = self.server.command_executor.stream(self.run, timeout=self.timeout, **kwargs)
+        else:
+            rows = self.run(**kwargs)
+        async for row in rows:
+            yield self.return_formatter(row, kwargs['verbose'])
+
     async def __call__(self, **kwargs):
         """
         runs all command meta-operations
@@ -322,7 +489,7 @@ class BaseCommand(ABC, HelpStringRetriever, metaclass=CommandMetaClass):
             for handler in self.command_execution_sequence:
                 kwargs = await handler(kwargs)
         try:
-            return_value = await self.run(**kwargs)
+            return_value = await self.execute_run(kwargs)
         except (exceptions.Shutdown, exceptions.Exit) as e:
             raise e
         except Exception as e: # this whole part writes command input to a file in the event a form command fails
@@ -345,6 +512,8 @@ class BaseCommand(ABC, HelpStringRetriever, metaclass=CommandMetaClass):
                     json.dump(kwargs, f, indent=4)
                     raise Exception(e, f"Argument input failure, command data written to file {file_save_path}")
             raise e
+        if self.streaming or inspect.isasyncgen(return_value):
+            return return_value
         return_value = self.return_formatter(return_value, kwargs['verbose'])
         return return_value
     
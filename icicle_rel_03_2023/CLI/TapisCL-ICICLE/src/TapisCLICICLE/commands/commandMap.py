@@ -1,12 +1,18 @@
 from .Apps import appCommands
 from .Systems import systemCommands
 import pprint
+import json
+import asyncio
+import hashlib
+import inspect
+from concurrent.futures import ThreadPoolExecutor
 
 
 if __name__ != "__main__":
     from . import authenticatorClients, snapshotCommands, volumeCommands, serverCommands, podCommands, fileCommands, dataFormatters, baseCommand, jobCommands
     from .query import postgres, neo4j
-    from utilities import exceptions
+    from utilities import exceptions, commandExecutor, resultCache, transferMonitor
+    from socketopts import socketOpts
     from commands.arguments.argument import Argument
     from commands.commandOpts import CHECK_EXPLICIT_ID
 
@@ -50,13 +56,18 @@ class General(baseCommand.BaseCommandMap):
     command_map = {
         'get_tenants':serverCommands.get_tenants(),
         'get_tenant':serverCommands.get_tenant(),
+        'refresh_tenants':serverCommands.refresh_tenants(),
+        'batch':serverCommands.batch(),
         'whoami':serverCommands.whoami(),
         'user':serverCommands.user(),
         'whereami':serverCommands.whereami(),
         'exit':serverCommands.exit(),
         'shutdown':serverCommands.shutdown(),
         'switch_tenant_to':serverCommands.switch_tenant_to(),
-        'manpages':serverCommands.manpages()
+        'manpages':serverCommands.manpages(),
+        'connection_pool_stats':serverCommands.connection_pool_stats(),
+        'cache_stats':serverCommands.cache_stats(),
+        'executor_stats':serverCommands.executor_stats()
     }
 
 
@@ -152,6 +163,10 @@ class Files(baseCommand.BaseCommandMap):
         'redeem_postit':fileCommands.redeem_postit(),
         'upload':fileCommands.upload(),
         'download':fileCommands.download(),
+        'sync':fileCommands.sync(),
+        'get_recent_transfers':fileCommands.get_recent_transfers(),
+        'create_transfer_task':fileCommands.create_transfer_task(),
+        'watch_transfer':fileCommands.watch_transfer(),
     }
 
 
@@ -247,12 +262,23 @@ class AggregateCommandMap(baseCommand.CommandContainer, ArgsGenerator):
         'Snapshots': Snapshots(),
         'AuthClients': AuthClients()
     }
+    EXECUTOR_WORKERS = 8 # how many commands can wait on Tapis at once
+    PREFETCH_WORKERS = 4 # next pages of paged listings fetched at once. Not the command executor, whose workers run the listing commands
+    COMMAND_TIMEOUT = 600 # default per command timeout in seconds
+    CACHE_ENTRIES = 512 # cached results of read-only commands, across every connection
+    BATCH_EXCLUDED = ('batch', 'exit', 'shutdown', 'switch_tenant_to') # these change the session or nest batches
     def __init__(self):
+        self.command_executor = commandExecutor.CommandExecutor(max_workers=self.EXECUTOR_WORKERS, default_timeout=self.COMMAND_TIMEOUT)
+        self.result_cache = resultCache.ResultCache(max_entries=self.CACHE_ENTRIES)
+        self.transfer_monitor = transferMonitor.TransferMonitor(self.command_executor)
+        self.prefetch_pool = ThreadPoolExecutor(max_workers=self.PREFETCH_WORKERS, thread_name_prefix='tapis-prefetch')
         truncated_arguments = self.generate_truncated_arguments(self.arguments)
         for command in self.aggregate_command_map.values():
             command.update_args_with_truncated(truncated_arguments)
         for name, argument in self.arguments.items():
             argument.truncated_arg = truncated_arguments[name]
+        self.argument_catalog = {name:argument.json() for name, argument in self.arguments.items()}
+        self.catalog_hash = hashlib.sha256(json.dumps(self.argument_catalog, sort_keys=True).encode()).hexdigest() # clients cache the catalog under this hash
         self.help = self.__general_help()
 
     def __general_help(self):
@@ -278,10 +304,41 @@ class AggregateCommandMap(baseCommand.CommandContainer, ArgsGenerator):
                 if argument in command.arguments:
                     kwargs[argument] = value
             pprint.pprint(kwargs)
-            return await command(**kwargs)
+            token = connection.context.activate() # commands read the tapis client and credentials of this connection only
+            try:
+                return await command(**kwargs)
+            finally:
+                connection.context.deactivate(token)
         elif command_name in self.groups:
             return self.groups[command_name]()
         elif command_name == "help":
             return self.help
         else:
-            raise exceptions.CommandNotFoundError(command_name)
\ No newline at end of file
+            raise exceptions.CommandNotFoundError(command_name)
+
+    async def run_batch(self, connection, commands: list[dict], concurrency: int | None = None):
+        """
+        run a list of commands, at most concurrency at a time (by default as many as the executor has workers). Yields (index, result, error)
+        as each command finishes. A failing command is reported in its item instead of stopping the batch. Commands cannot prompt the user
+        for input, so one that would fails in its item
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.EXECUTOR_WORKERS)
+        async def run_item(index: int, command_data: dict):
+            socketOpts.INTERACTIVE.set(False) # this task runs in its own copy of the context
+            async with semaphore:
+                try:
+                    if command_data.get('command_selection') in self.BATCH_EXCLUDED:
+                        raise ValueError(f"{command_data.get('command_selection')} cannot run in a batch")
+                    result = await self.run_command(connection, dict(command_data))
+                    if inspect.isasyncgen(result): # a batch item is sent whole, so collect streamed rows
+                        result = [row async for row in result]
+                    return index, result, None
+                except Exception as e:
+                    return index, None, str(e)
+        tasks = [asyncio.ensure_future(run_item(index, command_data)) for index, command_data in enumerate(commands)]
+        try:
+            for next_finished in asyncio.as_completed(tasks):
+                yield await next_finished
+        finally:
+            for task in tasks:
+                task.cancel()
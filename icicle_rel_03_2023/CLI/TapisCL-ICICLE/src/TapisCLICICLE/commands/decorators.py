@@ -3,18 +3,17 @@ DECORATORS
 These decorators are used in the tapisObjectWrappers.py file to standardize special functions. Allows for increased code reusability
 """
 import typing
-import time
 import abc
 import socket
 from functools import update_wrapper, partial
 
 try:
     from socketopts import schemas
-    from utilities import exceptions, killableThread
+    from utilities import exceptions, cancellableThread
     from commands.arguments import argument
 except:
     from ..socketopts import schemas
-    from ..utilities import exceptions, killableThread
+    from ..utilities import exceptions, cancellableThread
     from ..commands.arguments import argument
 
 
@@ -104,16 +103,18 @@ class AnimatedLoading:
     def __str__(self):
         return str(self.func)
     
-    def animation(self):
-        while True:
+    def animation(self, cancel_event):
+        while not cancel_event.is_set():
             for frame in self.animation_frames:
                 print(f"loading {frame}", end='', flush=True)
-                time.sleep(0.5)
+                if cancel_event.wait(0.5): # sleeps between frames, but wakes as soon as the function returns
+                    return
     
     def __call__(self, obj, *args, **kwargs):
-        animation_thread = killableThread.KillableThread(target=self.animation)
+        animation_thread = cancellableThread.CancellableThread(target=self.animation)
         animation_thread.start()
-        result = self.func(obj, *args, **kwargs)
-        animation_thread.kill()
-        print("", end='', flush=True)
-        return result
\ No newline at end of file
+        try:
+            return self.func(obj, *args, **kwargs)
+        finally:
+            animation_thread.cancel()
+            print("", end='', flush=True)
\ No newline at end of file
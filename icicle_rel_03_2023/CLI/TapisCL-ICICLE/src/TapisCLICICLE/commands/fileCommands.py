@@ -1,4 +1,11 @@
+import os
+import asyncio
+import posixpath
+
+from tapipy.tapis import errors as TapisErrors
+
 if __name__ != "__main__":
+    from utilities import fileTransfer, syncManifest, transferMonitor, exceptions
     from . import baseCommand
     from .arguments import argument
     from . import decorators
@@ -15,10 +22,13 @@ class ls(baseCommand.BaseCommand):
         Argument('file_path', positional=True),
         Argument('systemId', size_limit=(1, 80), positional=True)
     ]
-    async def run(self, *args, **kwargs) -> str: # lists files available on a tapis account
-        file_list = self.t.files.listFiles(systemId=kwargs['systemId'], path=kwargs['file_path'])
-        file_list_truncated = [f"{file.type} - {file.nativePermissions} ---- {file.name}" for file in file_list]
-        return file_list_truncated
+    paginated = True
+    async def run(self, *args, **kwargs): # lists files available on a tapis account
+        async for file in self.paginate(self.t.files.listFiles, kwargs, cursor='offset', systemId=kwargs['systemId'], path=kwargs['file_path']):
+            if isinstance(file, str):
+                yield file
+                continue
+            yield f"{file.type} - {file.nativePermissions} ---- {file.name}"
     
 
 class cd(baseCommand.BaseCommand):
@@ -47,6 +57,7 @@ class showme(baseCommand.BaseCommand):
     """
     @help: display file metadata
     """
+    cache_ttl = 10 # files also change outside the CLI, so stat results are kept briefly
     command_opt = [commandOpts.CHECK_PWD(('file_path',)), commandOpts.CHECK_EXPLICIT_ID('systemId')]
     return_fields = ['absolutePath', 'uid', 'size', 'perms']
     required_arguments = [
@@ -81,6 +92,7 @@ class mkdir(baseCommand.BaseCommand):
     """
     @help: create a new directory at the selected path
     """
+    invalidates = ['showme']
     command_opt = [commandOpts.CHECK_PWD(('file_path',)), commandOpts.CHECK_EXPLICIT_ID('systemId')]
     required_arguments = [
         Argument('file_path', positional=True),
@@ -95,6 +107,7 @@ class mv(baseCommand.BaseCommand):
     """
     @help: move a file from a source directory to a destination directory within a system's file structure
     """
+    invalidates = ['showme']
     command_opt = [commandOpts.CHECK_PWD(('source_file', 'destination_file')), commandOpts.CHECK_EXPLICIT_ID('systemId')]
     required_arguments = [
         Argument('source_file', positional=True),
@@ -110,6 +123,7 @@ class cp(baseCommand.BaseCommand):
     """
     @help: copy a file from a source directory to another directory
     """
+    invalidates = ['showme']
     command_opt = [commandOpts.CHECK_PWD(('source_file', 'destination_file')), commandOpts.CHECK_EXPLICIT_ID('systemId')]
     required_arguments = [
         Argument('source_file', positional=True),
@@ -125,6 +139,7 @@ class rm(baseCommand.BaseCommand):
     """
     @help: delete a selected file
     """
+    invalidates = ['showme']
     command_opt = [commandOpts.CHECK_PWD(('file_path',)), commandOpts.CHECK_EXPLICIT_ID('systemId')]
     required_arguments = [
         Argument('file_path', positional=True),
@@ -148,7 +163,10 @@ class get_recent_transfers(baseCommand.BaseCommand):
 class create_transfer_task(baseCommand.BaseCommand):
     """
     @help: create a task to transfer files between systems. The two system types must be the same
+    the Files service moves the data itself, so it never passes through this machine. Several source paths, separated by commas, go in
+    one task, either to as many destination paths or into one destination directory. Follow the task with watch_transfer
     """
+    run_in_executor = False # the transfer is followed from the event loop
     required_arguments = [
         Argument('source_file_path', positional=True),
         Argument('source_system_id', positional=True),
@@ -156,7 +174,59 @@ class create_transfer_task(baseCommand.BaseCommand):
         Argument('destination_file_path')
     ]
     async def run(self, *args, **kwargs):
-        pass
+        sources = [path.strip() for path in kwargs['source_file_path'].split(',') if path.strip()]
+        destinations = [path.strip() for path in kwargs['destination_file_path'].split(',') if path.strip()]
+        if len(destinations) == 1 and len(sources) > 1:
+            destinations = [posixpath.join(destinations[0], posixpath.basename(source.rstrip('/'))) for source in sources]
+        if len(destinations) != len(sources):
+            raise ValueError(f"Got {len(sources)} source paths but {len(destinations)} destination paths")
+        elements = [{'sourceURI':fileTransfer.tapis_uri(kwargs['source_system_id'], source),
+                     'destinationURI':fileTransfer.tapis_uri(kwargs['destination_system_id'], destination)}
+                    for source, destination in zip(sources, destinations)]
+        t = self.t
+        task = await self.server.command_executor.run_blocking(t.files.createTransferTask, elements=elements)
+        snapshot = await self.server.transfer_monitor.track((self.tenant, self.username), t, task)
+        return (f"transfer task {snapshot['uuid']} is {snapshot['status']}, moving {len(elements)} paths from {kwargs['source_system_id']} "
+                f"to {kwargs['destination_system_id']}. Follow it with watch_transfer {snapshot['uuid']}")
+
+
+class watch_transfer(baseCommand.BaseCommand):
+    """
+    @help: follow a transfer task until it finishes, showing the bytes transferred so far
+    """
+    run_in_executor = False # waits on the transfer monitor, on the event loop, so the timeout is applied here
+    timeout = 24 * 60 * 60
+    required_arguments = [
+        Argument('transfer_task_id', positional=True),
+        Argument('connection', arg_type='silent')
+    ]
+    async def run(self, *args, **kwargs):
+        monitor = self.server.transfer_monitor
+        uuid = kwargs['transfer_task_id']
+        if uuid not in monitor.tasks or not transferMonitor.finished(monitor.tasks[uuid]):
+            t = self.t
+            task = await self.server.command_executor.run_blocking(t.files.getTransferTask, transferTaskId=uuid, includeSummary=True)
+            await monitor.track((self.tenant, self.username), t, task)
+        progress = fileTransfer.ProgressReporter(kwargs['connection'], f"transfer {uuid}")
+        async def follow():
+            version = 0
+            while True:
+                snapshot, version = await monitor.wait(uuid, version)
+                progress(snapshot['transferred'], snapshot['total'])
+                if transferMonitor.finished(snapshot):
+                    return snapshot
+        try:
+            snapshot = await asyncio.wait_for(follow(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise exceptions.CommandTimeoutError(self.__class__.__name__, self.timeout)
+        finally:
+            await progress.flush()
+        message = f"transfer task {uuid} {snapshot['status']}, {snapshot['transferred']} bytes transferred"
+        if snapshot['totalTransfers']:
+            message += f", {snapshot['completeTransfers']} of {snapshot['totalTransfers']} files"
+        if snapshot['errorMessage']:
+            message += f": {snapshot['errorMessage']}"
+        return message
 
 
 class grant_permissions(baseCommand.BaseCommand):
@@ -277,16 +347,33 @@ class upload(baseCommand.BaseCommand):
     @todo: make it so that this doesnt need to take both source and destination files, but have it so it retrieves the current file location on the tapis system
     and sets that file location to be the upload point. Do the same for downloads but in reverse
     """
+    invalidates = ['showme']
+    timeout = 24 * 60 * 60 # a large file, or a large directory, takes a while
     command_opt = [commandOpts.CHECK_PWD(('destination_file',)), commandOpts.CHECK_EXPLICIT_ID('systemId')]
     required_arguments = [
         Argument('source_file', positional=True),
         Argument('systemId', size_limit=(1, 80), positional=True),
         Argument('destination_file'),
     ]
-    async def run(self, *args, **kwargs) -> str: # upload a file from local to remote using tapis. Takes source and destination paths
+    optional_arguments = [
+        Argument('recursive', action='store_true', description='transfer a directory and everything in it, reporting on each file'),
+        Argument('concurrency', data_type='int', description='how many files of a recursive upload move at once')
+    ]
+    async def run(self, *args, **kwargs): # upload a file from local to remote using tapis. Takes source and destination paths
         if not kwargs['destination_file']:
             kwargs['destination_file'] = kwargs['connection'].pwd
-        self.t.upload(system_id=kwargs['systemId'],
+        t = self.t
+        if kwargs.get('recursive', False): # one status row per file, streamed as each finishes
+            def upload_file(entry: dict) -> int:
+                t.upload(system_id=kwargs['systemId'], source_file_path=entry['source'], dest_file_path=entry['destination'])
+                return entry['size']
+            if not os.path.isdir(kwargs['source_file']):
+                raise ValueError(f"{kwargs['source_file']} is not a directory, upload it without --recursive")
+            manifest = fileTransfer.local_manifest(kwargs['source_file'], kwargs['destination_file'])
+            return fileTransfer.TransferQueue(upload_file, workers=kwargs.get('concurrency', fileTransfer.DEFAULT_CONCURRENCY)).run(manifest)
+        if os.path.isdir(kwargs['source_file']):
+            raise ValueError(f"{kwargs['source_file']} is a directory, upload it with --recursive")
+        t.upload(system_id=kwargs['systemId'],
                 source_file_path=kwargs['source_file'],
                 dest_file_path=kwargs['destination_file'])
         return f'successfully uploaded {kwargs["source_file"]} to {kwargs["destination_file"]}'
@@ -294,9 +381,11 @@ class upload(baseCommand.BaseCommand):
 
 class download(baseCommand.BaseCommand):
     """
-    @help: download a file from the system
+    @help: download a file from the system. The file is streamed to disk, and an interrupted download resumes when run again
     the source and destination files must both be in the file argument, respectively, separated by a comma
     """
+    run_in_executor = False # reports progress on the connection, the transfer itself runs on the command executor
+    timeout = 24 * 60 * 60 # large files take a while. A stalled transfer is caught by the HTTP read timeout instead
     command_opt = [commandOpts.CHECK_PWD(('source_file',)), commandOpts.CHECK_EXPLICIT_ID('systemId')]
     required_arguments = [
         Argument('source_file', positional=True),
@@ -304,14 +393,126 @@ class download(baseCommand.BaseCommand):
         Argument('destination_file'),
         Argument('connection', arg_type='silent')
     ]
-    async def run(self, *args, **kwargs) -> str: # download a remote file using tapis, operates basically the same as upload
+    optional_arguments = [
+        Argument('checksum', description='verify the download against a digest, like sha256:<hex> or md5:<hex>'),
+        Argument('concurrency', data_type='int', description='how many byte ranges of a large file, or files of a recursive download, are downloaded at once'),
+        Argument('recursive', action='store_true', description='transfer a directory and everything in it, reporting on each file')
+    ]
+    async def run(self, *args, **kwargs): # download a remote file using tapis, operates basically the same as upload
         if not kwargs["source_file"]:
             kwargs["source_file"] = kwargs['connection'].pwd
-        file_info = self.t.files.getContents(systemId=kwargs['systemId'],
-                            path=kwargs["source_file"])
-        file_info = file_info.decode('utf-8')
-        with open(kwargs['destination_file'], 'w') as f:
-            f.write(file_info)
-        return f'successfully downloaded {kwargs["source_file"]} to {kwargs["destination_file"]}'
-    
+        t = self.t
+        if kwargs.get('recursive', False): # one status row per file, streamed as each finishes
+            return self.download_directory(t, kwargs)
+        size = (await self.server.command_executor.run_blocking(t.files.getStatInfo, systemId=kwargs['systemId'], path=kwargs["source_file"])).size
+        destination = fileTransfer.local_destination(kwargs['destination_file'], kwargs["source_file"])
+        progress = fileTransfer.ProgressReporter(kwargs['connection'], kwargs["source_file"])
+        concurrency = min(kwargs.get('concurrency', fileTransfer.DEFAULT_CONCURRENCY), self.server.http_pool.max_connections_per_host)
+        try:
+            fetched = await self.server.command_executor.run_blocking(fileTransfer.download_file, self.server.http_pool.session, t, kwargs['systemId'],
+                                                                      kwargs["source_file"], destination, size, checksum=kwargs.get('checksum', None),
+                                                                      progress=progress, concurrency=concurrency,
+                                                                      timeout=self.timeout)
+        finally:
+            await progress.flush()
+        resumed = f", resumed after {size - fetched} bytes" if fetched < size else ""
+        return f'successfully downloaded {kwargs["source_file"]} to {destination} ({size} bytes{resumed})'
+
+    async def download_directory(self, t, kwargs: dict):
+        """
+        list the remote directory recursively, then download its files on a transfer queue, one connection per file
+        """
+        session = self.server.http_pool.session
+        destination = kwargs['destination_file'] or os.path.basename(kwargs['source_file'].rstrip('/'))
+        def download_file(entry: dict) -> int:
+            os.makedirs(os.path.dirname(entry['destination']) or '.', exist_ok=True)
+            return fileTransfer.download_file(session, t, kwargs['systemId'], entry['source'], entry['destination'], entry['size'])
+        listing = baseCommand.Paginator(t.files.listFiles, cursor='offset', pool=self.server.prefetch_pool, systemId=kwargs['systemId'],
+                                        path=kwargs['source_file'], recurse=True)
+        manifest = fileTransfer.remote_manifest([file async for file in listing], kwargs['source_file'], destination)
+        workers = min(kwargs.get('concurrency', fileTransfer.DEFAULT_CONCURRENCY), self.server.http_pool.max_connections_per_host)
+        async for status in fileTransfer.TransferQueue(download_file, workers=workers).run(manifest):
+            yield status
+
+
+class sync(baseCommand.BaseCommand):
+    """
+    @help: send only the new and changed files of a local directory to a system path, like rsync. A manifest of what the last sync sent is
+    kept locally, so a repeat sync only scans the local tree. The remote tree is listed again once a day, or with --refresh
+    """
+    invalidates = ['showme']
+    timeout = 24 * 60 * 60
+    command_opt = [commandOpts.CHECK_PWD(('destination_file',)), commandOpts.CHECK_EXPLICIT_ID('systemId')]
+    required_arguments = [
+        Argument('source_file', positional=True),
+        Argument('systemId', size_limit=(1, 80), positional=True),
+        Argument('destination_file'),
+    ]
+    optional_arguments = [
+        Argument('checksums', action='store_true', description='compare sha256 digests of files whose modification time changed but size did not'),
+        Argument('refresh', action='store_true', description='list the remote tree again instead of trusting the sync manifest'),
+        Argument('concurrency', data_type='int', description='how many changed files are sent at once')
+    ]
+    async def run(self, *args, **kwargs):
+        if not kwargs['destination_file']:
+            kwargs['destination_file'] = kwargs['connection'].pwd
+        source, destination = kwargs['source_file'], kwargs['destination_file']
+        if not os.path.isdir(source):
+            raise ValueError(f"{source} is not a directory, send single files with upload")
+        t = self.t
+        manifest = syncManifest.SyncManifest(self.tenant, self.username, kwargs['systemId'], source, destination)
+        listed = kwargs.get('refresh', False) or not manifest.fresh()
+        if listed:
+            manifest.merge_listing(await self.list_remote(t, kwargs['systemId'], destination))
+        checksums = kwargs.get('checksums', False)
+        pending = list()
+        local = fileTransfer.scan_local(source)
+        for path, stat in local.items():
+            local_path = os.path.join(source, *path.split('/'))
+            digest = (lambda local_path=local_path: fileTransfer.file_digest(local_path, 'sha256')) if checksums else None
+            reason = manifest.changed(path, stat, digest)
+            if reason:
+                pending.append({'source':local_path, 'destination':posixpath.join(destination, path), 'size':stat['size'], 'path':path,
+                                'mtime':stat['mtime'], 'reason':reason})
+        manifest.save()
+        summary = f"{len(local) - len(pending)} files of {source} already up to date on {destination}{'' if listed else ' (remote listing from the sync manifest)'}"
+        return self.send_changes(t, kwargs, manifest, pending, summary)
+
+    async def list_remote(self, t, system_id: str, path: str) -> dict[str, dict]:
+        """
+        every remote file under path, by path relative to it. A path that does not exist yet is empty
+        """
+        root = '/' + path.strip('/')
+        remote = dict()
+        try:
+            async for file in baseCommand.Paginator(t.files.listFiles, cursor='offset', pool=self.server.prefetch_pool, systemId=system_id, path=path,
+                                                    recurse=True):
+                if file.type == 'file':
+                    remote[posixpath.relpath('/' + file.path.lstrip('/'), root)] = {'size':file.size, 'modified':str(file.lastModified)}
+        except TapisErrors.NotFoundError:
+            pass
+        return remote
 
+    async def send_changes(self, t, kwargs: dict, manifest, pending: list[dict], summary: str):
+        """
+        upload the changed files on a transfer queue, recording each one that arrives in the manifest
+        """
+        checksums = kwargs.get('checksums', False)
+        entries = {entry['source']:entry for entry in pending}
+        def upload_file(entry: dict) -> int:
+            if checksums:
+                entry['sha256'] = fileTransfer.file_digest(entry['source'], 'sha256')
+            t.upload(system_id=kwargs['systemId'], source_file_path=entry['source'], dest_file_path=entry['destination'])
+            return entry['size']
+        failed = 0
+        try:
+            async for status in fileTransfer.TransferQueue(upload_file, workers=kwargs.get('concurrency', fileTransfer.DEFAULT_CONCURRENCY)).run(pending):
+                entry = entries[status['file']]
+                if status['status'] == 'OK':
+                    manifest.record(entry['path'], entry['size'], entry['mtime'], entry.get('sha256', None))
+                else:
+                    failed += 1
+                yield {**status, 'reason':entry['reason']}
+        finally:
+            await self.server.command_executor.run_blocking(manifest.save)
+        yield f"{summary}, {len(pending) - failed} sent, {failed} failed"
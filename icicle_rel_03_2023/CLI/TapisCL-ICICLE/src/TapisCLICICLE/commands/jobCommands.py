@@ -64,8 +64,10 @@ class get_jobs(baseCommand.BaseCommand):
     @help: list all available jobs on the system
     """
     return_fileds = ['appId', 'appVersion', 'execSystemId', 'uuid']
+    paginated = True
     async def run(self, *args, **kwargs):
-        return self.t.jobs.getJobList()
+        async for job in self.paginate(self.t.jobs.getJobList, kwargs):
+            yield job
     
 
 class download_job_output(baseCommand.BaseCommand):
@@ -23,6 +23,7 @@ class get_pod(baseCommand.BaseCommand):
     """
     @help: return a specific pod based on pod_id
     """
+    cache_ttl = 30
     return_fields = ['pod_id', 'pod_template', 'status']
     required_arguments=[
         Argument('pod_id', positional=True)
@@ -111,6 +112,7 @@ class update_pod(create_pod): # make it so the command retrieves current setting
     """
     @help: update a pod. Must be restarted to stage changes
     """
+    invalidates = ['get_pod']
     updateable_form_retriever=PodUpdatingRetriever()
     return_fields = ['pod_id', 'pod_template', 'status']
     required_arguments=[
@@ -158,6 +160,7 @@ class start_pod(baseCommand.BaseCommand):
     """
     @help: start the pod specified with pod_id
     """
+    invalidates = ['get_pod']
     return_fields = ['pod_id', 'pod_template', 'status']
     required_arguments=[
         Argument('pod_id', positional=True),
@@ -171,6 +174,7 @@ class restart_pod(baseCommand.BaseCommand):
     """
     @help: initiate a pod restart
     """
+    invalidates = ['get_pod']
     return_fields = ['pod_id', 'pod_template', 'status']
     required_arguments=[
         Argument('pod_id', positional=True),
@@ -185,6 +189,7 @@ class stop_pod(baseCommand.BaseCommand):
     """
     @help: stop a pod's operations
     """
+    invalidates = ['get_pod']
     return_fields = ['pod_id', 'pod_template', 'status']
     required_arguments=[
         Argument('pod_id', positional=True),
@@ -199,6 +204,7 @@ class delete_pod(baseCommand.BaseCommand):
     """
     @help: delete select pod
     """
+    invalidates = ['get_pod']
     required_arguments=[
         Argument('pod_id', positional=True),
         Argument('confirm', arg_type='confirmation')
@@ -1,4 +1,5 @@
 import typing
+import shlex
 import webbrowser
 
 from tapipy.tapis import Tapis
@@ -8,6 +9,7 @@ if __name__ != "__main__":
     from . import baseCommand, decorators
     from utilities import exceptions
     from commands.arguments.argument import Argument
+    from socketopts import argumentParser
 
 
 class ServiceChecker:
@@ -27,10 +29,11 @@ class get_tenants(baseCommand.BaseCommand): # give this return fields
     @help: get a list of available tenants to authenticate with
     """
     async def run(self, *args, **kwargs):
+        if self.server.tenant_directory.is_empty():
+            self.server.refresh_tenant_directory()
         return_data = dict()
-        tenants = self.t.tenants.list_tenants()
-        for tenant in tenants:
-            return_data[tenant.tenant_id] = {'uri':tenant.base_url.split('//')[1], 'owner':tenant.owner, 'description':tenant.description}
+        for tenant in self.server.tenant_directory.tenants():
+            return_data[tenant['tenant_id']] = {'uri':tenant['uri'], 'owner':tenant['owner'], 'description':tenant['description']}
         return return_data
 
     
@@ -39,12 +42,25 @@ class get_tenant(baseCommand.BaseCommand):
     """
     @help: get a specific tenant
     """
+    cache_ttl = 300
     required_arguments = [
         Argument('tenant_id', positional=True)
     ]
     async def run(self, *args, **kwargs):
+        tenant = self.server.tenant_directory.tenant(kwargs['tenant_id'])
+        if tenant:
+            return {'uri':tenant['uri'], 'owner':tenant['owner'], 'description':tenant['description']}
         tenant = self.t.tenants.get_tenant(**kwargs)
         return {'uri':tenant.base_url.split('//')[1], 'owner':tenant.owner, 'description':tenant.description}
+
+
+class refresh_tenants(baseCommand.BaseCommand):
+    """
+    @help: force a refresh of the locally cached tenant and site directory
+    """
+    async def run(self, *args, **kwargs):
+        count = self.server.refresh_tenant_directory()
+        return f"Tenant directory refreshed, {count} tenants available"
     
     
 class switch_tenant_to(baseCommand.BaseCommand):
@@ -52,6 +68,7 @@ class switch_tenant_to(baseCommand.BaseCommand):
     @help: switch the connected tapis service
     @todo: upgrade to federated auth
     """
+    run_in_executor = False
     required_arguments=[
         Argument('tenant_uri', size_limit=(0, 80), positional=True),
         Argument('auth', choices=['password', 'device_code', 'federated']),
@@ -70,6 +87,7 @@ class switch_tenant_to(baseCommand.BaseCommand):
             results = None
         self.server.configure_decorators(self.server.username, self.server.password)
         self.server.update_credentials(self.server.t, self.server.username, self.server.password)
+        kwargs['connection'].context.set_credentials(self.server.t, self.server.username, self.server.password, self.server.url) # other open connections stay on their own tenant
         return results
       
 
@@ -77,6 +95,7 @@ class exit(baseCommand.BaseCommand):
     """
     @help: exit the CLI without shutting down the service
     """
+    run_in_executor = False
     async def run(self, *args, **kwargs):
         raise exceptions.Exit
     
@@ -85,14 +104,48 @@ class shutdown(baseCommand.BaseCommand):
     """
     @help: exit the CLI and shutdown the service
     """
+    run_in_executor = False
     async def run(self, *args, **kwargs):
         raise exceptions.Shutdown
     
     
+class batch(baseCommand.BaseCommand):
+    """
+    @help: run every command in a file, one command per line, several at once. Results print as each command finishes, and a failed command is reported without stopping the rest
+    """
+    run_in_executor = False
+    required_arguments = [
+        Argument('batch_file', positional=True)
+    ]
+    optional_arguments = [
+        Argument('concurrency', data_type='int', description="how many commands run at once, defaults to the server's executor size")
+    ]
+    def parse_batch_file(self, batch_file: str) -> list[dict]:
+        def parse_error(message):
+            raise ValueError(message)
+        parser = argumentParser.build_parser(self.server.argument_catalog, parse_error)
+        commands = []
+        with open(batch_file, 'r') as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip() or line.lstrip().startswith('#'):
+                    continue
+                try:
+                    commands.append(vars(parser.parse_args(shlex.split(line))))
+                except Exception as e:
+                    raise ValueError(f"Line {line_number} of {batch_file}: {e}")
+        return commands
+
+    async def run(self, *args, **kwargs):
+        commands = self.parse_batch_file(kwargs['batch_file'])
+        concurrency = int(kwargs['concurrency']) if kwargs.get('concurrency', None) else None
+        return await self.server.stream_batch(kwargs['connection'], commands, concurrency)
+    
+
 class whoami(baseCommand.BaseCommand):
     """
     @help: returns the username of the current user
     """
+    cache_ttl = 300
     async def run(self, *args, **kwargs) -> str:
         user_info = self.t.authenticator.get_userinfo()
         return user_info
@@ -114,7 +167,31 @@ class whereami(baseCommand.BaseCommand):
     @help: get the URI of current tapis tenant
     """
     async def run(self, *args, **kwargs):
-        return self.server.url
+        return kwargs['connection'].context.url
+    
+
+class connection_pool_stats(baseCommand.BaseCommand):
+    """
+    @help: show how the server's pooled HTTP connections to Tapis are being used
+    """
+    async def run(self, *args, **kwargs):
+        return self.server.http_pool.stats()
+    
+
+class cache_stats(baseCommand.BaseCommand):
+    """
+    @help: show how often read-only commands were answered from the server's result cache
+    """
+    async def run(self, *args, **kwargs):
+        return self.server.result_cache.stats()
+    
+
+class executor_stats(baseCommand.BaseCommand):
+    """
+    @help: show how many of the server's command workers are still busy with commands that timed out
+    """
+    async def run(self, *args, **kwargs):
+        return self.server.command_executor.stats()
     
 
 class manpages(baseCommand.BaseCommand):
@@ -42,6 +42,7 @@ class get_snapshot(baseCommand.BaseCommand):
     """
     @help: get snapshot information
     """
+    cache_ttl = 30
     required_arguments = [
         Argument('snapshot_id', positional=True)
     ]
@@ -53,6 +54,7 @@ class update_snapshot(baseCommand.BaseCommand):
     """
     @help: update snapshot information
     """
+    invalidates = ['get_snapshot']
     supports_config_file=True
     required_arguments = [
         Argument('snapshot_id', positional=True)
@@ -71,6 +73,7 @@ class delete_snapshot(baseCommand.BaseCommand):
     """
     @help: delete snapshot information
     """
+    invalidates = ['get_snapshot']
     required_arguments = [
         Argument('snapshot_id', positional=True),
         Argument('confirm', arg_type='confirmation')
@@ -87,5 +90,6 @@ class list_snapshot_files(baseCommand.BaseCommand):
         Argument('snapshot_id', positional=True)
     ]
     async def run(self, *args, **kwargs):
-        return self.t.pods.list_snapshot_files(**kwargs)
+        for file in self.t.pods.list_snapshot_files(**kwargs):
+            yield file
     
\ No newline at end of file
@@ -36,6 +36,7 @@ class get_volume(baseCommand.BaseCommand):
     """
     @help: get information on a specific volume
     """
+    cache_ttl = 30
     command_opt = [commandOpts.CHECK_EXPLICIT_ID('volume_id')]
     required_arguments = [
         Argument('volume_id', positional=True)
@@ -77,6 +78,7 @@ class update_volume(create_volume):
     """
     @help: update a volume's information
     """
+    invalidates = ['get_volume']
     supports_config_file=True
     command_opt = [commandOpts.CHECK_EXPLICIT_ID('volume_id')]
     async def run(self, *args, **kwargs):
@@ -87,6 +89,7 @@ class delete_volume(baseCommand.BaseCommand):
     """
     @help: delete a volume
     """
+    invalidates = ['get_volume']
     command_opt = [commandOpts.CHECK_EXPLICIT_ID('volume_id')]
     required_arguments = [
         Argument('volume_id', positional=True),
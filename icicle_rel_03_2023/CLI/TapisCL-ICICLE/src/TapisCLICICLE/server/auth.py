@@ -1,4 +1,6 @@
 import time
+import asyncio
+import functools
 import os 
 import sys
 import json
@@ -15,27 +17,60 @@ import pyperclip
 
 
 from socketopts import schemas
+from server import deviceCode
 from utilities import exceptions
 from commands.arguments import argument
 
 
 
 class ServerSideAuth:
+    def create_tapis(self, base_url: str, resource_set: str = 'tapipy', **kwargs) -> Tapis:
+        """
+        every Tapis client the server creates shares the server's pooled HTTP session. The client is built on tapipy's bundled specs and
+        other resource sets are bound from the spec cache, and passing a known tenant id skips tapipy's tenant lookup on construction
+        """
+        if 'tenant_id' not in kwargs:
+            tenant_id = self.tenant_directory.tenant_id_for(base_url.split("//")[-1])
+            if tenant_id:
+                kwargs['tenant_id'] = tenant_id
+        t = Tapis(base_url, **kwargs)
+        self.spec_cache.bind(t, resource_set)
+        return self.http_pool.attach(t)
+
     def create_token_device_grant(link, device_code, client_id):
         response = requests.post(f"https://{link}/v3/oauth2/tokens", json={"grant_type":"device_code", "device_code":device_code, "client_id":client_id})
         parsed_data = json.loads(response.content.decode())
         return parsed_data['result']['access_token']['access_token'], parsed_data['result']['refresh_token']['refresh_token']
     
-    def get_tenant_uris(self):
-        if not self.t:
-            t = Tapis('https://tacc.tapis.io')
-        else:
-            t = self.t
-        tenants = t.tenants.list_tenants()
-        uri_list = list()
-        for tenant in tenants:
-            uri_list.append(tenant.base_url.split("//")[1])
-        return uri_list
+    def refresh_tenant_directory(self):
+        """
+        blocking, pulls the tenant listing through the logged in client if there is one
+        """
+        t = self.t if self.t else self.create_tapis('https://tacc.tapis.io', tenant_id='tacc')
+        count = self.tenant_directory.refresh(t)
+        self.logger.info(f"tenant directory refreshed with {count} tenants")
+        return count
+
+    def __log_tenant_refresh(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            self.logger.warning(f"background tenant directory refresh failed: {task.exception()}")
+
+    def schedule_tenant_refresh(self):
+        if self.tenant_refresh_task and not self.tenant_refresh_task.done():
+            return self.tenant_refresh_task
+        self.tenant_refresh_task = asyncio.create_task(self.command_executor.run_blocking(self.refresh_tenant_directory))
+        self.tenant_refresh_task.add_done_callback(self.__log_tenant_refresh)
+        return self.tenant_refresh_task
+
+    async def get_tenant_uris(self):
+        """
+        served from the tenant directory. Only an empty directory waits on the network, a stale one is refreshed in the background
+        """
+        if self.tenant_directory.is_empty():
+            await self.schedule_tenant_refresh()
+        elif self.tenant_directory.is_stale():
+            self.schedule_tenant_refresh()
+        return self.tenant_directory.uris()
     
     async def password_grant(self, link: str, connection):
         start = time.time()
@@ -48,9 +83,9 @@ class ServerSideAuth:
             username = username_password_response.request_content['username']
             password = username_password_response.request_content['password']
             try:
-                self.t = Tapis(f"https://{link}",
-                               username=username,
-                               password=password)
+                self.t = self.create_tapis(f"https://{link}",
+                                           username=username,
+                                           password=password)
                 print(self.t.base_url)
                 self.t.get_tokens()
                 break
@@ -79,37 +114,35 @@ class ServerSideAuth:
     
     async def device_code_grant(self, link: str, connection):
         start = time.time()
-        self.t = Tapis(f"https://{link}", resource_set='dev')
-        client_id = get_client_code(link)
+        self.t = self.create_tapis(f"https://{link}", resource_set='dev')
+        client_id = await self.command_executor.run_blocking(get_client_code, link) # usually a cache hit, but a cold cache goes to GitHub
         if not client_id:
             raise exceptions.NoTenantClient(link)
         authentication_information = self.t.authenticator.generate_device_code(client_id=client_id)
         payload = schemas.AuthRequest(auth_request_type='device_code',
-                                      message={"message":"Go to the URL if it doesnt open automatically and enter the user code to authenticate. Then click y when you enter the code\nUser code copied to clipboard", 
+                                      message={"message":"Go to the URL if it doesnt open automatically and enter the user code to authenticate. Login completes automatically once the code is entered\nUser code copied to clipboard", 
                                                "url":authentication_information.verification_uri, 
-                                               "user_code": authentication_information.user_code},
-                                      request_content={'Entered User Code':argument.Argument('Entered User Code', arg_type='confirmation')})
+                                               "user_code": authentication_information.user_code})
         await connection.send(payload)
         pyperclip.copy(authentication_information.user_code)
         webbrowser.open(authentication_information.verification_uri)
-        confirmation = await connection.receive()
-        if not confirmation.request_content['Entered User Code']:
-            raise RuntimeError(f"User indicated that device code auth failed") # get rid of this feature and switch to polling
-        start_time = time.time()
-        while True:
-            try:
-                access_info = self.t.authenticator.create_token(grant_type="device_code", device_code=authentication_information.device_code, client_id=client_id)
-                break
-            except Exception as e:
-                print(e)
-                time.sleep(1)
-                if time.time() - start_time > 60:
-                    raise RuntimeError("Timeout while polling for authenticator token")
-
-        self.t = Tapis(f"https://{link}",
-                       access_token=access_info.access_token.access_token,
-                       refresh_token=access_info.refresh_token.refresh_token,
-                       resource_set="dev")
+        poller = deviceCode.DeviceCodePoller(self.command_executor,
+                                             functools.partial(self.t.authenticator.create_token, grant_type="device_code", device_code=authentication_information.device_code, client_id=client_id),
+                                             interval=getattr(authentication_information, 'interval', None),
+                                             expires_in=getattr(authentication_information, 'expires_in', None))
+        poll_task = asyncio.ensure_future(poller.poll())
+        previous_status = connection.status
+        connection.set_status_device_authenticating(poll_task)
+        try:
+            access_info = await poll_task # ServerConnection.close cancels this, and the cancellation unwinds whatever is waiting on the grant
+        finally:
+            connection.auth_task = None
+            if connection.status == 'DEVICE_CODE_AUTH':
+                connection.status = previous_status
+        self.logger.info(f"device code accepted after {poller.attempts} polls")
+
+        self.t.set_access_token(access_info.access_token)
+        self.t.set_refresh_token(access_info.refresh_token)
         
         self.username = self.t.authenticator.get_userinfo().username
         self.url = link
@@ -134,8 +167,8 @@ class ServerSideAuth:
         webbrowser.open(auth_link)
         response_code_message: schemas.AuthRequest = await connection.receive()
         
-        self.t = Tapis(f"https://{link}",
-                       access_token=response_code_message.request_content['access_token'].strip())
+        self.t = self.create_tapis(f"https://{link}",
+                                   access_token=response_code_message.request_content['access_token'].strip())
 
         self.username = self.t.authenticator.get_userinfo().username
         self.url = link
@@ -146,7 +179,8 @@ class ServerSideAuth:
         return f"Successfully initialized tapis service on {self.url}"
 
     async def auth_startup(self, connection):
-        session_auth_type_request = schemas.AuthRequest(request_content={"Tenant URI":argument.Argument('Tenant URI', arg_type='str_input', choices=self.get_tenant_uris()), "auth_type":argument.Argument('auth_type', choices=['password', 'device_code', 'federated'], arg_type='str_input')},
+        tenant_uris = await self.get_tenant_uris()
+        session_auth_type_request = schemas.AuthRequest(request_content={"Tenant URI":argument.Argument('Tenant URI', arg_type='str_input', choices=tenant_uris), "auth_type":argument.Argument('auth_type', choices=['password', 'device_code', 'federated'], arg_type='str_input')},
                                                         auth_request_type="requested",
                                                         message={"message":"Enter the URI of the Tapis tenant you wish to connect to, then select your auth type from the options below",
                                                                  "grant options":['password', 'device_code', 'federated']})
@@ -159,12 +193,12 @@ class ServerSideAuth:
                     raise exceptions.InvalidCredentialsReceived()
                 self.auth_type = auth_type
                 link = session_auth_type_response.request_content['Tenant URI']
-                self.t = Tapis(f"https://{link}")#, resource_set='dev')
+                if link not in tenant_uris: # the grant builds the Tapis client, so validate against the tenant list instead of constructing one here
+                    session_auth_type_request.error = "Invalid tenant URI received, try again"
+                    continue
                 break
             except exceptions.InvalidCredentialsReceived:
                 session_auth_type_request.error = "Invalid auth type received"
-            except tapis.errors.BaseTapyException:
-                session_auth_type_request.error = "Invalid tenant URI received, try again"
 
         if auth_type != "password":
             session_password_request = schemas.AuthRequest(auth_request_type=auth_type, request_content={"password":argument.Argument('password', arg_type='secure', size_limit=(6, 50))},
@@ -183,9 +217,7 @@ class ServerSideAuth:
                 if auth_type == "federated":
                     await self.federated_grant(link, connection)
                 elif auth_type == "device_code":
-                    connection.set_status_device_authenticating()
                     await self.device_code_grant(link, connection)
-                    connection.set_status_closed()
                 else:
                     await self.password_grant(link, connection)
                 break
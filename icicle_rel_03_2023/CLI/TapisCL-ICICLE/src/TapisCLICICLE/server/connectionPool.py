@@ -0,0 +1,70 @@
+"""
+CONNECTION POOL
+One keep-alive HTTP session owned by the server and shared by every Tapis client it creates, so TLS and TCP setup are paid once per host
+instead of once per login
+"""
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class TapisConnectionPool:
+    """
+    wraps a requests.Session with a sized connection pool and retry/backoff on transient gateway errors. Only idempotent methods are retried
+    """
+    def __init__(self, max_hosts: int = 10, max_connections_per_host: int = 16, max_retries: int = 3, backoff_factor: float = 0.5):
+        self.max_hosts = max_hosts
+        self.max_connections_per_host = max_connections_per_host
+        self.retry = Retry(total=max_retries,
+                           connect=max_retries,
+                           read=max_retries,
+                           status=max_retries,
+                           backoff_factor=backoff_factor,
+                           status_forcelist=(502, 503, 504),
+                           raise_on_status=False) # let tapipy raise its own errors from the final response
+        self.adapter = HTTPAdapter(pool_connections=max_hosts, pool_maxsize=max_connections_per_host, max_retries=self.retry)
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self.attached_clients = 0
+        self.lock = threading.Lock()
+
+    def attach(self, t):
+        """
+        point a Tapis client at the shared session. Returns the client to allow chaining at construction
+        """
+        t.requests_session = self.session
+        with self.lock:
+            self.attached_clients += 1
+        return t
+
+    def stats(self) -> dict:
+        """
+        utilization of every host pool the session has opened
+        """
+        hosts = dict()
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            idle = sum(1 for connection in list(pool.pool.queue) if connection is not None) if pool.pool else 0 # unused slots are queued as None
+            hosts[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                'connections_opened':pool.num_connections,
+                'requests_sent':pool.num_requests,
+                'idle_connections':idle,
+                'max_connections':self.max_connections_per_host
+            }
+        return {
+            'max_hosts':self.max_hosts,
+            'max_connections_per_host':self.max_connections_per_host,
+            'max_retries':self.retry.total,
+            'backoff_factor':self.retry.backoff_factor,
+            'clients_attached':self.attached_clients,
+            'hosts':hosts
+        }
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,77 @@
+"""
+DEVICE CODE POLLING
+Waits for the user to enter their device code by polling the token endpoint from the event loop, following the OAuth2 device grant rules
+(RFC 8628 section 3.5): wait the server's interval between polls, back off on slow_down, and stop on denial or expiry. Any other error,
+like a rejected client id, stops polling with that error. Only server errors and dropped connections are retried, a few times in a row
+"""
+import asyncio
+import typing
+
+import requests
+from tapipy.errors import BaseTapyException
+
+
+class DeviceCodePoller:
+    DEFAULT_INTERVAL = 5 # Tapis doesnt send an interval with the device code, this is the RFC default
+    SLOW_DOWN_INCREMENT = 5
+    DEFAULT_EXPIRES_IN = 600
+    TERMINAL_ERRORS = ('access_denied', 'expired_token')
+    RETRYABLE_ERRORS = ('authorization_pending', 'slow_down')
+    TRANSIENT_RETRIES = 3 # server errors and dropped connections in a row before giving up
+
+    def __init__(self, command_executor, create_token: typing.Callable, interval: float | None = None, expires_in: float | None = None):
+        self.command_executor = command_executor
+        self.create_token = create_token
+        self.interval = float(interval) if interval else self.DEFAULT_INTERVAL
+        self.expires_in = float(expires_in) if expires_in else self.DEFAULT_EXPIRES_IN
+        self.attempts = 0
+
+    @staticmethod
+    def error_code(error: Exception) -> str | None:
+        """
+        the OAuth2 error code of a failed poll, or None if it isnt one of the device grant's codes. Tapis reports it in the message or body
+        rather than the error field, so search the text
+        """
+        text = str(error)
+        if isinstance(error, BaseTapyException) and error.response is not None:
+            text += getattr(error.response, 'text', '')
+        for code in DeviceCodePoller.RETRYABLE_ERRORS + DeviceCodePoller.TERMINAL_ERRORS:
+            if code in text:
+                return code
+        return None
+
+    @staticmethod
+    def transient(error: Exception) -> bool:
+        """
+        whether a poll failed on the way to Tapis rather than being answered: a server error, or a connection that failed or timed out
+        """
+        if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return True
+        response = getattr(error, 'response', None)
+        return isinstance(error, BaseTapyException) and response is not None and getattr(response, 'status_code', 0) >= 500
+
+    async def poll(self):
+        """
+        returns the token response once the user has entered the code. Cancelling the task running this stops polling immediately
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.expires_in
+        transient_failures = 0
+        while loop.time() + self.interval < deadline:
+            await asyncio.sleep(self.interval)
+            self.attempts += 1
+            try:
+                return await self.command_executor.run_blocking(self.create_token)
+            except Exception as e:
+                code = self.error_code(e)
+                if code == 'slow_down':
+                    self.interval += self.SLOW_DOWN_INCREMENT
+                elif code in self.TERMINAL_ERRORS:
+                    raise RuntimeError(f"Device code authentication failed: {code}")
+                elif code is None:
+                    transient_failures += 1
+                    if not self.transient(e) or transient_failures > self.TRANSIENT_RETRIES:
+                        raise RuntimeError(f"Device code authentication failed: {e}") from e
+                    continue
+                transient_failures = 0
+        raise RuntimeError("Timeout while polling for authenticator token, the device code expired")
@@ -1,7 +1,10 @@
 import time
+IMPORT_START = time.perf_counter()
 import socket
 import asyncio
 import traceback
+import functools
+import inspect
 import typing
 import os
 import json
@@ -9,9 +12,11 @@ import json
 from tapipy.tapis import Tapis
 
 from commands import commandMap, decorators
-from utilities import logger, exceptions
-from socketopts import schemas, socketOpts
-from server import auth
+from utilities import logger, exceptions, executionContext
+from socketopts import schemas, socketOpts, transport
+from socketopts.framing import CATALOG_HASH_VERSION
+from server import auth, connectionPool, specCache, tenantDirectory
+IMPORT_END = time.perf_counter()
 
 
 class ServerConnection(socketOpts.ServerSocketOpts):
@@ -19,17 +24,38 @@ class ServerConnection(socketOpts.ServerSocketOpts):
     connection object to wrap around async reader and writer to make work easier
     """
     def __init__(self, name, reader, writer, connection_list, debug=False):
+        self.context = executionContext.ExecutionContext()
         super().__init__(name, debug=debug)
         self.name = name
         self.connection_list: list = connection_list
         self.reader: asyncio.StreamReader = reader
         self.writer: asyncio.StreamWriter = writer
         self.task: asyncio.Task = None
+        self.auth_task: asyncio.Task = None
+        self.request_tasks: set[asyncio.Task] = set() # pipelined commands still running
         self.status = "CLOSED"
+        self.closing = False
         self.shutdown_message = schemas.ResponseData(message={'message':'Shutdown initiated, closing'}, exit_status=1)
         self.logger.info('Connection successfully initiated, beginning handshake')
 
-    def set_status_device_authenticating(self):
+    @property
+    def pwd(self) -> str:
+        return self.context.pwd
+
+    @pwd.setter
+    def pwd(self, pwd: str):
+        self.context.pwd = pwd
+
+    @property
+    def system(self) -> str:
+        return self.context.system
+
+    @system.setter
+    def system(self, system: str):
+        self.context.system = system
+
+    def set_status_device_authenticating(self, auth_task: asyncio.Task):
+        self.auth_task = auth_task
         self.status = 'DEVICE_CODE_AUTH'
 
     def set_status_closed(self):
@@ -43,8 +69,26 @@ class ServerConnection(socketOpts.ServerSocketOpts):
         self.status = 'OPEN'
         self.logger.info('Asyncio task for socket operations was received, and is now active')
 
+    def start_request(self, request_id: str, coroutine: typing.Coroutine):
+        """
+        run a pipelined command alongside the connection's other commands. Replies the client sends for it are routed to it by request id
+        """
+        self.open_request(request_id)
+        task = asyncio.ensure_future(coroutine)
+        self.request_tasks.add(task)
+        task.add_done_callback(functools.partial(self.__request_finished, request_id))
+
+    def __request_finished(self, request_id: str, task: asyncio.Task):
+        self.request_tasks.discard(task)
+        self.close_request(request_id)
+
     async def close(self, connection_list_lock: asyncio.Lock):
+        if self.closing: # the connection's own exit and a server shutdown can both get here
+            return
+        self.closing = True
         self.logger.info('ATTEMPTING TO CLOSE')
+        for task in list(self.request_tasks):
+            task.cancel()
         if self.status in ('OPEN', 'EXITING'):
             result = self.task.cancel()
             self.logger.info("successfully cancelled task")
@@ -52,7 +96,10 @@ class ServerConnection(socketOpts.ServerSocketOpts):
             self.writer.close()
             await self.writer.wait_closed()
             self.status = 'CLOSED'
-        elif self.status == 'DEVICE_CODE_AUTH': # only in the auth file
+        elif self.status == 'DEVICE_CODE_AUTH':
+            self.auth_task.cancel()
+            if self.task:
+                self.task.cancel()
             await self.send(schemas.AuthRequest(error='cancelled authentication during device_code grant', auth_request_type='device_code'))
             self.writer.close()
             await self.writer.wait_closed()
@@ -73,9 +120,18 @@ class Server(commandMap.AggregateCommandMap, logger.ServerLogger, decorators.Dec
     Receives commands from the client and executes Tapis operations
     """
     SESSION_TIME = 5000
+    HTTP_MAX_HOSTS = 10
+    HTTP_MAX_CONNECTIONS_PER_HOST = 16 # keep at least EXECUTOR_WORKERS so concurrent commands dont discard connections
+    HTTP_MAX_RETRIES = 3
+    HTTP_BACKOFF_FACTOR = 0.5
+    UNIX_SOCKET = True # listen on a per-user unix socket where the platform has them
+    STREAM_CHUNK_SIZE = 100 # most rows sent in one StreamData frame
+    LISTEN_BACKLOG = 64
     debug=False
     def __init__(self, IP: str, PORT: int):
+        init_start = time.perf_counter()
         super().__init__()
+        command_map_end = time.perf_counter()
         self.initial = True
         self.running = True
 
@@ -85,25 +141,54 @@ class Server(commandMap.AggregateCommandMap, logger.ServerLogger, decorators.Dec
         self.username = None
         self.password = None
         self.auth_type = None
+        self.http_pool = connectionPool.TapisConnectionPool(max_hosts=self.HTTP_MAX_HOSTS,
+                                                            max_connections_per_host=self.HTTP_MAX_CONNECTIONS_PER_HOST,
+                                                            max_retries=self.HTTP_MAX_RETRIES,
+                                                            backoff_factor=self.HTTP_BACKOFF_FACTOR)
+        self.spec_cache = specCache.TapisSpecCache()
+        self.tenant_directory = tenantDirectory.TenantDirectory()
+        self.tenant_refresh_task = None
 
         self.__name__ = "Server"
         self.initialize_logger(self.__name__)
         # setting up socket server
         self.ip, self.port = IP, PORT
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.sock.setblocking(False)
-        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.sock.bind((self.ip, self.port))
-        self.sock.listen(1)
+        self.socket_path = transport.socket_path() if self.UNIX_SOCKET and transport.unix_available() else None
+        self.unix_sock = transport.bind_unix(self.socket_path, self.LISTEN_BACKLOG) if self.socket_path else None
+        self.sock = None
+        if not self.unix_sock and not transport.tcp_enabled():
+            raise OSError(f"No private directory for the server socket, set {transport.TCP_VARIABLE}=1 to listen on TCP instead")
+        if transport.tcp_enabled(): # any user on the machine can reach a TCP port, so it is opt in wherever unix sockets exist
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.setblocking(False)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                self.sock.bind((self.ip, self.port))
+                self.sock.listen(self.LISTEN_BACKLOG)
+            except OSError as e:
+                if not self.unix_sock: # TCP is the only way in, so this server is unreachable
+                    raise
+                self.logger.warning(f"Could not bind {self.ip}:{self.port} ({e}), serving on {self.socket_path} only")
+                self.sock.close()
+                self.sock = None
+        socket_end = time.perf_counter()
 
-        self.end_time = time.time() + self.SESSION_TIME # start the countdown on the timeout
+        self.deadline: asyncio.TimerHandle = None # session timeout, started in main and pushed back on activity
+        self.shutdown_event = asyncio.Event()
+        self.background_tasks: set[asyncio.Task] = set()
 
         self.connections_list: list[ServerConnection] = []
 
-        self.server = None
+        self.servers: list[asyncio.AbstractServer] = []
         self.num_connections = 0
 
         self.connection_list_lock = asyncio.Lock()
+        self.startup_timings = {
+            'imports':IMPORT_END - IMPORT_START,
+            'command_map':command_map_end - init_start,
+            'socket_bind':socket_end - command_map_end,
+        }
+        self.init_end = time.perf_counter()
         self.logger.info('initialization complete')
 
     async def close_connections(self):
@@ -111,36 +196,58 @@ class Server(commandMap.AggregateCommandMap, logger.ServerLogger, decorators.Dec
         return await asyncio.gather(*[connection.close(self.connection_list_lock) for connection in self.connections_list])
 
     async def close(self):
+        if self.deadline:
+            self.deadline.cancel()
         await self.close_connections()
-        self.server.close()
+        self.transfer_monitor.close()
+        self.command_executor.shutdown()
+        self.prefetch_pool.shutdown(wait=False, cancel_futures=True)
+        self.http_pool.close()
+        for server in self.servers:
+            server.close()
+        if self.unix_sock:
+            transport.remove_unix(self.socket_path)
         raise exceptions.Shutdown()
 
-    async def check_timeout(self):
-        while self.running:
-            if time.time() >= self.end_time:
-                self.logger.info("Timeout, shutting down")
-                self.running = False
-                return 'server timed out'
-            await asyncio.sleep(3)
-    
-    async def check_shutdown(self):
-        while self.running:
-            await asyncio.sleep(3)
-            for connection in self.connections_list:
-                if connection.status == 'EXITING':
-                    await connection.close(self.connection_list_lock)
+    def reset_deadline(self):
+        """
+        restart the session timeout countdown
+        """
+        if self.deadline:
+            self.deadline.cancel()
+        self.deadline = asyncio.get_running_loop().call_later(self.SESSION_TIME, self.session_timeout)
+
+    def session_timeout(self):
+        self.logger.info("Timeout, shutting down")
+        self.request_shutdown()
+
+    def request_shutdown(self):
+        self.running = False
+        self.shutdown_event.set()
+
+    def connection_finished(self, connection: ServerConnection, task: asyncio.Task):
+        """
+        done callback on each connection's command task, so a client that exits or disconnects is closed right away
+        """
+        if self.running and connection.status in ('EXITING', 'CLOSED'):
+            self.track_background(connection.close(self.connection_list_lock))
+
+    async def wait_for_shutdown(self):
+        await self.shutdown_event.wait()
+        self.logger.info("Shutting down the server")
         await self.close()
-        self.logger.info("The server shutdown.")
-        return None
 
     async def handshake(self, connection):
         self.logger.info("Handshake starting")
+        await connection.negotiate_framing()
+        if connection.one_shot:
+            return
         if self.initial:  # if this is the first time in the session that the cli is connecting
-            startup_data = schemas.StartupData(initial = self.initial)
+            startup_data = schemas.StartupData(initial = self.initial, catalog_hash = self.catalog_hash)
             await connection.send(startup_data)
             await self.auth_startup(connection)
         else:
-            startup_result = schemas.StartupData(initial = self.initial, username = self.username, url = self.url)
+            startup_result = schemas.StartupData(initial = self.initial, username = self.username, url = self.url, catalog_hash = self.catalog_hash)
             await connection.send(startup_result)
         self.initial = False
         self.logger.info("Final connection data sent")
@@ -150,11 +257,11 @@ class Server(commandMap.AggregateCommandMap, logger.ServerLogger, decorators.Dec
         accept connection request and initialize communication with the client
         """  
         self.num_connections += 1
-        self.end_time = time.time() + self.SESSION_TIME
+        self.reset_deadline()
         connection = ServerConnection(f"CON-{self.num_connections}", reader=reader, writer=writer, connection_list=self.connections_list, debug=self.debug)
-        ip, port = writer.transport.get_extra_info('socket').getsockname()
         try:
             await self.handshake(connection)
+            connection.context.set_credentials(self.t, self.username, self.password, self.url)
             connection.logger.info('Handshake complete')
         except exceptions.InvalidCredentialsReceived as e:
             connection.logger.warning("invalid credentials entered too many times. Cancelling request")
@@ -168,8 +275,16 @@ class Server(commandMap.AggregateCommandMap, logger.ServerLogger, decorators.Dec
             connection.logger.warning(e)
             await connection.close(self.connection_list_lock)
             return
-        connection.logger.info('Sending command arguments now')
-        await connection.send(schemas.ResponseData(request_content={name:argument.json() for name, argument in self.arguments.items()}))
+        if connection.one_shot:
+            return await self.run_one_shot(connection)
+        if connection.protocol_version >= CATALOG_HASH_VERSION:
+            catalog_request: schemas.ResponseData = await connection.receive()
+            send_catalog = catalog_request.request_content['catalog_hash'] != self.catalog_hash
+        else:
+            send_catalog = True # older clients wait for the catalog without offering a hash
+        if send_catalog:
+            connection.logger.info('Client argument catalog is missing or out of date, sending command arguments now')
+            await connection.send(schemas.ResponseData(request_content=self.argument_catalog))
         setup_response: schemas.ResponseData = await connection.receive()
         if not setup_response.request_content['setup_success']:
             connection.logger.warning(f"The setup of the connection upon sending argument information failed")
@@ -178,29 +293,60 @@ class Server(commandMap.AggregateCommandMap, logger.ServerLogger, decorators.Dec
         loop = asyncio.get_event_loop()
         task: asyncio.Task = loop.create_task(self.receive_and_execute(connection))
         connection.set_task(task)
+        task.add_done_callback(functools.partial(self.connection_finished, connection))
         self.connections_list.append(connection)
         connection.logger.info('All connection setup complete, beginning normal operations')
 
+    async def run_one_shot(self, connection: ServerConnection):
+        """
+        answer a single command and close. The one shot client falls back to the full handshake when the server isnt authenticated
+        yet or its cached catalog is out of date
+        """
+        request: schemas.CommandData = await connection.receive()
+        if self.initial or request.catalog_hash != self.catalog_hash:
+            response = schemas.ResponseData(error='one shot unavailable', request_content={'one_shot_available':False})
+        else:
+            self.reset_deadline()
+            try:
+                result = await self.execute_message(connection, request)
+                response = schemas.ResponseData(message={"message":result}, url=connection.context.url, active_username=connection.context.username)
+            except exceptions.Exit:
+                response = schemas.ResponseData(url=connection.context.url, active_username=connection.context.username)
+            except exceptions.Shutdown:
+                self.request_shutdown()
+                response = connection.shutdown_message
+            except Exception as e:
+                connection.logger.warning(traceback.format_exc())
+                response = schemas.ResponseData(error=str(e), url=connection.context.url, active_username=connection.context.username)
+        await connection.send(response)
+        connection.writer.close()
+        await connection.writer.wait_closed()
+
     async def receive_and_execute(self, connection: ServerConnection):
         """
         receive and process commands
         """
         while self.running:
             try:
-                message = await connection.receive()
+                message = await connection.read_message()
+                self.reset_deadline()
                 if not self.running:
                     raise exceptions.Shutdown
-                kwargs = message.request_content
-                result = await self.run_command(connection, kwargs)
-                response = schemas.ResponseData(message={"message":result}, url=self.url, active_username=self.username)
-                self.end_time = time.time() + self.SESSION_TIME 
+                if message.request_id is not None: # pipelined, so dont wait for the command before reading the next message
+                    self.dispatch_request(connection, message)
+                    continue
+                if message.error:
+                    raise exceptions.ClientSideError(message.error)
+                result = await self.execute_message(connection, message)
+                response = schemas.ResponseData(message={"message":result}, url=connection.context.url, active_username=connection.context.username)
+                self.reset_deadline()
                 await connection.send(response)
             except exceptions.ClientSideError as e:
                 self.logger.warning(e)
                 continue
             except (exceptions.TimeoutError, exceptions.Shutdown) as e:
                 connection.logger.warning(str(e))
-                self.running = False
+                self.request_shutdown()
                 return
             except exceptions.Exit as e:
                 connection.logger.info("user exit initiated")
@@ -208,6 +354,10 @@ class Server(commandMap.AggregateCommandMap, logger.ServerLogger, decorators.Dec
                 return
             except asyncio.CancelledError:
                 return 'task was cancelled'
+            except asyncio.IncompleteReadError:
+                connection.logger.info("client closed the connection")
+                connection.set_status_closed()
+                return
             except (exceptions.CommandNotFoundError, exceptions.NoConfirmationError, exceptions.InvalidCredentialsReceived, Exception) as e:
                 if isinstance(e, OSError) and 'The specified network name is no longer available' in str(e):
                     print(e)
@@ -215,18 +365,127 @@ class Server(commandMap.AggregateCommandMap, logger.ServerLogger, decorators.Dec
                     connection.set_status_closed()
                     return
                 error_str = traceback.format_exc()
-                error_response = schemas.ResponseData(error=str(e), url=self.url, active_username=self.username)
+                error_response = schemas.ResponseData(error=str(e), url=connection.context.url, active_username=connection.context.username)
                 await connection.send(error_response)
                 connection.logger.warning(f"{error_str}")
     
+    async def execute_message(self, connection: ServerConnection, message: schemas.CommandData | schemas.BatchData):
+        if message.schema_type == 'BatchData':
+            return await self.stream_batch(connection, message.request_content['commands'], message.request_content.get('concurrency', None))
+        result = await self.run_command(connection, message.request_content)
+        if inspect.isasyncgen(result):
+            if connection.framed:
+                return await self.stream_rows(connection, result)
+            return [row async for row in result] # legacy json clients read one message per command, so the rows are sent whole
+        return result
+
+    async def stream_rows(self, connection: ServerConnection, rows: typing.AsyncIterator) -> str:
+        """
+        send a streaming command's rows as they are produced. A frame goes out as soon as a row is ready, and rows that arrive while it is
+        being written share the next frame, up to STREAM_CHUNK_SIZE
+        """
+        queue = asyncio.Queue(maxsize=self.STREAM_CHUNK_SIZE)
+        finished = object()
+        async def produce():
+            try:
+                async for row in rows:
+                    await queue.put(row)
+            finally:
+                await queue.put(finished)
+        producer = asyncio.ensure_future(produce())
+        count = 0
+        try:
+            while True:
+                chunk = [await queue.get()]
+                while not queue.empty() and len(chunk) < self.STREAM_CHUNK_SIZE:
+                    chunk.append(queue.get_nowait())
+                done = chunk[-1] is finished
+                if done:
+                    chunk.pop()
+                if chunk:
+                    count += len(chunk)
+                    await connection.send(schemas.StreamData(rows=chunk))
+                if done:
+                    break
+            await producer # raises the command's error, if it failed part way through
+        finally:
+            producer.cancel()
+        return f"{count} results"
+
+    async def stream_batch(self, connection: ServerConnection, commands: list[dict], concurrency: int | None = None) -> dict:
+        """
+        run a batch, sending each command's result to the client as a BatchItem as soon as it finishes. Returns the summary
+        """
+        summary = {'commands':len(commands), 'succeeded':0, 'failed':0}
+        async for index, result, error in self.run_batch(connection, commands, concurrency):
+            if error is None:
+                summary['succeeded'] += 1
+                await connection.send(schemas.BatchItem(index=index, message={"message":result}))
+            else:
+                summary['failed'] += 1
+                await connection.send(schemas.BatchItem(index=index, error=error))
+        return summary
+
+    def dispatch_request(self, connection: ServerConnection, message: typing.Type[schemas.BaseSchema]):
+        if message.schema_type not in ('CommandData', 'BatchData'):
+            connection.route_message(message)
+        elif message.request_id in connection.request_queues:
+            connection.logger.warning(f"Request id {message.request_id} is already running, rejecting the duplicate")
+            self.track_background(connection.send(schemas.ResponseData(error=f"Request id {message.request_id} is already in use", request_id=message.request_id)))
+        else:
+            connection.start_request(message.request_id, self.execute_request(connection, message))
+
+    async def execute_request(self, connection: ServerConnection, message: schemas.CommandData):
+        """
+        run one pipelined command. Everything it sends carries its request id, so commands finish and answer in any order
+        """
+        socketOpts.CURRENT_REQUEST.set(message.request_id) # this task runs in its own copy of the context
+        try:
+            result = await self.execute_message(connection, message)
+            response = schemas.ResponseData(message={"message":result}, url=connection.context.url, active_username=connection.context.username)
+        except exceptions.Exit:
+            connection.logger.info("user exit initiated")
+            connection.set_status_exiting()
+            connection.task.cancel() # ends the receive loop, and its done callback closes the connection
+            return
+        except (exceptions.TimeoutError, exceptions.Shutdown) as e:
+            connection.logger.warning(str(e))
+            self.request_shutdown()
+            return
+        except Exception as e:
+            connection.logger.warning(traceback.format_exc())
+            response = schemas.ResponseData(error=str(e), url=connection.context.url, active_username=connection.context.username)
+        self.reset_deadline()
+        await connection.send(response)
+
+    def track_background(self, coroutine: typing.Coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
     async def main(self):
-        self.server = await asyncio.start_server(self.accept, sock=self.sock)
+        if self.unix_sock:
+            self.servers.append(await asyncio.start_unix_server(self.accept, sock=self.unix_sock))
+        if self.sock:
+            self.servers.append(await asyncio.start_server(self.accept, sock=self.sock))
+        transport.signal_ready(self.port if self.sock else None, self.socket_path if self.unix_sock else None)
+        self.startup_timings['start_server'] = time.perf_counter() - self.init_end
+        self.logger.info("Startup timing breakdown (s): " + ", ".join(f"{stage}={duration:.3f}" for stage, duration in self.startup_timings.items())
+                         + f", total={sum(self.startup_timings.values()):.3f}")
+        if self.tenant_directory.is_stale():
+            self.schedule_tenant_refresh() # warm the directory before the first client asks for the auth form
         try:
-            async with self.server:
-                result = await asyncio.gather(self.server.serve_forever(), self.check_timeout(), self.check_shutdown(), return_exceptions=True)#, self.check_timeout(), return_exceptions=True)
-                self.logger.info(str(result))
+            self.reset_deadline()
+            result = await asyncio.gather(*[server.serve_forever() for server in self.servers], self.wait_for_shutdown(), return_exceptions=True)
+            self.logger.info(str(result))
         except (KeyboardInterrupt, exceptions.Shutdown):
             self.running = False
+        finally:
+            for server in self.servers:
+                server.close()
+            if self.unix_sock:
+                transport.remove_unix(self.socket_path)
+            transport.remove_ready_file()
 
 
 if __name__ == '__main__':
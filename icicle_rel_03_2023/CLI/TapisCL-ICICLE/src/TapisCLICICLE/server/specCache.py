@@ -0,0 +1,72 @@
+"""
+SPEC CACHE
+Keeps parsed Tapis OpenAPI specs on disk and in memory so building a Tapis client doesnt re-download and re-parse every service spec.
+Specs are resolved lazily, the first time a command touches a service
+"""
+import os
+import threading
+
+import tapipy
+from tapipy import tapis
+
+from utilities import localCache
+
+
+class LazyResource:
+    """
+    stands in for a tapipy Resource until the first attribute access, then swaps the real Resource onto the Tapis client
+    """
+    def __init__(self, spec_cache, resource_set: str, resource_name: str, t):
+        self._spec_cache = spec_cache
+        self._resource_set = resource_set
+        self._resource_name = resource_name
+        self._t = t
+
+    def __getattr__(self, name):
+        spec = self._spec_cache.load_spec(self._resource_set, self._resource_name)
+        resource = tapis.Resource(self._resource_name, spec['paths'], self._t)
+        setattr(self._t, self._resource_name, resource)
+        return getattr(resource, name)
+
+
+class TapisSpecCache:
+    """
+    on-disk pickles live under a directory versioned by the cache format and the installed tapipy, so an upgrade never loads stale specs.
+    The specs for a resource set are the same for every tenant, so the tenant only decides the base url, not the cache entry
+    """
+    CACHE_VERSION = 1
+    BUNDLED_RESOURCE_SETS = ('tapipy', 'prod') # parsed by tapipy at import time, nothing to cache
+
+    def __init__(self, cache_root: str | None = None):
+        self.cache_root = cache_root or localCache.cache_path('specs')
+        self.parsed_specs: dict[tuple[str, str], dict] = dict()
+        self.lock = threading.Lock()
+
+    def spec_dir(self, resource_set: str) -> str:
+        path = os.path.join(self.cache_root, f"v{self.CACHE_VERSION}-tapipy-{tapipy.__version__}", resource_set)
+        return tapis.get_spec_dir(path) # seeds a new directory with the bundled prod specs, which tapipy falls back on
+
+    def load_spec(self, resource_set: str, resource_name: str) -> dict:
+        key = (resource_set, resource_name)
+        with self.lock:
+            if key in self.parsed_specs:
+                return self.parsed_specs[key]
+            resources = {resource_name:tapis.RESOURCES[resource_set][resource_name]}
+            spec_dir = self.spec_dir(resource_set)
+            _, _, spec_path = tapis.get_file_info_from_url(resources[resource_name], spec_dir)
+            if not os.path.exists(spec_path):
+                tapis.download_and_pickle_spec_dicts(resources, spec_dir=spec_dir, download_latest_specs=False)
+            specs, _ = tapis.unpickle_and_create_specs(resources, spec_dir=spec_dir)
+            self.parsed_specs[key] = specs[resource_name]
+            return self.parsed_specs[key]
+
+    def bind(self, t, resource_set: str):
+        """
+        give a Tapis client built on the bundled specs the resources of another resource set
+        """
+        if resource_set in self.BUNDLED_RESOURCE_SETS:
+            return t
+        t.resource_set = resource_set
+        for resource_name in tapis.RESOURCES[resource_set]:
+            setattr(t, resource_name, LazyResource(self, resource_set, resource_name, t))
+        return t
@@ -0,0 +1,87 @@
+"""
+TENANT DIRECTORY
+Local copy of the Tapis tenant listing. The auth form and the tenant commands read from here, and the server refreshes it in the background
+once it is older than its TTL
+"""
+import os
+import json
+import time
+import threading
+
+from utilities import localCache
+
+
+class TenantDirectory:
+    TTL = 24 * 60 * 60 # seconds before the directory is refreshed in the background
+    CACHE_VERSION = 2
+
+    def __init__(self, cache_file: str | None = None, ttl: float | None = None):
+        self.cache_file = cache_file or os.path.join(localCache.cache_path('tenants'), 'directory.json')
+        self.ttl = self.TTL if ttl is None else ttl
+        self.lock = threading.Lock()
+        self.fetched_at = 0
+        self.tenant_map: dict[str, dict] = dict()
+        self.load()
+
+    def load(self):
+        """
+        read the directory from disk, ignoring anything from another cache version
+        """
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') != self.CACHE_VERSION:
+            return
+        with self.lock:
+            self.fetched_at = data['fetched_at']
+            self.tenant_map = data['tenants']
+
+    def save(self):
+        data = {'version':self.CACHE_VERSION, 'fetched_at':self.fetched_at, 'tenants':self.tenant_map}
+        temporary_file = f"{self.cache_file}.tmp"
+        with open(temporary_file, 'w') as f:
+            json.dump(data, f)
+        os.replace(temporary_file, self.cache_file) # so a crash mid write never leaves a corrupt directory
+
+    def refresh(self, t):
+        """
+        fetch the tenant listing from Tapis. Blocking, run it on the command executor
+        """
+        tenants = t.tenants.list_tenants()
+        tenant_map = {tenant.tenant_id:{'tenant_id':tenant.tenant_id,
+                                        'uri':tenant.base_url.split('//')[1],
+                                        'base_url':tenant.base_url,
+                                        'site_id':tenant.site_id,
+                                        'owner':tenant.owner,
+                                        'description':tenant.description} for tenant in tenants}
+        with self.lock:
+            self.tenant_map = tenant_map
+            self.fetched_at = time.time()
+            self.save()
+        return len(tenant_map)
+
+    def is_empty(self) -> bool:
+        return not self.tenant_map
+
+    def is_stale(self) -> bool:
+        return time.time() - self.fetched_at > self.ttl
+
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def tenants(self) -> list[dict]:
+        return list(self.tenant_map.values())
+
+    def tenant(self, tenant_id: str) -> dict | None:
+        return self.tenant_map.get(tenant_id, None)
+
+    def uris(self) -> list[str]:
+        return [tenant['uri'] for tenant in self.tenant_map.values()]
+
+    def tenant_id_for(self, uri: str) -> str | None:
+        for tenant in self.tenant_map.values():
+            if tenant['uri'] == uri:
+                return tenant['tenant_id']
+        return None
@@ -0,0 +1,37 @@
+"""
+ARGUMENT PARSER
+Builds the argparse parser for command lines from the server's argument catalog. Kept to the standard library, the one shot client imports it
+"""
+import argparse
+
+
+def argument_default(arg: dict):
+    if (arg['action'] == 'store_true' and arg['arg_type'] == 'standard') or (arg['arg_type'] == 'form' and arg['flattening_type'] == 'FLATTEN'):
+        return False
+    elif (arg['action'] == 'store_false' and arg['arg_type'] == 'standard') or (arg['arg_type'] != 'standard' and arg['required']):
+        return True
+    return None
+
+
+def build_parser(arguments: dict, error_handler, only: list[str] | None = None) -> argparse.ArgumentParser:
+    """
+    build the parser from the argument catalog. Passing the command line tokens in only adds just the arguments they name, and the
+    defaults of every other argument are set directly on the parser so the parsed namespace is the same as the full parser's
+    """
+    parser = argparse.ArgumentParser(description="Command Line Argument Parser", exit_on_error=False, usage=argparse.SUPPRESS, add_help=False, conflict_handler='resolve')
+    parser.add_argument('command_selection')
+    parser.add_argument('positionals', nargs='*')
+    parser.error = error_handler
+    
+    flags = [token.split('=')[0] for token in only if token.startswith('-')] if only is not None else None
+    skipped_defaults = dict()
+    for arg_name, arg in arguments.items():
+        default = argument_default(arg)
+        if flags is not None and not any(flag == f"-{arg['truncated_arg']}" or (flag.startswith('--') and arg['full_arg'].startswith(flag)) for flag in flags):
+            skipped_defaults[arg['full_arg'][2:].replace('-', '_')] = default
+            continue
+        parser.add_argument(f"-{arg['truncated_arg']}", arg['full_arg'],
+                            action=arg['action'], default=default)
+    skipped_defaults.pop('positionals', None) # the positional argument always fills this in, as it does in the full parser
+    parser.set_defaults(**skipped_defaults)
+    return parser
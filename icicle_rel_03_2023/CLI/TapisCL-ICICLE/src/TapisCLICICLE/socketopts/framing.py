@@ -0,0 +1,23 @@
+"""
+FRAMING
+Wire constants shared by the full socket layer and the one shot client, kept free of heavy imports so a one shot run doesnt load pydantic
+"""
+import struct
+
+
+# framing. The client opens a connection by sending FRAME_MAGIC followed by the protocol version byte. If the server accepts, it echoes the same
+# preamble back and every message after that is a 4 byte big endian payload length followed by the payload. Legacy clients never send the preamble.
+# From version 2 the client follows the preamble with a json frame offering its serializers, and the server answers with a json frame naming its pick.
+# From version 3 the client answers StartupData with the hash of its cached argument catalog, and the server only sends the catalog if it differs.
+# Connections below that, framed or legacy, are sent the catalog without being asked
+FRAME_MAGIC = b'\x00TCLF'
+PROTOCOL_VERSION = 3
+CATALOG_HASH_VERSION = 3
+FRAME_HEADER = struct.Struct('!I')
+PREAMBLE_SIZE = len(FRAME_MAGIC) + 1
+NEGOTIATION_TIMEOUT = 0.5
+
+# one shot connections send ONE_SHOT_MAGIC and the protocol version instead, get no echo, and go straight to a single json framed
+# CommandData. The server answers it and closes the connection
+ONE_SHOT_MAGIC = b'\x00TCL1'
+ONE_SHOT_PREAMBLE = ONE_SHOT_MAGIC + bytes((PROTOCOL_VERSION,))
@@ -14,6 +14,7 @@ class BaseSchema(BaseModel):
     error: str = str()
     system: str = str()
     pwd: str = str()
+    request_id: Optional[str] # set by clients that pipeline commands. Everything sent for a command carries its id, so responses can arrive in any order
 
 
 class CommandData(BaseSchema):
@@ -21,6 +22,23 @@ class CommandData(BaseSchema):
     Command execution request sent from the client to the server to execute a specified command
     """
     schema_type = 'CommandData'
+    catalog_hash: Optional[str] # set by one shot clients, which parse with a cached catalog
+
+
+class BatchData(BaseSchema):
+    """
+    run several commands in one request. request_content holds 'commands', a list of command kwargs as they would be sent in CommandData,
+    and optionally 'concurrency'
+    """
+    schema_type = 'BatchData'
+
+
+class BatchItem(BaseSchema):
+    """
+    the result of one command from a batch, sent as soon as it finishes. index is the command's position in the batch
+    """
+    schema_type: str = 'BatchItem'
+    index: int = 0
 
 
 class PasswordAuthData(BaseSchema):
@@ -40,6 +58,7 @@ class StartupData(BaseSchema):
     initial: bool = False
     username: Optional[str]
     url: Optional[str]
+    catalog_hash: Optional[str]
 
 
 class ResponseData(BaseSchema):
@@ -52,6 +71,24 @@ class ResponseData(BaseSchema):
     exit_status = 0
     
 
+class StreamData(BaseSchema):
+    """
+    rows of a streaming command's result, sent as they are produced. The ResponseData that follows the last chunk ends the result
+    """
+    schema_type: str = 'StreamData'
+    rows: list = list()
+    
+
+class ProgressData(BaseSchema):
+    """
+    how far a transfer the command is running has got, sent while it runs. total is None when the size isnt known
+    """
+    schema_type: str = 'ProgressData'
+    label: str = str()
+    transferred: int = 0
+    total: Optional[int]
+
+
 class FormRequest(BaseSchema):
     """
     Request seperate input for some command parameters. If the arguments_list is empty, this will be interpreted as an expression request for something like neo4j
@@ -0,0 +1,95 @@
+'''
+SERIALIZERS
+Serializers for socket payloads. The client offers the codecs it has installed during the handshake, and the server picks the first one it also supports.
+orjson and msgpack are optional, the stdlib json codec is always available
+'''
+import json
+import abc
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def _default(obj):
+    """
+    sets and tuples show up in command results, everything else should have been converted by the data formatters already
+    """
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {obj.__class__.__name__} is not serializable")
+
+
+class BaseCodec(abc.ABC):
+    name: str = None
+
+    @abc.abstractmethod
+    def dumps(self, data) -> bytes:
+        pass
+
+    @abc.abstractmethod
+    def loads(self, payload: bytes | bytearray | memoryview):
+        pass
+
+
+class JsonCodec(BaseCodec):
+    name = 'json'
+
+    def dumps(self, data) -> bytes:
+        return json.dumps(data, default=_default).encode()
+
+    def loads(self, payload):
+        if isinstance(payload, memoryview):
+            payload = payload.tobytes()
+        return json.loads(payload)
+
+
+class OrjsonCodec(BaseCodec):
+    name = 'orjson'
+
+    def dumps(self, data) -> bytes:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, payload):
+        return orjson.loads(payload)
+
+
+class MsgpackCodec(BaseCodec):
+    name = 'msgpack'
+
+    def dumps(self, data) -> bytes:
+        return msgpack.packb(data, default=_default, use_bin_type=True)
+
+    def loads(self, payload):
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+
+
+# in order of preference
+CODECS: dict[str, BaseCodec] = dict()
+if orjson:
+    CODECS[OrjsonCodec.name] = OrjsonCodec()
+if msgpack:
+    CODECS[MsgpackCodec.name] = MsgpackCodec()
+CODECS[JsonCodec.name] = JsonCodec()
+
+DEFAULT_CODEC = CODECS[JsonCodec.name]
+
+
+def available_codecs() -> list[str]:
+    return list(CODECS.keys())
+
+
+def select_codec(offered: list[str]) -> BaseCodec:
+    """
+    pick the first codec from the client's offer that is installed here. Falls back to json
+    """
+    for name in offered:
+        if name in CODECS:
+            return CODECS[name]
+    return DEFAULT_CODEC
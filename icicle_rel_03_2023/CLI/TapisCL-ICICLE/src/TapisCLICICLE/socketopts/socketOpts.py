@@ -1,22 +1,30 @@
 import json
 import typing
+import asyncio
+import contextvars
 from pprint import pformat
 
 import pydantic
 
 
 try:
-    from socketopts import schemas
+    from socketopts import schemas, serializers
+    from socketopts.framing import FRAME_MAGIC, PROTOCOL_VERSION, FRAME_HEADER, PREAMBLE_SIZE, NEGOTIATION_TIMEOUT, ONE_SHOT_MAGIC
     from utilities import logger, exceptions
 except:
-    from . import schemas
+    from . import schemas, serializers
+    from .framing import FRAME_MAGIC, PROTOCOL_VERSION, FRAME_HEADER, PREAMBLE_SIZE, NEGOTIATION_TIMEOUT, ONE_SHOT_MAGIC
     from ..utilities import logger, exceptions
 
 
 schema_types: dict = {
         'CommandData':schemas.CommandData,
+        'BatchData':schemas.BatchData,
+        'BatchItem':schemas.BatchItem,
         'StartupData':schemas.StartupData,
         'ResponseData':schemas.ResponseData,
+        'StreamData':schemas.StreamData,
+        'ProgressData':schemas.ProgressData,
         'FormRequest':schemas.FormRequest,
         'FormResponse':schemas.FormResponse,
         'AuthRequest':schemas.AuthRequest,
@@ -24,6 +32,11 @@ schema_types: dict = {
     }
 
 
+CURRENT_REQUEST: contextvars.ContextVar = contextvars.ContextVar('request_id', default=None) # the pipelined command a server task is running
+INTERACTIVE: contextvars.ContextVar = contextvars.ContextVar('interactive', default=True) # whether the command a server task is running can prompt the user
+PROMPT_SCHEMAS = ('FormRequest', 'AuthRequest', 'ConfirmationRequest')
+
+
 class BaseSocketOpts(logger.ConnectionLogger):
     """
     behind the scenes, low level functions to handle the socket operations asynchronoously on the server
@@ -31,6 +44,22 @@ class BaseSocketOpts(logger.ConnectionLogger):
     def __init__(self, name, debug=False):
         self.initialize_logger(f"{name} LOGGER")
         self.debug_state = debug
+        self.framed = False
+        self.one_shot = False
+        self.protocol_version = 0 # negotiated protocol version, 0 for the legacy json stream
+        self.serializer: serializers.BaseCodec = serializers.DEFAULT_CODEC
+
+    def build_schema(self, data: dict) -> typing.Type[schemas.BaseSchema]:
+        """
+        the client and server only ever talk over localhost, and every message was built from a validated schema on the other end, so skip re-validation
+        """
+        return schema_types[data['schema_type']].construct(**data)
+
+    def flatten_schema(self, data: typing.Type[schemas.BaseSchema]) -> dict:
+        """
+        schema fields are plain containers, so a shallow field map serializes the same as .dict() without deep copying large results
+        """
+        return dict(data)
 
     def debug(self, operation: typing.Literal["SENDING", "RECEIVED", "WAITING"], data: str | typing.Type[schemas.BaseSchema], message: str | None = None):
         if self.debug_state:
@@ -52,6 +81,17 @@ class ClientSocketOpts(BaseSocketOpts):
     """
     synchronous sockets to be used by clients
     """
+    def __recv_exactly(self, connection, size: int) -> bytearray:
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        received = 0
+        while received < size:
+            chunk_size = connection.recv_into(view[received:], size - received)
+            if not chunk_size:
+                raise ConnectionResetError("The server closed the connection mid message")
+            received += chunk_size
+        return buffer
+
     def __json_receive_explicit(self, connection):
         json_data = ""
         while True:
@@ -67,16 +107,45 @@ class ClientSocketOpts(BaseSocketOpts):
         json_data = json.dumps(data)
         connection.send(json_data.encode())
 
+    def __framed_receive(self, connection):
+        size, = FRAME_HEADER.unpack(self.__recv_exactly(connection, FRAME_HEADER.size))
+        return self.serializer.loads(self.__recv_exactly(connection, size))
+
+    def __framed_send(self, connection, data):
+        payload = self.serializer.dumps(data)
+        connection.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+
+    def negotiate_framing(self):
+        """
+        request the length prefixed wire protocol from the server. Must be called before any other data is exchanged on the connection
+        """
+        self.connection.sendall(FRAME_MAGIC + bytes((PROTOCOL_VERSION,)))
+        reply = bytes(self.__recv_exactly(self.connection, PREAMBLE_SIZE))
+        if reply[:-1] != FRAME_MAGIC:
+            raise ConnectionError(f"The server replied to protocol negotiation with an unknown preamble {reply}")
+        self.protocol_version = reply[-1]
+        self.framed = reply[-1] >= 1
+        if reply[-1] >= 2:
+            self.__framed_send(self.connection, {'serializers':serializers.available_codecs()})
+            selected = self.__framed_receive(self.connection)['serializer']
+            self.serializer = serializers.CODECS[selected]
+
     def send(self, data: typing.Type[schemas.BaseSchema]):
         self.debug('SENDING', data)
-        self.__json_send_explicit(self.connection, data.dict())
+        if self.framed:
+            self.__framed_send(self.connection, self.flatten_schema(data))
+        else:
+            self.__json_send_explicit(self.connection, self.flatten_schema(data))
 
     def receive(self) -> typing.Type[schemas.BaseSchema]:
         self.debug("WAITING", "Awaiting data receive")
-        data = self.__json_receive_explicit(self.connection)
-        schema_type = schema_types[data['schema_type']]
-        self.debug('RECEIVED', schema_type(**data))
-        return schema_type(**data)
+        if self.framed:
+            data = self.__framed_receive(self.connection)
+        else:
+            data = self.__json_receive_explicit(self.connection)
+        formatted_data = self.build_schema(data)
+        self.debug('RECEIVED', formatted_data)
+        return formatted_data
 
 
 class ServerSocketOpts(BaseSocketOpts):
@@ -87,12 +156,15 @@ class ServerSocketOpts(BaseSocketOpts):
         super().__init__(name, debug=debug)
         self.system = ''
         self.pwd = ''
+        self.request_queues: dict[str, asyncio.Queue] = dict()
 
     async def __json_receive_explicit_async(self):
         json_data = ""
         while True:
             try: 
                 byte_buffer = await self.reader.read(n=1024)
+                if not byte_buffer: # the client closed the connection, as readexactly reports it on a framed connection
+                    raise asyncio.IncompleteReadError(json_data.encode(), None)
                 json_data += byte_buffer.decode()
                 return json.loads(json_data) 
             except ValueError: # if json is invalid, keep going
@@ -100,24 +172,97 @@ class ServerSocketOpts(BaseSocketOpts):
             except BlockingIOError: # this is raised in the event that it tries to receive data when no data available due to non blocking
                 continue
 
+    async def __framed_receive_async(self):
+        header = await self.reader.readexactly(FRAME_HEADER.size)
+        size, = FRAME_HEADER.unpack(header)
+        return self.serializer.loads(await self.reader.readexactly(size))
+
+    async def __framed_send_async(self, data: dict):
+        payload = self.serializer.dumps(data)
+        self.writer.writelines((FRAME_HEADER.pack(len(payload)), payload))
+        await self.writer.drain()
+
+    async def negotiate_framing(self, timeout: float = NEGOTIATION_TIMEOUT):
+        """
+        wait briefly for the framing preamble. Clients from before the framed protocol send nothing until the server speaks, so on timeout
+        the connection stays on the legacy json stream
+        """
+        try:
+            preamble = await asyncio.wait_for(self.reader.readexactly(PREAMBLE_SIZE), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.logger.info('No framing preamble received, using the legacy protocol')
+            return False
+        if preamble[:-1] == ONE_SHOT_MAGIC:
+            self.framed = self.one_shot = True # json framed, and the client skips negotiation to save the round trip
+            self.protocol_version = preamble[-1]
+            self.logger.info('One shot connection received')
+            return self.framed
+        if preamble[:-1] != FRAME_MAGIC:
+            raise exceptions.ClientSideError(f"Received unknown protocol preamble {preamble}")
+        version = min(preamble[-1], PROTOCOL_VERSION)
+        self.writer.write(FRAME_MAGIC + bytes((version,)))
+        await self.writer.drain()
+        self.protocol_version = version
+        self.framed = version >= 1
+        if version >= 2:
+            offer = await self.__framed_receive_async()
+            self.serializer = serializers.select_codec(offer.get('serializers', []))
+            await self.__framed_send_async({'serializer':self.serializer.name})
+        self.logger.info(f'Negotiated framed protocol version {version} with the {self.serializer.name} serializer')
+        return self.framed
+
     async def send(self, data: typing.Type[schemas.BaseSchema]):
         if data.request_content:
             for key, value in data.request_content.items():
                 if not isinstance(value, (str, list, tuple, bool, int, dict, set)) and value != None:
                     data.request_content[key] = value.json()
+        if data.schema_type in PROMPT_SCHEMAS and not INTERACTIVE.get(): # concurrent batch items would read each other's replies
+            raise exceptions.InteractiveInputError(data.schema_type)
         self.debug('SENDING', data, message=f'Sending data of type {data.schema_type} to the client')
+        if data.request_id is None:
+            data.request_id = CURRENT_REQUEST.get()
         data.pwd = self.pwd
         data.system = self.system
-        json_data = json.dumps(data.dict())
-        self.writer.write(json_data.encode())
+        if self.framed:
+            await self.__framed_send_async(self.flatten_schema(data))
+            return
+        self.writer.write(json.dumps(self.flatten_schema(data)).encode())
         await self.writer.drain()
 
+    async def read_message(self) -> typing.Type[schemas.BaseSchema]:
+        """
+        read the next message off the connection, whichever command it belongs to
+        """
+        if self.framed:
+            data = await self.__framed_receive_async()
+        else:
+            data = await self.__json_receive_explicit_async()
+        formatted_data = self.build_schema(data)
+        self.debug('RECEIVED', formatted_data, message=f'Successfully received data of type {formatted_data.schema_type}')
+        return formatted_data
+
+    def open_request(self, request_id: str):
+        self.request_queues[request_id] = asyncio.Queue()
+
+    def close_request(self, request_id: str):
+        self.request_queues.pop(request_id, None)
+
+    def route_message(self, message: typing.Type[schemas.BaseSchema]):
+        """
+        hand a form response to the pipelined command waiting for it
+        """
+        if message.request_id not in self.request_queues:
+            self.logger.warning(f"Dropping a {message.schema_type} for request {message.request_id}, which is not running")
+            return
+        self.request_queues[message.request_id].put_nowait(message)
+
     async def receive(self):
         self.debug("WAITING", "Awaiting data receive", message='Waiting to receive data from the client on this connection')
-        data = await self.__json_receive_explicit_async()
-        schema_type = schema_types[data['schema_type']]
-        formatted_data = schema_type(**data)
-        self.debug('RECEIVED', formatted_data, message=f'Successfully received data of type {formatted_data.schema_type}')
+        request_id = CURRENT_REQUEST.get()
+        if request_id in self.request_queues: # a pipelined command, the connection's receive loop reads the stream and routes its replies here
+            formatted_data = await self.request_queues[request_id].get()
+        else:
+            formatted_data = await self.read_message()
         if formatted_data.error:
             raise exceptions.ClientSideError(formatted_data.error)
         return formatted_data
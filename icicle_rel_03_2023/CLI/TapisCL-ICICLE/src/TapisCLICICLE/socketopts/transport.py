@@ -0,0 +1,170 @@
+"""
+TRANSPORT
+Where the client finds the server. Where they are available the server listens on a unix domain socket in a per-user directory only its
+owner can enter, and nothing else. Loopback TCP is open to every user on the machine, so it is only used where there are no unix sockets,
+or when TCP_VARIABLE is set to 1.
+Once listening, the server writes a ready file and signals the pipe of the client that spawned it, so clients wait on that instead of
+retrying connect
+"""
+import os
+import sys
+import json
+import time
+import errno
+import select
+import socket
+import getpass
+import tempfile
+
+
+SOCKET_NAME = 'tapisclicicle.sock'
+READY_NAME = 'tapisclicicle.ready'
+READY_FD_VARIABLE = 'TAPISCLICICLE_READY_FD'
+TCP_VARIABLE = 'TAPISCLICICLE_TCP'
+
+
+def unix_available() -> bool:
+    return sys.platform != 'win32' and hasattr(socket, 'AF_UNIX')
+
+
+def tcp_enabled() -> bool:
+    """
+    whether the server listens on, and clients connect over, loopback TCP
+    """
+    return not unix_available() or os.environ.get(TCP_VARIABLE, '') == '1'
+
+
+def runtime_dir() -> str | None:
+    """
+    the per-user directory holding the socket, or None if it cant be trusted (someone else created it, or it is open to other users)
+    """
+    directory = os.environ.get('XDG_RUNTIME_DIR') or os.path.join(tempfile.gettempdir(), f"tapisclicicle-{os.getuid()}")
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        status = os.stat(directory)
+    except OSError:
+        return None
+    if status.st_uid != os.getuid() or status.st_mode & 0o077:
+        return None
+    return directory
+
+
+def socket_path() -> str | None:
+    if 'TAPISCLICICLE_SOCKET' in os.environ:
+        return os.environ['TAPISCLICICLE_SOCKET']
+    directory = runtime_dir()
+    return os.path.join(directory, SOCKET_NAME) if directory else None
+
+
+def bind_unix(path: str, backlog: int) -> socket.socket:
+    """
+    listen on path, replacing a socket file left behind by a server that died. Raises if a live server already owns it
+    """
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            os.unlink(path)
+        else:
+            raise OSError(errno.EADDRINUSE, f"A server is already listening on {path}")
+        finally:
+            probe.close()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    os.chmod(path, 0o600)
+    sock.listen(backlog)
+    sock.setblocking(False)
+    return sock
+
+
+def remove_unix(path: str):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def connect(ip: str, port: int) -> socket.socket:
+    """
+    connect to the server over this user's unix socket. Without one, raises rather than trying TCP, where any other user's server might
+    be listening, unless TCP is enabled
+    """
+    path = socket_path() if unix_available() else None
+    if path and os.path.exists(path):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path)
+            return sock
+        except OSError:
+            sock.close()
+            if not tcp_enabled():
+                raise
+    if not tcp_enabled():
+        raise FileNotFoundError(errno.ENOENT, "No server is listening on this user's socket", path)
+    return socket.create_connection((ip, port))
+
+
+def ready_file() -> str:
+    if 'TAPISCLICICLE_SOCKET' in os.environ:
+        return f"{os.environ['TAPISCLICICLE_SOCKET']}.ready"
+    directory = runtime_dir() if unix_available() else None
+    if directory:
+        return os.path.join(directory, READY_NAME)
+    return os.path.join(tempfile.gettempdir(), f"{getpass.getuser()}-{READY_NAME}")
+
+
+def signal_ready(port: int | None, path: str | None):
+    """
+    called by the server once it accepts connections. Writes the ready file, and wakes the client that spawned it if there is one
+    """
+    temporary_file = f"{ready_file()}.tmp"
+    with open(temporary_file, 'w') as f:
+        json.dump({'pid':os.getpid(), 'port':port, 'socket':path}, f)
+    os.replace(temporary_file, ready_file())
+    ready_fd = os.environ.pop(READY_FD_VARIABLE, None)
+    if ready_fd:
+        try:
+            os.write(int(ready_fd), b'1')
+            os.close(int(ready_fd))
+        except OSError:
+            pass
+
+
+def read_ready_file() -> dict | None:
+    try:
+        with open(ready_file(), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def remove_ready_file():
+    ready = read_ready_file()
+    if ready and ready['pid'] == os.getpid(): # never remove the file of a server that replaced this one
+        try:
+            os.unlink(ready_file())
+        except OSError:
+            pass
+
+
+def wait_for_ready(ready_fd: int | None, timeout: float, since: float) -> bool:
+    """
+    block until a spawned server signals its pipe. Without a pipe (windows), or if the spawned server exits without signalling
+    because another one won the race, watch for a ready file written after since
+    """
+    deadline = time.time() + timeout
+    if ready_fd is not None:
+        readable, _, _ = select.select([ready_fd], [], [], timeout)
+        signalled = bool(readable) and os.read(ready_fd, 1) == b'1'
+        os.close(ready_fd)
+        if signalled:
+            return True
+    while time.time() < deadline:
+        try:
+            if os.path.getmtime(ready_file()) >= since:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.05)
+    return False
@@ -0,0 +1,49 @@
+"""
+CANCELLABLE THREAD
+Background threads that are stopped cooperatively through an event, for loading animations and other helpers that should stop when the
+work they accompany finishes
+"""
+import threading
+import typing
+from concurrent.futures import Future
+
+
+class CancellableThread(threading.Thread):
+    """
+    runs target with a cancel_event keyword argument. The target checks or waits on the event and returns once it is set, so nothing
+    has to trace the thread to stop it. The outcome of the target is available through future
+    """
+    def __init__(self, target: typing.Callable, args: tuple = (), kwargs: dict | None = None, daemon: bool = True, name: str | None = None):
+        super().__init__(daemon=daemon, name=name)
+        self.target = target
+        self.target_args = args
+        self.target_kwargs = kwargs or dict()
+        self.cancel_event = threading.Event()
+        self.future = Future()
+
+    def run(self):
+        if not self.future.set_running_or_notify_cancel():
+            return
+        try:
+            self.future.set_result(self.target(*self.target_args, cancel_event=self.cancel_event, **self.target_kwargs))
+        except BaseException as e:
+            self.future.set_exception(e)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def cancel(self, timeout: float | None = None) -> bool:
+        """
+        ask the target to stop and wait up to timeout seconds for it to return. Returns whether the thread has finished
+        """
+        self.cancel_event.set()
+        if not self.is_alive():
+            self.future.cancel() # never started, so run() will skip the target
+            return True
+        if threading.current_thread() is not self:
+            self.join(timeout)
+        return not self.is_alive()
+
+    def result(self, timeout: float | None = None):
+        return self.future.result(timeout)
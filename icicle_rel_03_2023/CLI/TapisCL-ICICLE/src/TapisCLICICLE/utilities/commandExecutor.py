@@ -0,0 +1,193 @@
+"""
+COMMAND EXECUTOR
+Bounded thread pool used to run blocking tapipy calls off the server's event loop
+"""
+import queue
+import asyncio
+import functools
+import contextvars
+import threading
+import typing
+from concurrent.futures import ThreadPoolExecutor, Future
+
+try:
+    from utilities import exceptions
+except:
+    from . import exceptions
+
+
+class WorkerTask:
+    """
+    the task a worker runs a coroutine in, so the event loop that gave up waiting on it can cancel it from another thread
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loop = None
+        self.task = None
+        self.cancelled = False
+
+    def start(self, loop: asyncio.AbstractEventLoop, coroutine: typing.Coroutine) -> asyncio.Task | None:
+        """
+        on the worker. None if the wait timed out before the worker got to it
+        """
+        with self.lock:
+            if self.cancelled:
+                coroutine.close()
+                return None
+            self.loop, self.task = loop, loop.create_task(coroutine)
+            return self.task
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            if self.task is not None:
+                self.loop.call_soon_threadsafe(self.task.cancel)
+
+
+class CommandExecutor:
+    """
+    runs command coroutines on worker threads. Each worker keeps its own event loop, so a command run() can still be a coroutine while the
+    synchronous tapipy calls inside it block only that worker. Work runs in a copy of the caller's context, so it sees the execution
+    context of the connection that submitted it.
+    When a command times out its coroutine is cancelled on the worker, but the cancellation only lands at its next await: a blocking call
+    it is in, like a tapipy request, runs on until it returns. Until then the worker is abandoned, busy but waited on by no one, and counted
+    in stats()
+    """
+    STREAM_BUFFER = 100 # items a streaming command can produce ahead of the connection sending them
+    def __init__(self, max_workers: int = 8, default_timeout: float | None = None):
+        self.max_workers = max_workers
+        self.default_timeout = default_timeout
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tapis-command')
+        self.thread_state = threading.local()
+        self.abandoned: set[Future] = set() # work that timed out but is still running on a worker
+        self.timeouts = 0
+
+    def __worker_loop(self) -> asyncio.AbstractEventLoop:
+        loop = getattr(self.thread_state, 'loop', None)
+        if loop is None or loop.is_closed():
+            loop = asyncio.new_event_loop()
+            self.thread_state.loop = loop
+        return loop
+
+    def __run_coroutine_on_worker(self, coroutine_function: typing.Callable, args: tuple, kwargs: dict, worker_task: WorkerTask):
+        loop = self.__worker_loop()
+        task = worker_task.start(loop, coroutine_function(*args, **kwargs))
+        if task is not None:
+            return loop.run_until_complete(task)
+
+    def __stream_on_worker(self, generator_function: typing.Callable, args: tuple, kwargs: dict, items: queue.Queue, ready: typing.Callable,
+                           stop: threading.Event, worker_task: WorkerTask):
+        def put(message: tuple):
+            while not stop.is_set(): # blocks this worker while the buffer is full
+                try:
+                    items.put(message, timeout=0.1)
+                    ready()
+                    return
+                except queue.Full:
+                    continue
+
+        async def produce():
+            generator = generator_function(*args, **kwargs)
+            try:
+                async for item in generator:
+                    if stop.is_set():
+                        return
+                    put(('item', item))
+                put(('end', None))
+            except Exception as e:
+                put(('error', e))
+            finally:
+                await generator.aclose()
+        loop = self.__worker_loop()
+        task = worker_task.start(loop, produce())
+        if task is not None:
+            loop.run_until_complete(task)
+
+    def __submit(self, function: typing.Callable, *args) -> Future:
+        context = contextvars.copy_context()
+        return self.pool.submit(context.run, function, *args)
+
+    def __abandon(self, future: Future, worker_task: WorkerTask | None):
+        """
+        stop waiting on work that timed out. Work still queued is dropped, work already running is cancelled at its next await if it is a
+        coroutine, and counted as abandoned until it returns
+        """
+        self.timeouts += 1
+        if future.cancel():
+            return
+        if worker_task is not None:
+            worker_task.cancel()
+        self.abandoned.add(future)
+        future.add_done_callback(self.abandoned.discard)
+
+    async def __await_with_timeout(self, awaitable: typing.Awaitable, name: str, timeout: float | None, future: Future | None = None,
+                                   worker_task: WorkerTask | None = None):
+        if timeout is None:
+            timeout = self.default_timeout
+        try:
+            return await asyncio.wait_for(awaitable, timeout=timeout)
+        except asyncio.TimeoutError:
+            if future is not None:
+                self.__abandon(future, worker_task)
+            raise exceptions.CommandTimeoutError(name, timeout)
+
+    async def run_coroutine(self, coroutine_function: typing.Callable, *args, timeout: float | None = None, **kwargs):
+        """
+        run a coroutine function to completion on a worker thread
+        """
+        worker_task = WorkerTask()
+        future = self.__submit(self.__run_coroutine_on_worker, coroutine_function, args, kwargs, worker_task)
+        return await self.__await_with_timeout(asyncio.wrap_future(future), getattr(coroutine_function, '__qualname__', str(coroutine_function)),
+                                               timeout, future, worker_task)
+
+    async def stream(self, generator_function: typing.Callable, *args, timeout: float | None = None, **kwargs):
+        """
+        iterate an async generator function on a worker thread, yielding its items here as they are produced. The worker waits while
+        STREAM_BUFFER items are unread, so a slow client holds the command back rather than the whole listing piling up in memory. The
+        timeout applies to the wait for each item
+        """
+        loop = asyncio.get_running_loop()
+        items = queue.Queue(maxsize=self.STREAM_BUFFER)
+        ready = asyncio.Event()
+        stop = threading.Event()
+        worker_task = WorkerTask()
+        future = self.__submit(self.__stream_on_worker, generator_function, args, kwargs, items, functools.partial(loop.call_soon_threadsafe, ready.set),
+                               stop, worker_task)
+        name = getattr(generator_function, '__qualname__', str(generator_function))
+        try:
+            while True:
+                ready.clear()
+                try:
+                    kind, value = items.get_nowait()
+                except queue.Empty:
+                    await self.__await_with_timeout(ready.wait(), name, timeout, future, worker_task)
+                    continue
+                if kind == 'item':
+                    yield value
+                elif kind == 'error':
+                    raise value
+                else:
+                    return
+        finally:
+            stop.set() # a worker blocked on a full buffer sees this and stops
+
+    async def run_blocking(self, function: typing.Callable, *args, timeout: float | None = None, **kwargs):
+        """
+        run a plain blocking function on a worker thread. It cannot be interrupted, so on a timeout it runs on as abandoned work
+        """
+        future = self.__submit(functools.partial(function, *args, **kwargs))
+        return await self.__await_with_timeout(asyncio.wrap_future(future), getattr(function, '__qualname__', str(function)), timeout, future)
+
+    def stats(self) -> dict:
+        """
+        how many workers there are, and how many are still busy with work that timed out
+        """
+        return {
+            'max_workers':self.max_workers,
+            'abandoned_workers':len(self.abandoned),
+            'available_workers':self.max_workers - len(self.abandoned),
+            'timeouts':self.timeouts
+        }
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -79,4 +79,20 @@ class NoTenantClient(AttributeError):
     raise error when no client for tenant for auth
     """
     def __init__(self, tenant):
-        super().__init__(f"No client found for the tenant {tenant}")
\ No newline at end of file
+        super().__init__(f"No client found for the tenant {tenant}")
+
+
+class CommandTimeoutError(Exception):
+    """
+    raise error when a command takes longer than its allotted execution time
+    """
+    def __init__(self, command_name, timeout):
+        super().__init__(f"The command {command_name} did not finish within {timeout} seconds")
+
+
+class InteractiveInputError(Exception):
+    """
+    raise error when a command that cannot reach the user, like a batch item, needs to prompt for input
+    """
+    def __init__(self, prompt_type):
+        super().__init__(f"This command needs interactive input ({prompt_type}) and cannot run in a batch. Run it on its own")
@@ -0,0 +1,43 @@
+"""
+EXECUTION CONTEXT
+The state a command runs against: the Tapis client and credentials of the connection that sent it, and that connection's system and working
+directory. Command instances are shared by every connection, so the context of the running command lives in a context variable. Each
+connection's task, and the executor threads running its commands, see only their own
+"""
+import contextvars
+import typing
+
+
+CURRENT_CONTEXT: contextvars.ContextVar = contextvars.ContextVar('execution_context', default=None)
+
+
+class ExecutionContext:
+    def __init__(self, t: typing.Any = None, username: str = None, password: str = None, url: str = None):
+        self.t = t
+        self.username = username
+        self.password = password
+        self.url = url
+        self.system = ''
+        self.pwd = ''
+
+    def set_credentials(self, t: typing.Any, username: str, password: str, url: str):
+        """
+        after authenticating or switching tenants. The old system and working directory belong to the old tenant, so they are cleared
+        """
+        self.t = t
+        self.username = username
+        self.password = password
+        self.url = url
+        self.system = ''
+        self.pwd = ''
+
+    def activate(self) -> contextvars.Token:
+        return CURRENT_CONTEXT.set(self)
+
+    @staticmethod
+    def deactivate(token: contextvars.Token):
+        CURRENT_CONTEXT.reset(token)
+
+
+def current_context() -> ExecutionContext | None:
+    return CURRENT_CONTEXT.get()
@@ -0,0 +1,368 @@
+"""
+FILE TRANSFER
+Moves file contents between Tapis and the local disk in fixed size chunks, so memory use stays bounded whatever the file size. Downloads
+are written to a .part file next to the destination and renamed once complete and verified. An interrupted download picks up where its
+.part file ends.
+Large files are split into byte ranges fetched over several connections at once, each written into its place in a preallocated, memory
+mapped .part file. A .ranges file beside it records the finished ranges, so an interrupted download resumes those that are missing.
+Whole directories are moved as a manifest of files, run on a bounded transfer queue that retries failed files
+"""
+import os
+import posixpath
+import json
+import mmap
+import time
+import typing
+import asyncio
+import hashlib
+import threading
+import contextvars
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from socketopts import schemas
+
+
+CHUNK_SIZE = 1024 * 1024 # bytes read from the response and written to disk at a time
+HTTP_TIMEOUT = (10, 60) # seconds to connect, and to wait for each chunk. A stalled transfer fails instead of hanging
+PART_SUFFIX = '.part'
+RANGES_SUFFIX = '.ranges'
+RANGE_THRESHOLD = 32 * 1024 * 1024 # files at least this large are fetched as concurrent byte ranges
+RANGE_SIZE = 8 * 1024 * 1024
+RANGE_RETRIES = 3
+DEFAULT_CONCURRENCY = 4 # connections a large download uses at once
+
+
+class TransferError(Exception):
+    pass
+
+
+def content_url(t, system_id: str, path: str) -> str:
+    return f"{t.base_url}/v3/files/content/{quote(system_id)}/{quote(path.lstrip('/'))}"
+
+
+def tapis_uri(system_id: str, path: str) -> str:
+    return f"tapis://{system_id}/{path.lstrip('/')}"
+
+
+def auth_headers(t) -> dict:
+    return {'X-Tapis-Token':t.access_token.access_token}
+
+
+def byte_range(start: int, count: int) -> dict:
+    """
+    the Files service takes a byte range as a header of the first byte and how many bytes to send
+    """
+    return {'range':f"{start},{count}"}
+
+
+def range_honoured(response, count: int) -> bool:
+    """
+    whether a response to a byte range request holds just the count bytes asked for, rather than the whole file
+    """
+    return response.status_code == 206 or response.headers.get('Content-Length', None) == str(count)
+
+
+def parse_checksum(checksum: str) -> tuple[str, str]:
+    """
+    'sha256:<hex>' into ('sha256', '<hex>'). A bare digest is taken as sha256
+    """
+    algorithm, _, digest = checksum.rpartition(':')
+    algorithm = algorithm.lower() or 'sha256'
+    if algorithm not in hashlib.algorithms_available:
+        raise TransferError(f"Unknown checksum algorithm {algorithm}")
+    return algorithm, digest.lower()
+
+
+def file_digest(path: str, algorithm: str) -> str:
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def local_destination(destination: str, source: str) -> str:
+    """
+    downloading into a directory keeps the remote file name
+    """
+    if os.path.isdir(destination):
+        return os.path.join(destination, os.path.basename(source.rstrip('/')))
+    return destination
+
+
+def download_file(session, t, system_id: str, path: str, destination: str, size: int, checksum: str | None = None,
+                  progress: typing.Callable[[int, int], None] | None = None, concurrency: int = 1, chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    download a remote file of size bytes to destination. Blocking, run it on the command executor. Files of RANGE_THRESHOLD bytes or more
+    are fetched as concurrency byte ranges at once. Resumes an interrupted download, checks the size and, if given, the checksum, and only
+    then moves the file into place. Returns the number of bytes fetched
+    """
+    part_file = destination + PART_SUFFIX
+    ranged = os.path.exists(part_file + RANGES_SUFFIX) or (not os.path.exists(part_file) and concurrency > 1 and size >= RANGE_THRESHOLD)
+    if ranged:
+        fetched = download_ranges(session, t, system_id, path, part_file, size, max(concurrency, 1), progress, chunk_size)
+    else:
+        fetched = download_stream(session, t, system_id, path, part_file, size, progress, chunk_size)
+    received = os.path.getsize(part_file)
+    if received != size:
+        raise TransferError(f"Downloaded {received} of {size} bytes of {path}, run the download again to resume")
+    if checksum:
+        algorithm, expected = parse_checksum(checksum)
+        actual = file_digest(part_file, algorithm)
+        if actual != expected:
+            os.remove(part_file) # resuming would keep the bad bytes
+            remove_ranges_file(part_file)
+            raise TransferError(f"{algorithm} of {path} is {actual}, expected {expected}")
+    os.replace(part_file, destination)
+    remove_ranges_file(part_file)
+    if progress:
+        progress(size, size)
+    return fetched
+
+
+def download_stream(session, t, system_id: str, path: str, part_file: str, size: int, progress: typing.Callable[[int, int], None] | None,
+                    chunk_size: int) -> int:
+    """
+    one request for everything past the end of the .part file, appended to it as it arrives. If the server ignores the byte range and
+    sends the whole file, the .part file is written again from the start
+    """
+    start = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+    if start > size: # the remote file changed since the partial download
+        start = 0
+    fetched = 0
+    if start < size or size == 0:
+        headers = auth_headers(t)
+        if start:
+            headers.update(byte_range(start, size - start))
+        with session.get(content_url(t, system_id, path), headers=headers, stream=True, timeout=HTTP_TIMEOUT) as response:
+            response.raise_for_status()
+            if start and not range_honoured(response, size - start):
+                start = 0
+            with open(part_file, 'ab' if start else 'wb') as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    f.write(chunk)
+                    fetched += len(chunk)
+                    if progress and start + fetched < size: # completion is reported once the file is verified
+                        progress(start + fetched, size)
+    return fetched
+
+
+def read_ranges_file(part_file: str, size: int) -> set[int]:
+    """
+    the ranges an earlier, interrupted download of the same file finished
+    """
+    try:
+        with open(part_file + RANGES_SUFFIX, 'r') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return set()
+    if state.get('size') != size or state.get('range_size') != RANGE_SIZE or not os.path.exists(part_file) or os.path.getsize(part_file) != size:
+        return set()
+    return set(state['done'])
+
+
+def write_ranges_file(part_file: str, size: int, done: set[int]):
+    temporary_file = f"{part_file}{RANGES_SUFFIX}.tmp"
+    with open(temporary_file, 'w') as f:
+        json.dump({'size':size, 'range_size':RANGE_SIZE, 'done':sorted(done)}, f)
+    os.replace(temporary_file, part_file + RANGES_SUFFIX)
+
+
+def remove_ranges_file(part_file: str):
+    try:
+        os.remove(part_file + RANGES_SUFFIX)
+    except OSError:
+        pass
+
+
+def download_ranges(session, t, system_id: str, path: str, part_file: str, size: int, concurrency: int,
+                    progress: typing.Callable[[int, int], None] | None, chunk_size: int) -> int:
+    """
+    fetch the missing RANGE_SIZE byte ranges of the file on concurrency connections at once, each written straight into its place in the
+    memory mapped .part file. A range that fails is retried on a new request, up to RANGE_RETRIES times
+    """
+    done = read_ranges_file(part_file, size)
+    ranges = [index for index in range(-(-size // RANGE_SIZE)) if index not in done]
+    url = content_url(t, system_id, path)
+    lock = threading.Lock()
+    stop = threading.Event()
+    received = [sum(min(RANGE_SIZE, size - index * RANGE_SIZE) for index in done)]
+
+    def add_progress(count: int):
+        with lock:
+            received[0] += count
+            if progress and received[0] < size:
+                progress(received[0], size)
+
+    def fetch_range(index: int, output: mmap.mmap) -> int:
+        start = index * RANGE_SIZE
+        count = min(RANGE_SIZE, size - start)
+        error = None
+        for _ in range(RANGE_RETRIES):
+            written = 0
+            try:
+                with session.get(url, headers={**auth_headers(t), **byte_range(start, count)}, stream=True, timeout=HTTP_TIMEOUT) as response:
+                    response.raise_for_status()
+                    if not range_honoured(response, count):
+                        raise TransferError("The server ignored the byte range")
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        if stop.is_set():
+                            return written
+                        if written + len(chunk) > count:
+                            raise TransferError(f"The server sent more than the {count} bytes asked for")
+                        output[start + written:start + written + len(chunk)] = chunk
+                        written += len(chunk)
+                        add_progress(len(chunk))
+                if written != count:
+                    raise TransferError(f"The server sent {written} of {count} bytes")
+                with lock:
+                    done.add(index)
+                    write_ranges_file(part_file, size, done)
+                return count
+            except (OSError, TransferError) as e: # requests errors are OSErrors
+                add_progress(-written)
+                error = e
+        raise TransferError(f"Could not download bytes {start} to {start + count} of {path}: {error}")
+
+    with open(part_file, 'r+b' if done else 'w+b') as f:
+        f.truncate(size) # preallocate, so every range can be written in place
+        if not done:
+            write_ranges_file(part_file, size, done)
+        if not ranges:
+            return 0
+        with mmap.mmap(f.fileno(), size) as output:
+            try:
+                with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='tapis-range') as pool:
+                    futures = [pool.submit(fetch_range, index, output) for index in ranges]
+                    fetched = 0
+                    try:
+                        for future in as_completed(futures):
+                            fetched += future.result()
+                    except BaseException:
+                        stop.set() # the other ranges stop at their next chunk, and are fetched again on resume
+                        raise
+            finally:
+                output.flush()
+    return fetched
+
+
+class ProgressReporter:
+    """
+    sends ProgressData about a transfer to the connection that asked for it. Called from the worker thread doing the transfer, it sends at
+    most every INTERVAL seconds, and always once the transfer completes. Created on the server's event loop, in the context of the command,
+    so progress carries the command's request id. Legacy json clients read one message per command, so they get no progress
+    """
+    INTERVAL = 0.5
+    def __init__(self, connection, label: str):
+        self.connection = connection
+        self.label = label
+        self.loop = asyncio.get_running_loop()
+        self.context = contextvars.copy_context()
+        self.last_sent = 0.0
+        self.pending: set[asyncio.Task] = set()
+        self.lock = threading.Lock()
+
+    def __call__(self, transferred: int, total: int | None = None):
+        if not self.connection.framed:
+            return
+        now = time.monotonic()
+        with self.lock:
+            if transferred != total and now - self.last_sent < self.INTERVAL:
+                return
+            self.last_sent = now
+        message = schemas.ProgressData(label=self.label, transferred=transferred, total=total)
+        self.loop.call_soon_threadsafe(self.__send, message)
+
+    def __send(self, message: schemas.ProgressData):
+        task = self.loop.create_task(self.connection.send(message), context=self.context)
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def flush(self):
+        """
+        wait for the progress already reported to reach the client, so it arrives before the command's response
+        """
+        await asyncio.sleep(0) # progress reported from the event loop itself is only queued once the loop comes round
+        if self.pending:
+            await asyncio.gather(*self.pending, return_exceptions=True)
+
+
+def local_manifest(source: str, destination: str) -> list[dict]:
+    """
+    every file under the local directory source, paired with its path under the remote directory destination
+    """
+    manifest = list()
+    for root, directories, files in os.walk(source):
+        directories.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, source).split(os.sep)
+            manifest.append({'source':path, 'destination':posixpath.join(destination, *relative), 'size':os.path.getsize(path)})
+    return manifest
+
+
+def scan_local(source: str, prefix: str = '') -> dict[str, dict]:
+    """
+    the size and modification time in nanoseconds of every file under the local directory source, by posix path relative to it
+    """
+    files = dict()
+    with os.scandir(source) as entries:
+        for entry in entries:
+            relative = f"{prefix}{entry.name}"
+            if entry.is_dir():
+                files.update(scan_local(entry.path, f"{relative}/"))
+            elif entry.is_file():
+                stat = entry.stat()
+                files[relative] = {'size':stat.st_size, 'mtime':stat.st_mtime_ns}
+    return files
+
+
+def remote_manifest(files: typing.Iterable, source: str, destination: str) -> list[dict]:
+    """
+    the files of a recursive listing of the remote directory source, paired with their paths under the local directory destination
+    """
+    root = '/' + source.strip('/')
+    manifest = list()
+    for file in files:
+        if file.type != 'file':
+            continue
+        path = '/' + file.path.lstrip('/')
+        relative = posixpath.relpath(path, root)
+        if relative.startswith('..'):
+            raise TransferError(f"{path} was listed under {root} but is not inside it")
+        manifest.append({'source':path, 'destination':os.path.join(destination, *relative.split('/')), 'size':file.size})
+    return manifest
+
+
+class TransferQueue:
+    """
+    runs the transfers of a manifest on a bounded pool of worker threads, retrying a failed file up to RETRIES times. transfer moves one
+    manifest entry and returns the bytes it moved. A status for each file is yielded as it finishes, so in the order they complete
+    """
+    RETRIES = 3
+    BACKOFF = 0.5 # seconds before the first retry, doubling after each
+    def __init__(self, transfer: typing.Callable[[dict], int], workers: int = DEFAULT_CONCURRENCY):
+        self.transfer = transfer
+        self.workers = max(workers, 1)
+
+    def attempt(self, entry: dict) -> dict:
+        status = {'file':entry['source'], 'destination':entry['destination']}
+        for attempt in range(1, self.RETRIES + 1):
+            try:
+                transferred = self.transfer(entry)
+                return {**status, 'status':'OK', 'bytes':transferred, 'attempts':attempt}
+            except Exception as e:
+                error = e
+                if attempt < self.RETRIES:
+                    time.sleep(self.BACKOFF * 2 ** (attempt - 1))
+        return {**status, 'status':'FAILED', 'bytes':0, 'attempts':self.RETRIES, 'error':str(error)}
+
+    async def run(self, manifest: list[dict]):
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='tapis-transfer')
+        futures = [asyncio.wrap_future(pool.submit(self.attempt, entry)) for entry in manifest]
+        try:
+            for future in asyncio.as_completed(futures):
+                yield await future
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True) # files already moving finish, the rest are dropped
@@ -0,0 +1,17 @@
+"""
+LOCAL CACHE
+Per-user directory for data the client and server keep between sessions
+"""
+import os
+
+
+CACHE_ROOT = os.environ.get('TAPISCLICICLE_CACHE', os.path.join(os.path.expanduser('~'), '.tapisclicicle'))
+
+
+def cache_path(*parts: str) -> str:
+    """
+    return a directory inside the cache root, creating it if needed
+    """
+    path = os.path.join(CACHE_ROOT, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
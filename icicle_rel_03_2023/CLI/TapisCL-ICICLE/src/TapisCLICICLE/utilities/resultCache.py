@@ -0,0 +1,68 @@
+"""
+RESULT CACHE
+Results of read-only commands, kept for a few seconds so a repeated get_system or whoami does not go back to Tapis. Entries are keyed by
+tenant, user, command and arguments, expire after the command's time to live, and the least recently used are dropped past max_entries.
+Only the server's event loop thread touches the cache, so it needs no lock
+"""
+import json
+import time
+import typing
+from collections import OrderedDict
+
+
+class ResultCache:
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self.entries: OrderedDict[tuple, tuple[float, typing.Any, dict]] = OrderedDict() # key: (expires, result, arguments)
+        self.hits: dict[str, int] = dict()
+        self.misses: dict[str, int] = dict()
+
+    @staticmethod
+    def key(command: str, tenant: str | None, username: str | None, arguments: dict) -> tuple:
+        return (command, tenant, username, json.dumps(arguments, sort_keys=True, default=str))
+
+    def get(self, command: str, tenant: str | None, username: str | None, arguments: dict) -> tuple[bool, typing.Any]:
+        """
+        returns (True, result) on a hit, and (False, None) if there is no live entry
+        """
+        key = self.key(command, tenant, username, arguments)
+        entry = self.entries.get(key, None)
+        if entry and entry[0] > time.monotonic():
+            self.entries.move_to_end(key)
+            self.hits[command] = self.hits.get(command, 0) + 1
+            return True, entry[1]
+        if entry:
+            del self.entries[key]
+        self.misses[command] = self.misses.get(command, 0) + 1
+        return False, None
+
+    def put(self, command: str, tenant: str | None, username: str | None, arguments: dict, result: typing.Any, ttl: float):
+        key = self.key(command, tenant, username, arguments)
+        self.entries[key] = (time.monotonic() + ttl, result, arguments)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, command: str, tenant: str | None, arguments: dict) -> int:
+        """
+        drop the entries of command on tenant, for every user, whose arguments agree with arguments on every name the two share. Called
+        after a command changes a resource, e.g. delete_pod with pod_id drops every cached get_pod of that pod_id
+        """
+        stale = [key for key, (_, _, cached_arguments) in self.entries.items()
+                 if key[0] == command and key[1] == tenant
+                 and all(cached_arguments[name] == value for name, value in arguments.items() if name in cached_arguments)]
+        for key in stale:
+            del self.entries[key]
+        return len(stale)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        commands = sorted(set(self.hits) | set(self.misses))
+        return {
+            'entries':len(self.entries),
+            'hits':sum(self.hits.values()),
+            'misses':sum(self.misses.values()),
+            'commands':{command:{'hits':self.hits.get(command, 0), 'misses':self.misses.get(command, 0)} for command in commands}
+        }
@@ -0,0 +1,103 @@
+"""
+SYNC MANIFEST
+What the last sync of a local directory to a Tapis path left on the remote side. Each file's record pairs the size and modification time
+the local file had when it was sent with what the remote listing said about it, so the next sync only has to scan the local tree to find
+what changed. The remote tree is only listed again once the manifest is older than its TTL, or when asked
+"""
+import os
+import json
+import time
+import hashlib
+from datetime import datetime
+
+from utilities import localCache
+
+
+class SyncManifest:
+    TTL = 24 * 60 * 60 # seconds the remote side of the manifest is trusted without listing it again
+    CACHE_VERSION = 1
+
+    def __init__(self, tenant: str, username: str, system_id: str, source: str, destination: str, cache_root: str | None = None,
+                 ttl: float | None = None):
+        key = json.dumps([tenant, username, system_id, os.path.abspath(source), destination.rstrip('/')])
+        self.cache_file = os.path.join(cache_root or localCache.cache_path('sync'), f"{hashlib.sha256(key.encode()).hexdigest()}.json")
+        self.ttl = self.TTL if ttl is None else ttl
+        self.listed_at = 0
+        self.files: dict[str, dict] = dict() # path relative to the sync root: {'size', 'mtime', 'modified'[, 'sha256']}
+        self.load()
+
+    def load(self):
+        """
+        read the manifest from disk, ignoring anything from another cache version
+        """
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') != self.CACHE_VERSION:
+            return
+        self.listed_at = data['listed_at']
+        self.files = data['files']
+
+    def save(self):
+        data = {'version':self.CACHE_VERSION, 'listed_at':self.listed_at, 'files':self.files}
+        temporary_file = f"{self.cache_file}.tmp"
+        with open(temporary_file, 'w') as f:
+            json.dump(data, f)
+        os.replace(temporary_file, self.cache_file) # so a crash mid write never leaves a corrupt manifest
+
+    def fresh(self) -> bool:
+        return time.time() - self.listed_at < self.ttl
+
+    def merge_listing(self, remote: dict[str, dict]):
+        """
+        replace the remote side with a fresh listing of {relative path: {'size', 'modified'}}. A record is kept, with its local size and
+        modification time, only if the remote file is still the one this manifest sent
+        """
+        files = dict()
+        for path, listed in remote.items():
+            record = self.files.get(path, None)
+            if record and record.get('mtime') is not None and record['size'] == listed['size'] and record.get('modified') in (None, listed['modified']):
+                files[path] = {**record, 'modified':listed['modified']}
+            else:
+                files[path] = {'size':listed['size'], 'mtime':None, 'modified':listed['modified']}
+        self.files = files
+        self.listed_at = time.time()
+
+    def record(self, path: str, size: int, mtime: int, sha256: str | None = None):
+        """
+        after sending path. Its remote modification time is unknown until the tree is next listed
+        """
+        self.files[path] = {'size':size, 'mtime':mtime, 'modified':None}
+        if sha256:
+            self.files[path]['sha256'] = sha256
+
+    def changed(self, path: str, local: dict, digest=None) -> str | None:
+        """
+        why the local file needs sending, 'new' or 'changed', or None if the remote copy is current. Size and modification time decide,
+        against the local file as it was when this manifest sent it, or failing that against the remote modification time. digest,
+        if given, returns the file's sha256 to settle a file whose modification time moved but whose size did not
+        """
+        record = self.files.get(path, None)
+        if record is None:
+            return 'new'
+        if record['size'] != local['size']:
+            return 'changed'
+        if record.get('mtime') is not None:
+            if record['mtime'] == local['mtime']:
+                return None
+            if digest and record.get('sha256') and digest() == record['sha256']:
+                record['mtime'] = local['mtime'] # touched, not changed
+                return None
+            return 'changed'
+        if record.get('modified') and local['mtime'] <= parse_timestamp(record['modified']):
+            return None # the remote copy is newer than the last local edit
+        return 'changed'
+
+
+def parse_timestamp(timestamp: str) -> int:
+    """
+    a Tapis ISO 8601 timestamp in nanoseconds since the epoch, comparable with os.stat st_mtime_ns
+    """
+    return int(datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp() * 1e9)
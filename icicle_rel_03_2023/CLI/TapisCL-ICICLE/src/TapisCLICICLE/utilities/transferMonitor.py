@@ -0,0 +1,108 @@
+"""
+TRANSFER MONITOR
+Follows Tapis transfer tasks from the event loop while the Files service moves the data between systems. Each user with unfinished tasks
+gets one poller, which reads all of that user's tasks from a single getRecentTransferTasks call every INTERVAL seconds, only asking for a
+task by id if it has dropped off the recent list. watch_transfer waits on the snapshots the pollers keep
+"""
+import asyncio
+import typing
+
+
+TERMINAL_STATUSES = ('COMPLETED', 'CANCELLED', 'FAILED', 'FAILED_OPT')
+UNKNOWN = 'UNKNOWN' # the monitor gave up polling, the task may still be running
+
+
+def finished(snapshot: dict) -> bool:
+    return snapshot['status'] in TERMINAL_STATUSES or snapshot['status'] == UNKNOWN
+
+
+class TransferMonitor:
+    INTERVAL = 5 # seconds between polls of a user's transfer tasks
+    RECENT_LIMIT = 100 # tasks asked for in each getRecentTransferTasks call
+    ERROR_LIMIT = 5 # failed polls in a row before a user's tasks are given up on
+
+    def __init__(self, command_executor, interval: float | None = None):
+        self.command_executor = command_executor
+        self.interval = self.INTERVAL if interval is None else interval
+        self.tasks: dict[str, dict] = dict() # transfer task uuid: latest snapshot
+        self.versions: dict[str, int] = dict() # transfer task uuid: how many times its snapshot changed
+        self.watched: dict[tuple, set[str]] = dict() # (tenant, username): uuids of the unfinished tasks polled for
+        self.clients: dict[tuple, typing.Any] = dict() # (tenant, username): the Tapis client polled with
+        self.pollers: dict[tuple, asyncio.Task] = dict()
+        self.changed = asyncio.Condition()
+
+    @staticmethod
+    def snapshot(task) -> dict:
+        """
+        the progress of a Tapis TransferTask. Recent listings may leave out the byte count, which is then summed from the parent tasks
+        """
+        transferred = getattr(task, 'totalBytesTransferred', None)
+        if transferred is None:
+            transferred = sum(getattr(parent, 'bytesTransferred', 0) or 0 for parent in getattr(task, 'parentTasks', None) or [])
+        return {
+            'uuid':str(task.uuid),
+            'status':str(task.status),
+            'transferred':transferred,
+            'total':getattr(task, 'estimatedTotalBytes', None) or None,
+            'completeTransfers':getattr(task, 'completeTransfers', None),
+            'totalTransfers':getattr(task, 'totalTransfers', None),
+            'errorMessage':getattr(task, 'errorMessage', None)
+        }
+
+    async def update(self, snapshot: dict) -> dict:
+        async with self.changed:
+            if self.tasks.get(snapshot['uuid'], None) != snapshot:
+                self.tasks[snapshot['uuid']] = snapshot
+                self.versions[snapshot['uuid']] = self.versions.get(snapshot['uuid'], 0) + 1
+                self.changed.notify_all()
+        return snapshot
+
+    async def track(self, key: tuple, t, task) -> dict:
+        """
+        start following a transfer task of the user key, given the task Tapis returned for it
+        """
+        snapshot = await self.update(self.snapshot(task))
+        if finished(snapshot):
+            return snapshot
+        self.clients[key] = t
+        self.watched.setdefault(key, set()).add(snapshot['uuid'])
+        if key not in self.pollers or self.pollers[key].done():
+            self.pollers[key] = asyncio.ensure_future(self.poll(key))
+        return snapshot
+
+    async def wait(self, uuid: str, version: int) -> tuple[dict, int]:
+        """
+        the snapshot of a tracked task once it is newer than version, and its new version
+        """
+        async with self.changed:
+            await self.changed.wait_for(lambda: self.versions.get(uuid, 0) > version)
+            return self.tasks[uuid], self.versions[uuid]
+
+    async def poll(self, key: tuple):
+        errors = 0
+        while self.watched.get(key, None):
+            await asyncio.sleep(self.interval)
+            t = self.clients[key]
+            try:
+                recent = await self.command_executor.run_blocking(t.files.getRecentTransferTasks, limit=self.RECENT_LIMIT)
+                snapshots = {str(task.uuid):self.snapshot(task) for task in recent if str(task.uuid) in self.watched[key]}
+                for uuid in self.watched[key] - set(snapshots):
+                    task = await self.command_executor.run_blocking(t.files.getTransferTask, transferTaskId=uuid, includeSummary=True)
+                    snapshots[uuid] = self.snapshot(task)
+                errors = 0
+            except Exception as e:
+                errors += 1
+                if errors < self.ERROR_LIMIT:
+                    continue
+                snapshots = {uuid:{**self.tasks[uuid], 'status':UNKNOWN, 'errorMessage':f"Stopped following the transfer: {e}"}
+                             for uuid in self.watched[key]}
+            for uuid, snapshot in snapshots.items():
+                await self.update(snapshot)
+                if finished(snapshot):
+                    self.watched[key].discard(uuid)
+        self.watched.pop(key, None)
+        self.clients.pop(key, None)
+
+    def close(self):
+        for poller in self.pollers.values():
+            poller.cancel()
@@ -0,0 +1,74 @@
+"""
+500 get_job_status calls as one batch at several concurrency levels, against a server in this process using the stubbed Tapis from
+stress_connections. Every 50th job doesnt exist, and has to come back as a failed item without stopping the batch. Commands that prompt
+for input, like delete_pod, have to fail in their item instead of reading each other's replies. No Tapis access is needed:
+    python tests/benchmark_batch.py
+"""
+import os
+import time
+import argparse
+import tempfile
+import threading
+
+from stress_connections import asyncio, schemas, catalog, StubServer, StubTapis, PORT
+from benchmark_pipelining import connect
+from TapisCLICICLE.client import cli
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--commands', type=int, default=500)
+    parser.add_argument('-l', '--latency', type=float, default=0.02, help="seconds each stubbed Tapis call blocks for")
+    args = parser.parse_args()
+
+    stub = StubServer('127.0.0.1', PORT)
+    stub.initial = False
+    stub.username, stub.url = 'benchmark', 'tacc.tapis.io'
+    stub.t = StubTapis('benchmark', args.latency)
+    stub.update_credentials(stub.t, stub.username, None)
+    loop = asyncio.new_event_loop()
+    server_thread = threading.Thread(target=loop.run_until_complete, args=(stub.main(),), daemon=True)
+    server_thread.start()
+    time.sleep(0.5)
+
+    job_ids = [f"missing-{index}" if index % 50 == 0 else f"job-{index}" for index in range(args.commands)]
+    parser = catalog.build_parser(stub.argument_catalog, lambda args: None)
+    commands = [vars(parser.parse_args(['get_job_status', '--jobUuid', job_id])) for job_id in job_ids]
+    timings = dict()
+    try:
+        client = cli.CLI.__new__(cli.CLI) # only the connection, not the interactive setup in __init__
+        client.connection = connect(stub)
+        for concurrency in (1, 2, 4, stub.EXECUTOR_WORKERS):
+            start = time.perf_counter()
+            items, summary = client.submit_batch(commands, concurrency=concurrency)
+            timings[concurrency] = time.perf_counter() - start
+            failed = [item.index for item in items if item.error]
+            if summary['succeeded'] + summary['failed'] != args.commands or failed != list(range(0, args.commands, 50)):
+                raise RuntimeError(f"Unexpected batch result {summary}, failed items {failed}")
+
+        prompting = [vars(parser.parse_args(['delete_pod', f"pod-{index}"])) for index in range(2)] + commands[1:2]
+        items, summary = client.submit_batch(prompting)
+        assert [bool(item.error) for item in sorted(items, key=lambda item: item.index)] == [True, True, False], items
+        assert all('interactive input' in item.error for item in items if item.error), items
+
+        batch_file = os.path.join(tempfile.mkdtemp(), 'jobs.txt')
+        with open(batch_file, 'w') as f:
+            f.write("# one command per line\n" + "\n".join(f"get_job_status --jobUuid {job_id}" for job_id in job_ids[:20]))
+        client.connection.send(schemas.CommandData(request_content=vars(parser.parse_args(['batch', batch_file]))))
+        streamed = 0
+        while (response := client.connection.receive()).schema_type == 'BatchItem':
+            streamed += 1
+        print(f"batch {batch_file}: {streamed} items streamed, summary {response.message['message']}")
+        print("commands that prompt for input refused in their batch items: ok")
+        client.connection.close()
+    finally:
+        loop.call_soon_threadsafe(stub.request_shutdown)
+        server_thread.join(timeout=5)
+
+    print(f"{args.commands} x get_job_status in one batch, stubbed Tapis latency {args.latency*1000:.0f} ms, {stub.EXECUTOR_WORKERS} executor workers")
+    for concurrency, elapsed in timings.items():
+        print(f"concurrency {concurrency}: {elapsed:.2f} s  ({args.commands/elapsed:.0f} commands/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Time of repeated read-only commands answered from the server's result cache versus sent to Tapis every time with --no-cache, against a
+server in this process using the stubbed Tapis from stress_connections. Also checks that a command changing a resource drops its cached
+result: start_pod has to make the next get_pod of that pod ask Tapis again. No Tapis access is needed:
+    python tests/benchmark_cache.py
+"""
+import time
+import argparse
+import threading
+
+from stress_connections import asyncio, schemas, catalog, StubServer, StubTapis, PORT
+from benchmark_pipelining import connect
+
+
+def command(connection, arguments: dict, *tokens: str):
+    kwargs = vars(catalog.build_parser(arguments, lambda args: None, only=list(tokens)).parse_args(list(tokens)))
+    connection.send(schemas.CommandData(request_content=kwargs))
+    response = connection.receive()
+    if response.error:
+        raise RuntimeError(response.error)
+    return response.message['message']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--repeats', type=int, default=200)
+    parser.add_argument('-l', '--latency', type=float, default=0.05, help="seconds each stubbed Tapis call blocks for")
+    args = parser.parse_args()
+
+    stub = StubServer('127.0.0.1', PORT)
+    stub.initial = False
+    stub.username, stub.url = 'benchmark', 'tacc.tapis.io'
+    stub.t = StubTapis('benchmark', args.latency)
+    stub.update_credentials(stub.t, stub.username, None)
+    loop = asyncio.new_event_loop()
+    server_thread = threading.Thread(target=loop.run_until_complete, args=(stub.main(),), daemon=True)
+    server_thread.start()
+    time.sleep(0.5)
+
+    results = dict()
+    try:
+        connection = connect(stub)
+        for name, tokens in (('--no-cache', ['whoami', '--no-cache']), ('cached', ['whoami'])):
+            calls = stub.t.calls
+            start = time.perf_counter()
+            for _ in range(args.repeats):
+                command(connection, stub.argument_catalog, *tokens)
+            results[name] = (time.perf_counter() - start, stub.t.calls - calls)
+
+        assert command(connection, stub.argument_catalog, 'get_pod', 'stub-pod')['status'] == 'STOPPED'
+        assert command(connection, stub.argument_catalog, 'get_pod', 'stub-pod')['status'] == 'STOPPED'
+        command(connection, stub.argument_catalog, 'start_pod', 'stub-pod')
+        status = command(connection, stub.argument_catalog, 'get_pod', 'stub-pod')['status']
+        assert status == 'RUNNING', f"get_pod still cached as {status} after start_pod"
+        stats = command(connection, stub.argument_catalog, 'cache_stats')
+        connection.close()
+    finally:
+        loop.call_soon_threadsafe(stub.request_shutdown)
+        server_thread.join(timeout=5)
+
+    print(f"{args.repeats} x whoami, stubbed Tapis latency {args.latency*1000:.0f} ms")
+    for name, (elapsed, calls) in results.items():
+        print(f"{name:>10}: {elapsed:.2f} s ({elapsed / args.repeats * 1000:.1f} ms per command, {calls} Tapis calls)")
+    print(f"get_pod invalidated by start_pod: ok  cache_stats: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Cost of running Python code on a helper thread that can be stopped. The old KillableThread stopped its thread by installing a
+sys.settrace tracer, so every line the thread ran went through a Python callback. CancellableThread stops through an event and adds nothing.
+    python tests/benchmark_cancellable_thread.py
+"""
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'TapisCLICICLE'))
+from utilities.cancellableThread import CancellableThread
+
+
+class TracedThread(threading.Thread):
+    """
+    the stopping mechanism of the removed KillableThread, kept here only as the baseline
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.killed = False
+
+    def run(self):
+        sys.settrace(self.globaltrace)
+        super().run()
+
+    def globaltrace(self, frame, event, arg):
+        return self.localtrace if event == 'call' else None
+
+    def localtrace(self, frame, event, arg):
+        if self.killed and event == 'line':
+            raise SystemExit()
+        return self.localtrace
+
+
+def work(iterations: int = 300_000, cancel_event=None):
+    total = 0
+    for i in range(iterations):
+        total += i % 7
+    return total
+
+
+def timed(thread: threading.Thread) -> float:
+    start = time.perf_counter()
+    thread.start()
+    thread.join()
+    return time.perf_counter() - start
+
+
+def main():
+    runs = 5
+    plain = min(timed(threading.Thread(target=work)) for _ in range(runs))
+    traced = min(timed(TracedThread(target=work)) for _ in range(runs))
+    cancellable = min(timed(CancellableThread(target=work)) for _ in range(runs))
+    print(f"plain thread:       {plain*1000:.1f} ms")
+    print(f"settrace thread:    {traced*1000:.1f} ms ({traced/plain:.1f}x)")
+    print(f"cancellable thread: {cancellable*1000:.1f} ms ({cancellable/plain:.1f}x)")
+
+    spinner = CancellableThread(target=lambda cancel_event: cancel_event.wait())
+    spinner.start()
+    start = time.perf_counter()
+    spinner.cancel()
+    print(f"cancel to joined:   {(time.perf_counter()-start)*1e6:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Streaming download against a server in this process, with the stubbed Tapis from stress_connections and the local files stand-in. Checks
+that a binary file arrives byte for byte, that an interrupted download resumes from its .part file, or starts over if the server ignores
+the byte range, that a wrong checksum is caught, and that progress reaches the client. Then compares peak memory with reading the whole
+file into memory, as download used to. No Tapis access is needed:
+    python tests/benchmark_download.py
+"""
+import os
+import time
+import hashlib
+import argparse
+import tempfile
+import threading
+import tracemalloc
+
+import requests
+
+from stress_connections import asyncio, schemas, catalog, StubServer, StubTapis, PORT
+from benchmark_pipelining import connect
+from files_standin import FilesStandIn
+
+
+def download(connection, arguments: dict, *tokens: str) -> tuple[schemas.ResponseData, list]:
+    tokens = ['download', *tokens]
+    kwargs = vars(catalog.build_parser(arguments, lambda args: None, only=tokens).parse_args(tokens))
+    connection.send(schemas.CommandData(request_content=kwargs))
+    progress = []
+    while (response := connection.receive()).schema_type == 'ProgressData':
+        progress.append((response.transferred, response.total))
+    return response, progress
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-s', '--size', type=int, default=64, help="MiB in the downloaded file")
+    args = parser.parse_args()
+
+    contents = os.urandom(args.size * 2**20)
+    remote_path = '/data/output.bin'
+    destination = os.path.join(tempfile.mkdtemp(), 'output.bin')
+    stub = StubServer('127.0.0.1', PORT)
+    stub.initial = False
+    stub.username, stub.url = 'benchmark', 'tacc.tapis.io'
+    stub.t = StubTapis('benchmark', 0)
+    stub.t.remote_files[remote_path] = contents
+    stub.update_credentials(stub.t, stub.username, None)
+    loop = asyncio.new_event_loop()
+    server_thread = threading.Thread(target=loop.run_until_complete, args=(stub.main(),), daemon=True)
+
+    with FilesStandIn(stub.t.remote_files) as standin:
+        stub.t.base_url = standin.url
+        server_thread.start()
+        time.sleep(0.5)
+        try:
+            connection = connect(stub)
+            arguments = [remote_path, 'stub-system', '--destination_file', destination]
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            response, progress = download(connection, stub.argument_catalog, *arguments)
+            streamed_time = time.perf_counter() - start
+            _, streamed_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            assert not response.error, response.error
+            with open(destination, 'rb') as f:
+                assert f.read() == contents, "downloaded bytes differ"
+            assert progress and progress[-1] == (len(contents), len(contents)), progress[-1:]
+
+            with open(destination + '.part', 'wb') as f: # an interrupted download
+                f.write(contents[:len(contents) // 3])
+            os.remove(destination)
+            response, _ = download(connection, stub.argument_catalog, *arguments)
+            assert not response.error and 'resumed' in response.message['message'], response.message or response.error
+            with open(destination, 'rb') as f:
+                assert f.read() == contents, "resumed download differs"
+
+            standin.ignore_ranges = True # a resume the server answers with the whole file rewrites the .part file instead of appending
+            with open(destination + '.part', 'wb') as f:
+                f.write(contents[:len(contents) // 3])
+            os.remove(destination)
+            response, _ = download(connection, stub.argument_catalog, *arguments)
+            assert not response.error and 'resumed' not in response.message['message'], response.message or response.error
+            with open(destination, 'rb') as f:
+                assert f.read() == contents, "download from a server ignoring ranges differs"
+            standin.ignore_ranges = False
+
+            response, _ = download(connection, stub.argument_catalog, *arguments, '--checksum', f"sha256:{hashlib.sha256(contents).hexdigest()}")
+            assert not response.error, response.error
+            response, _ = download(connection, stub.argument_catalog, *arguments, '--checksum', f"sha256:{'0' * 64}")
+            assert 'expected' in response.error and not os.path.exists(destination + '.part'), response.error
+            connection.close()
+        finally:
+            loop.call_soon_threadsafe(stub.request_shutdown)
+            server_thread.join(timeout=5)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        whole = requests.get(f"{standin.url}/v3/files/content/stub-system{remote_path}", headers={'X-Tapis-Token':'stub-token'}).content
+        with open(destination, 'wb') as f:
+            f.write(whole)
+        whole_time = time.perf_counter() - start
+        _, whole_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    print(f"{args.size} MiB binary download: byte for byte, resume, checksum and progress ({len(progress)} updates) ok")
+    print(f"  whole file in memory: {whole_time:.2f} s, peak memory {whole_peak / 2**20:.1f} MiB")
+    print(f"  streamed to disk:     {streamed_time:.2f} s, peak memory {streamed_peak / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Wall time of scripted one shot commands, e.g. `python -m TapisCLICICLE pwd` in a shell loop. The target is under 100 ms per run.
+
+Against your own authenticated server:
+    python tests/benchmark_one_shot.py pwd
+Without Tapis access, against a local server marked as authenticated:
+    python tests/benchmark_one_shot.py --stub-server pwd
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+PACKAGE = os.path.join(SRC, 'TapisCLICICLE')
+PORT = 30000
+TARGET = 0.1
+STUB_SERVER = """
+import asyncio
+from server import server
+s = server.Server('127.0.0.1', 30000)
+s.initial = False
+s.username, s.url = 'benchmark', 'tacc.tapis.io'
+s.update_credentials(None, s.username, None)
+asyncio.run(s.main())
+"""
+
+
+def wait_for_server(path: str, timeout: float = 30):
+    end = time.time() + timeout
+    while time.time() < end:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            connection.connect(path)
+            return
+        except OSError:
+            time.sleep(0.1)
+        finally:
+            connection.close()
+    raise RuntimeError("Stub server did not start")
+
+
+def run_once(command: list[str], env: dict, expect: str = 'message:') -> float:
+    """
+    the wall time of one run, which has to succeed and print expect. The exit status alone wont do, a run that lost the server would
+    otherwise count as a fast one
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-m', 'TapisCLICICLE', *command], cwd=SRC, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    elapsed = time.perf_counter() - start
+    if result.returncode:
+        raise RuntimeError(f"{' '.join(command)} exited with {result.returncode}: {result.stdout.decode()}{result.stderr.decode()}")
+    if expect not in result.stdout.decode():
+        raise RuntimeError(f"{' '.join(command)} did not print {expect!r}: {result.stdout.decode()}{result.stderr.decode()}")
+    return elapsed
+
+
+def subprocess_time(command: list[str]) -> float:
+    start = time.perf_counter()
+    subprocess.run(command, check=False)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', nargs='*', default=['pwd'])
+    parser.add_argument('-n', '--runs', type=int, default=30)
+    parser.add_argument('--stub-server', action='store_true')
+    parser.add_argument('--expect', default='message:', help="text every run has to print, the response's message by default")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    stub = None
+    if args.stub_server:
+        env['TAPISCLICICLE_CACHE'] = tempfile.mkdtemp()
+        env['TAPISCLICICLE_SOCKET'] = os.path.join(env['TAPISCLICICLE_CACHE'], 'server.sock')
+        stub = subprocess.Popen([sys.executable, '-c', STUB_SERVER], cwd=PACKAGE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        wait_for_server(env['TAPISCLICICLE_SOCKET'])
+    try:
+        interpreter = min(subprocess_time([sys.executable, '-c', 'pass']) for _ in range(5))
+        warmup = run_once(args.command, env, args.expect) # the first run goes through the full client and caches the argument catalog
+        timings = sorted(run_once(args.command, env, args.expect) for _ in range(args.runs))
+    finally:
+        if stub:
+            stub.terminate()
+            stub.wait()
+
+    median = statistics.median(timings)
+    print(f"command: {' '.join(args.command)}  runs: {args.runs}")
+    print(f"bare interpreter: {interpreter*1000:.1f} ms")
+    print(f"first run (full client): {warmup*1000:.1f} ms")
+    print(f"one shot min/median/p95: {timings[0]*1000:.1f} / {median*1000:.1f} / {timings[int(len(timings)*0.95)-1]*1000:.1f} ms")
+    print(f"target {TARGET*1000:.0f} ms: {'met' if median < TARGET else 'missed'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Time to walk every page of a job listing with the next page prefetched while the current one is consumed, versus fetched only once the
+current page is used up, using the stubbed Tapis from stress_connections. Each stubbed page takes --latency seconds to fetch and each row
+takes --row-delay seconds to consume. The paginator is timed on its own, then get_jobs --all end to end against a server in this process,
+where the client reads rows at the same pace. Also checks that --limit and the default limit stop the listing where they should.
+No Tapis access is needed:
+    python tests/benchmark_pagination.py
+"""
+import time
+import argparse
+import threading
+
+from stress_connections import asyncio, schemas, catalog, StubServer, StubTapis, PORT
+from benchmark_pipelining import connect
+from commands import baseCommand
+
+
+def list_jobs(connection, arguments: dict, tokens: list[str], row_delay: float) -> tuple[float, list]:
+    kwargs = vars(catalog.build_parser(arguments, lambda args: None).parse_args(['get_jobs', *tokens]))
+    start = time.perf_counter()
+    rows = []
+    connection.send(schemas.CommandData(request_content=kwargs))
+    while (response := connection.receive()).schema_type == 'StreamData':
+        for row in response.rows:
+            time.sleep(row_delay)
+            rows.append(row)
+    if response.error:
+        raise RuntimeError(response.error)
+    return time.perf_counter() - start, rows
+
+
+def walk(t: StubTapis, pool, row_delay: float) -> tuple[float, int]:
+    async def consume():
+        rows = 0
+        async for row in baseCommand.Paginator(t.jobs.getJobList, pool=pool):
+            time.sleep(row_delay) # formatting and sending the row
+            rows += 1
+        return rows
+    start = time.perf_counter()
+    rows = asyncio.run(consume())
+    return time.perf_counter() - start, rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--jobs', type=int, default=2000)
+    parser.add_argument('-l', '--latency', type=float, default=0.05, help="seconds each stubbed page takes to fetch")
+    parser.add_argument('-d', '--row-delay', type=float, default=0.0005, help="seconds the client spends on each row")
+    args = parser.parse_args()
+
+    stub = StubServer('127.0.0.1', PORT)
+    stub.initial = False
+    stub.username, stub.url = 'benchmark', 'tacc.tapis.io'
+    stub.t = StubTapis('benchmark', args.latency)
+    stub.t.job_count = args.jobs
+    stub.update_credentials(stub.t, stub.username, None)
+    loop = asyncio.new_event_loop()
+    server_thread = threading.Thread(target=loop.run_until_complete, args=(stub.main(),), daemon=True)
+    server_thread.start()
+    time.sleep(0.5)
+
+    results = dict()
+    try:
+        connection = connect(stub)
+        _, rows = list_jobs(connection, stub.argument_catalog, [], 0)
+        assert len(rows) == baseCommand.Paginator.DEFAULT_LIMIT + 1 and 'use --limit or --all' in rows[-1], rows[-1]
+        _, rows = list_jobs(connection, stub.argument_catalog, ['--limit', '250'], 0)
+        assert len(rows) == 250, len(rows)
+        for name, prefetch in (('page by page', False), ('prefetched', True)):
+            baseCommand.Paginator.prefetch = prefetch
+            walked, rows = walk(stub.t, stub.prefetch_pool, args.row_delay)
+            assert rows == args.jobs, rows
+            end_to_end, rows = list_jobs(connection, stub.argument_catalog, ['--all'], args.row_delay)
+            assert len(rows) == args.jobs, len(rows)
+            results[name] = (walked, end_to_end)
+        connection.close()
+    finally:
+        loop.call_soon_threadsafe(stub.request_shutdown)
+        server_thread.join(timeout=5)
+
+    pages = -(-args.jobs // baseCommand.Paginator.PAGE_SIZE)
+    print(f"{args.jobs} stubbed jobs: {pages} pages of {args.latency*1000:.0f} ms, {args.row_delay*1000:.1f} ms per row")
+    for name, (walked, end_to_end) in results.items():
+        print(f"{name:>12}: paginator {walked:.2f} s, get_jobs --all end to end {end_to_end:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Throughput of a large download fetched as concurrent byte ranges, against the local files stand-in capped at --rate MiB/s per connection
+like the per-connection limit of the Tapis Files service, through a server in this process with the stubbed Tapis from
+stress_connections. Each run is checked byte for byte, and a ranged download left half done has to resume only the missing ranges. No
+Tapis access is needed:
+    python tests/benchmark_parallel_download.py
+"""
+import os
+import time
+import argparse
+import tempfile
+import threading
+
+from stress_connections import asyncio, StubServer, StubTapis, PORT
+from benchmark_pipelining import connect
+from benchmark_download import download
+from files_standin import FilesStandIn
+from utilities import fileTransfer
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-s', '--size', type=int, default=64, help="MiB in the downloaded file")
+    parser.add_argument('-r', '--rate', type=float, default=16, help="MiB/s the stand-in serves on each connection")
+    parser.add_argument('-c', '--concurrency', type=int, nargs='*', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    contents = os.urandom(args.size * 2**20)
+    remote_path = '/data/large.bin'
+    destination = os.path.join(tempfile.mkdtemp(), 'large.bin')
+    stub = StubServer('127.0.0.1', PORT)
+    stub.initial = False
+    stub.username, stub.url = 'benchmark', 'tacc.tapis.io'
+    stub.t = StubTapis('benchmark', 0)
+    stub.t.remote_files[remote_path] = contents
+    stub.update_credentials(stub.t, stub.username, None)
+    loop = asyncio.new_event_loop()
+    server_thread = threading.Thread(target=loop.run_until_complete, args=(stub.main(),), daemon=True)
+
+    results = dict()
+    with FilesStandIn(stub.t.remote_files, bytes_per_second=args.rate * 2**20) as standin:
+        stub.t.base_url = standin.url
+        server_thread.start()
+        time.sleep(0.5)
+        try:
+            connection = connect(stub)
+            arguments = [remote_path, 'stub-system', '--destination_file', destination]
+            for concurrency in args.concurrency:
+                os.remove(destination) if os.path.exists(destination) else None
+                start = time.perf_counter()
+                response, _ = download(connection, stub.argument_catalog, *arguments, '--concurrency', str(concurrency))
+                results[concurrency] = time.perf_counter() - start
+                assert not response.error, response.error
+                with open(destination, 'rb') as f:
+                    assert f.read() == contents, f"download with concurrency {concurrency} differs"
+
+            ranges = -(-len(contents) // fileTransfer.RANGE_SIZE)
+            finished = set(range(0, ranges, 2)) # every other range, as if the download was interrupted
+            with open(destination + fileTransfer.PART_SUFFIX, 'wb') as f:
+                f.truncate(len(contents))
+                for index in finished:
+                    f.seek(index * fileTransfer.RANGE_SIZE)
+                    f.write(contents[index * fileTransfer.RANGE_SIZE:(index + 1) * fileTransfer.RANGE_SIZE])
+            fileTransfer.write_ranges_file(destination + fileTransfer.PART_SUFFIX, len(contents), finished)
+            requests_before = standin.requests
+            response, _ = download(connection, stub.argument_catalog, *arguments, '--concurrency', '4')
+            assert not response.error, response.error
+            assert standin.requests - requests_before == ranges - len(finished), standin.requests - requests_before
+            with open(destination, 'rb') as f:
+                assert f.read() == contents, "resumed ranged download differs"
+            assert not os.path.exists(destination + fileTransfer.PART_SUFFIX + fileTransfer.RANGES_SUFFIX)
+            connection.close()
+        finally:
+            loop.call_soon_threadsafe(stub.request_shutdown)
+            server_thread.join(timeout=5)
+
+    print(f"{args.size} MiB download, stand-in capped at {args.rate:.0f} MiB/s per connection, {fileTransfer.RANGE_SIZE // 2**20} MiB ranges")
+    for concurrency, elapsed in results.items():
+        print(f"  concurrency {concurrency}: {elapsed:.2f} s ({args.size / elapsed:.1f} MiB/s)")
+    print(f"  resumed a half finished ranged download fetching only the {ranges - len(finished)} missing ranges: ok")
+
+
+if __name__ == "__main__":
+    main()
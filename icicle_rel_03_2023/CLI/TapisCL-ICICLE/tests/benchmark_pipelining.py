@@ -0,0 +1,73 @@
+"""
+200 get_job_status calls over one connection, lock step and pipelined with CLI.submit_many, against a server in this process using the
+stubbed Tapis from stress_connections. No Tapis access is needed:
+    python tests/benchmark_pipelining.py
+"""
+import sys
+import time
+import socket
+import argparse
+import threading
+
+import stress_connections
+from stress_connections import asyncio, schemas, catalog, StubServer, StubTapis, PORT
+from TapisCLICICLE.client import cli
+
+
+def connect(stub: StubServer) -> cli.ClientSideConnection:
+    connection = cli.ClientSideConnection(socket.create_connection(('127.0.0.1', PORT)))
+    connection.negotiate_framing()
+    connection.receive()
+    connection.send(schemas.ResponseData(request_content={'catalog_hash':stub.catalog_hash}))
+    connection.send(schemas.ResponseData(request_content={'setup_success':True}))
+    return connection
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--commands', type=int, default=200)
+    parser.add_argument('-l', '--latency', type=float, default=0.02, help="seconds each stubbed Tapis call blocks for")
+    args = parser.parse_args()
+
+    stub = StubServer('127.0.0.1', PORT)
+    stub.initial = False
+    stub.username, stub.url = 'benchmark', 'tacc.tapis.io'
+    stub.t = StubTapis('benchmark', args.latency)
+    stub.update_credentials(stub.t, stub.username, None)
+    loop = asyncio.new_event_loop()
+    server_thread = threading.Thread(target=loop.run_until_complete, args=(stub.main(),), daemon=True)
+    server_thread.start()
+    time.sleep(0.5)
+
+    parser = catalog.build_parser(stub.argument_catalog, lambda args: None)
+    commands = [vars(parser.parse_args(['get_job_status', '--jobUuid', f"job-{index}"])) for index in range(args.commands)]
+    try:
+        connection = connect(stub)
+        start = time.perf_counter()
+        for kwargs in commands:
+            connection.send(schemas.CommandData(request_content=kwargs))
+            response = connection.receive()
+            if response.error:
+                raise RuntimeError(response.error)
+        lock_step = time.perf_counter() - start
+
+        client = cli.CLI.__new__(cli.CLI) # only the connection, not the interactive setup in __init__
+        client.connection, client.term, client.request_counter = connection, None, cli.itertools.count()
+        start = time.perf_counter()
+        responses = client.submit_many(commands)
+        pipelined = time.perf_counter() - start
+        errors = [response.error for response in responses if response.error]
+        if errors:
+            raise RuntimeError(errors[0])
+        connection.close()
+    finally:
+        loop.call_soon_threadsafe(stub.request_shutdown)
+        server_thread.join(timeout=5)
+
+    print(f"{args.commands} x get_job_status, stubbed Tapis latency {args.latency*1000:.0f} ms, {stub.EXECUTOR_WORKERS} executor workers")
+    print(f"lock step: {lock_step:.2f} s")
+    print(f"pipelined: {pipelined:.2f} s ({lock_step/pipelined:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Recursive upload and download of a directory tree against a server in this process, with the stubbed Tapis from stress_connections and the
+local files stand-in. Uploads a nested tree of small files one at a time and then on the transfer queue, with some uploads failing once so
+they are retried, then downloads the uploaded tree back and compares it file for file. No Tapis access is needed:
+    python tests/benchmark_recursive_transfer.py
+"""
+import os
+import time
+import argparse
+import tempfile
+import threading
+
+from stress_connections import asyncio, schemas, catalog, StubServer, StubTapis, PORT
+from benchmark_pipelining import connect
+from files_standin import FilesStandIn
+
+
+def transfer(connection, arguments: dict, *tokens: str) -> tuple[schemas.ResponseData, list]:
+    kwargs = vars(catalog.build_parser(arguments, lambda args: None, only=list(tokens)).parse_args(list(tokens)))
+    connection.send(schemas.CommandData(request_content=kwargs))
+    rows = []
+    while (response := connection.receive()).schema_type == 'StreamData':
+        rows.extend(response.rows)
+    return response, rows
+
+
+def make_tree(root: str, directories: int, files: int) -> dict[str, bytes]:
+    """
+    directories nested two deep, each holding files of a few KiB. Returns relative path: contents
+    """
+    tree = dict()
+    for index in range(directories):
+        directory = os.path.join(root, f"group-{index % 4}", f"run-{index}")
+        os.makedirs(directory)
+        for number in range(files):
+            contents = os.urandom(1024 * (1 + number % 4))
+            with open(os.path.join(directory, f"output-{number}.dat"), 'wb') as f:
+                f.write(contents)
+            tree[f"group-{index % 4}/run-{index}/output-{number}.dat"] = contents
+    return tree
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--directories', type=int, default=8)
+    parser.add_argument('-f', '--files', type=int, default=8, help="files in each directory")
+    parser.add_argument('-l', '--latency', type=float, default=0.02, help="seconds each stubbed Tapis call blocks for")
+    args = parser.parse_args()
+
+    local_root = os.path.join(tempfile.mkdtemp(), 'results')
+    tree = make_tree(local_root, args.directories, args.files)
+    stub = StubServer('127.0.0.1', PORT)
+    stub.initial = False
+    stub.username, stub.url = 'benchmark', 'tacc.tapis.io'
+    stub.t = StubTapis('benchmark', args.latency)
+    stub.update_credentials(stub.t, stub.username, None)
+    loop = asyncio.new_event_loop()
+    server_thread = threading.Thread(target=loop.run_until_complete, args=(stub.main(),), daemon=True)
+
+    timings = dict()
+    with FilesStandIn(stub.t.remote_files) as standin:
+        stub.t.base_url = standin.url
+        server_thread.start()
+        time.sleep(0.5)
+        try:
+            connection = connect(stub)
+            for concurrency in (1, 8):
+                stub.t.remote_files.clear()
+                stub.t.upload_failures = {f"/remote/results/{path}":1 for path in list(tree)[::10]} # every tenth file fails once
+                start = time.perf_counter()
+                response, rows = transfer(connection, stub.argument_catalog, 'upload', local_root, 'stub-system', '--destination_file', '/remote/results',
+                                          '--recursive', '--concurrency', str(concurrency))
+                timings[concurrency] = time.perf_counter() - start
+                assert not response.error, response.error
+                assert len(rows) == len(tree) and all(row['status'] == 'OK' for row in rows), [row for row in rows if row['status'] != 'OK']
+                assert sum(row['attempts'] > 1 for row in rows) == len(list(tree)[::10]), "failed uploads were not retried"
+                assert stub.t.remote_files == {f"/remote/results/{path}":contents for path, contents in tree.items()}, "uploaded tree differs"
+
+            stub.t.upload_failures = {f"/remote/results/{next(iter(tree))}":10} # fails on every retry
+            response, rows = transfer(connection, stub.argument_catalog, 'upload', local_root, 'stub-system', '--destination_file', '/remote/results', '--recursive')
+            failed = [row for row in rows if row['status'] == 'FAILED']
+            assert len(failed) == 1 and 'reset' in failed[0]['error'], failed
+
+            download_root = os.path.join(tempfile.mkdtemp(), 'results')
+            response, rows = transfer(connection, stub.argument_catalog, 'download', '/remote/results', 'stub-system', '--destination_file', download_root,
+                                      '--recursive', '--concurrency', '8')
+            assert not response.error, response.error
+            assert len(rows) == len(tree) and all(row['status'] == 'OK' for row in rows), [row for row in rows if row['status'] != 'OK']
+            for path, contents in tree.items():
+                with open(os.path.join(download_root, *path.split('/')), 'rb') as f:
+                    assert f.read() == contents, f"{path} differs after the round trip"
+
+            response, _ = transfer(connection, stub.argument_catalog, 'upload', local_root, 'stub-system', '--destination_file', '/remote/results')
+            assert 'is a directory' in response.error, response.error
+            connection.close()
+        finally:
+            loop.call_soon_threadsafe(stub.request_shutdown)
+            server_thread.join(timeout=5)
+
+    print(f"{len(tree)} files in {args.directories} directories: upload with retries, failure report and download round trip ok")
+    print(f"  recursive upload, one file at a time: {timings[1]:.2f} s")
+    print(f"  recursive upload, 8 at a time:        {timings[8]:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
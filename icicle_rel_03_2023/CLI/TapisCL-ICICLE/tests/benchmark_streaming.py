@@ -0,0 +1,78 @@
+"""
+Time to first row and peak memory of a large get_jobs listing, streamed versus sent as one response, against a server in this process
+using the stubbed Tapis from stress_connections. The one response case runs get_jobs as a single item batch, which collects the rows the
+way every listing used to be returned. No Tapis access is needed:
+    python tests/benchmark_streaming.py
+"""
+import time
+import argparse
+import threading
+import tracemalloc
+
+from stress_connections import asyncio, schemas, catalog, StubServer, StubTapis, PORT
+from benchmark_pipelining import connect
+
+
+def streamed(connection, kwargs: dict) -> tuple[float, float, int]:
+    start = time.perf_counter()
+    first_row = None
+    rows = 0
+    connection.send(schemas.CommandData(request_content=kwargs))
+    while (response := connection.receive()).schema_type == 'StreamData':
+        first_row = first_row or time.perf_counter() - start
+        rows += len(response.rows)
+    if response.error:
+        raise RuntimeError(response.error)
+    return first_row, time.perf_counter() - start, rows
+
+
+def whole(connection, kwargs: dict) -> tuple[float, float, int]:
+    start = time.perf_counter()
+    connection.send(schemas.BatchData(request_content={'commands':[kwargs]}))
+    item = connection.receive()
+    elapsed = time.perf_counter() - start
+    connection.receive()
+    if item.error:
+        raise RuntimeError(item.error)
+    return elapsed, elapsed, len(item.message['message'])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--jobs', type=int, default=20000)
+    args = parser.parse_args()
+
+    stub = StubServer('127.0.0.1', PORT)
+    stub.initial = False
+    stub.username, stub.url = 'benchmark', 'tacc.tapis.io'
+    stub.t = StubTapis('benchmark', 0)
+    stub.t.job_count = args.jobs
+    stub.update_credentials(stub.t, stub.username, None)
+    loop = asyncio.new_event_loop()
+    server_thread = threading.Thread(target=loop.run_until_complete, args=(stub.main(),), daemon=True)
+    server_thread.start()
+    time.sleep(0.5)
+
+    kwargs = vars(catalog.build_parser(stub.argument_catalog, lambda args: None).parse_args(['get_jobs', '--all', '-v']))
+    results = dict()
+    try:
+        connection = connect(stub)
+        for name, run in (('one response', whole), ('streamed', streamed)):
+            run(connection, kwargs) # warm up
+            tracemalloc.start()
+            first_row, total, rows = run(connection, kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[name] = (first_row, total, rows, peak)
+        connection.close()
+    finally:
+        loop.call_soon_threadsafe(stub.request_shutdown)
+        server_thread.join(timeout=5)
+
+    print(f"get_jobs --all -v over {args.jobs} stubbed jobs (client and server in one process, peak memory is both)")
+    for name, (first_row, total, rows, peak) in results.items():
+        print(f"{name:>12}: first row {first_row*1000:.0f} ms, all {rows} rows {total*1000:.0f} ms, peak memory {peak/2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
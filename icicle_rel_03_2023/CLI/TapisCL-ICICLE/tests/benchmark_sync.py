@@ -0,0 +1,92 @@
+"""
+Incremental sync of a local directory tree against a server in this process, with the stubbed Tapis from stress_connections. Syncs a tree
+once, then edits, touches and adds a few files and checks that only those are sent, that touched files are skipped with --checksums, and
+that a repeat sync does not list the remote tree again until --refresh. Then compares a repeat sync of the unchanged tree with sending it
+all again through upload --recursive. No Tapis access is needed:
+    python tests/benchmark_sync.py
+"""
+import os
+import time
+import argparse
+import tempfile
+import threading
+
+from stress_connections import asyncio, StubServer, StubTapis, PORT
+from benchmark_pipelining import connect
+from benchmark_recursive_transfer import transfer, make_tree
+
+
+def sync(connection, arguments: dict, local_root: str, *tokens: str) -> tuple[list, str]:
+    response, rows = transfer(connection, arguments, 'sync', local_root, 'stub-system', '--destination_file', '/remote/project', *tokens)
+    assert not response.error, response.error
+    return [row for row in rows if isinstance(row, dict)], rows[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-d', '--directories', type=int, default=20)
+    parser.add_argument('-f', '--files', type=int, default=25, help="files in each directory")
+    parser.add_argument('-l', '--latency', type=float, default=0.02, help="seconds each stubbed Tapis call blocks for")
+    args = parser.parse_args()
+
+    local_root = os.path.join(tempfile.mkdtemp(), 'project')
+    tree = make_tree(local_root, args.directories, args.files)
+    paths = sorted(tree)
+    stub = StubServer('127.0.0.1', PORT)
+    stub.initial = False
+    stub.username, stub.url = 'benchmark', 'tacc.tapis.io'
+    stub.t = StubTapis('benchmark', args.latency)
+    stub.update_credentials(stub.t, stub.username, None)
+    loop = asyncio.new_event_loop()
+    server_thread = threading.Thread(target=loop.run_until_complete, args=(stub.main(),), daemon=True)
+    server_thread.start()
+    time.sleep(0.5)
+    try:
+        connection = connect(stub)
+        sent, summary = sync(connection, stub.argument_catalog, local_root, '--checksums', '--concurrency', '8')
+        assert len(sent) == len(tree) and all(row['reason'] == 'new' for row in sent), summary
+        assert stub.t.remote_files == {f"/remote/project/{path}":contents for path, contents in tree.items()}, "synced tree differs"
+        listings = stub.t.listings
+
+        for path in paths[:5]: # edited
+            with open(os.path.join(local_root, *path.split('/')), 'ab') as f:
+                f.write(b'edited')
+        for path in paths[5:8]: # touched, same contents
+            os.utime(os.path.join(local_root, *path.split('/')), ns=(time.time_ns(), time.time_ns() + 10**9))
+        for index in range(2): # added
+            with open(os.path.join(local_root, f"added-{index}.dat"), 'wb') as f:
+                f.write(os.urandom(2048))
+        sent, summary = sync(connection, stub.argument_catalog, local_root, '--checksums')
+        assert sorted((row['file'], row['reason']) for row in sent) == sorted(
+            [(os.path.join(local_root, *path.split('/')), 'changed') for path in paths[:5]] +
+            [(os.path.join(local_root, f"added-{index}.dat"), 'new') for index in range(2)]), summary
+        assert stub.t.listings == listings, "the remote tree was listed again"
+
+        start = time.perf_counter()
+        sent, summary = sync(connection, stub.argument_catalog, local_root)
+        repeat_time = time.perf_counter() - start
+        assert not sent and 'sync manifest' in summary, summary
+
+        stub.t.remote_files[f"/remote/project/{paths[-1]}"] = b'changed on the remote side'
+        sent, summary = sync(connection, stub.argument_catalog, local_root, '--refresh')
+        assert stub.t.listings > listings and [row['reason'] for row in sent] == ['changed'], summary
+        assert stub.t.remote_files[f"/remote/project/{paths[-1]}"] == tree[paths[-1]]
+
+        start = time.perf_counter()
+        response, _ = transfer(connection, stub.argument_catalog, 'upload', local_root, 'stub-system', '--destination_file', '/remote/project',
+                               '--recursive', '--concurrency', '8')
+        upload_time = time.perf_counter() - start
+        assert not response.error, response.error
+        connection.close()
+    finally:
+        loop.call_soon_threadsafe(stub.request_shutdown)
+        server_thread.join(timeout=5)
+
+    print(f"{len(tree) + 2} files, {args.latency * 1000:.0f} ms per stubbed Tapis call: only edited and added files sent, touched files "
+          f"skipped with --checksums, remote listing reused until --refresh ok")
+    print(f"  unchanged tree, upload --recursive: {upload_time:.2f} s")
+    print(f"  unchanged tree, sync:               {repeat_time:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+System to system transfer tasks against a server in this process, with the stubbed Tapis from stress_connections, whose transfer tasks
+move a quarter of their bytes each time they are polled. Creates a multi-path transfer task and a failing one, follows both with
+watch_transfer at once, and checks the progress, the final status and that the files arrived. Both tasks are followed by the same
+getRecentTransferTasks calls. Also checks that watch_transfer gives up after its timeout. No Tapis access is needed:
+    python tests/benchmark_transfer_task.py
+"""
+import os
+import time
+import argparse
+import threading
+
+from stress_connections import asyncio, schemas, catalog, StubServer, StubTapis, PORT
+from benchmark_pipelining import connect
+from commands import fileCommands
+
+
+def command(connection, arguments: dict, *tokens: str, fails: bool = False) -> tuple[schemas.ResponseData, list]:
+    kwargs = vars(catalog.build_parser(arguments, lambda args: None, only=list(tokens)).parse_args(list(tokens)))
+    connection.send(schemas.CommandData(request_content=kwargs))
+    progress = []
+    while (response := connection.receive()).schema_type == 'ProgressData':
+        progress.append((response.transferred, response.total))
+    assert bool(response.error) == fails, response.error or response.message
+    return response, progress
+
+
+def watch(stub: StubServer, uuid: str, results: dict):
+    connection = connect(stub)
+    results[uuid] = command(connection, stub.argument_catalog, 'watch_transfer', uuid)
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-f', '--files', type=int, default=4, help="files in the transfer task")
+    parser.add_argument('-i', '--interval', type=float, default=0.05, help="seconds between polls of the transfer monitor")
+    args = parser.parse_args()
+
+    stub = StubServer('127.0.0.1', PORT)
+    stub.initial = False
+    stub.username, stub.url = 'benchmark', 'tacc.tapis.io'
+    stub.t = StubTapis('benchmark', 0.01)
+    for index in range(args.files):
+        stub.t.remote_files[f"/scratch/run/output-{index}.dat"] = os.urandom(64 * 1024)
+    stub.update_credentials(stub.t, stub.username, None)
+    stub.transfer_monitor.interval = args.interval
+    loop = asyncio.new_event_loop()
+    server_thread = threading.Thread(target=loop.run_until_complete, args=(stub.main(),), daemon=True)
+    server_thread.start()
+    time.sleep(0.5)
+    try:
+        connection = connect(stub)
+        sources = ','.join(f"/scratch/run/output-{index}.dat" for index in range(args.files))
+        response, _ = command(connection, stub.argument_catalog, 'create_transfer_task', sources, 'hpc-scratch',
+                              '--destination_system_id', 'archive', '--destination_file_path', '/archive/run')
+        transfer = response.message['message'].split()[2]
+        response, _ = command(connection, stub.argument_catalog, 'create_transfer_task', '/scratch/missing.dat', 'hpc-scratch',
+                              '--destination_system_id', 'archive', '--destination_file_path', '/archive/missing.dat')
+        failing = response.message['message'].split()[2]
+        task = stub.t.transfer_tasks[transfer]
+        assert task.paths == [(f"/scratch/run/output-{index}.dat", f"/archive/run/output-{index}.dat") for index in range(args.files)], task.paths
+
+        results = dict()
+        watchers = [threading.Thread(target=watch, args=(stub, uuid, results)) for uuid in (transfer, failing)]
+        start = time.perf_counter()
+        for watcher in watchers:
+            watcher.start()
+        for watcher in watchers:
+            watcher.join()
+        elapsed = time.perf_counter() - start
+
+        response, progress = results[transfer]
+        assert 'COMPLETED' in response.message['message'], response.message
+        assert progress[-1] == (task.estimatedTotalBytes, task.estimatedTotalBytes), progress
+        assert [transferred for transferred, _ in progress] == sorted(transferred for transferred, _ in progress), progress
+        for index in range(args.files):
+            assert stub.t.remote_files[f"/archive/run/output-{index}.dat"] == stub.t.remote_files[f"/scratch/run/output-{index}.dat"]
+        response, _ = results[failing]
+        assert 'FAILED' in response.message['message'] and 'not found' in response.message['message'], response.message
+
+        response, _ = command(connection, stub.argument_catalog, 'watch_transfer', transfer) # already finished, answered from the monitor
+        assert 'COMPLETED' in response.message['message'], response.message
+        polls = stub.t.transfer_polls
+
+        response, _ = command(connection, stub.argument_catalog, 'create_transfer_task', sources, 'hpc-scratch',
+                              '--destination_system_id', 'archive', '--destination_file_path', '/archive/slow')
+        slow = response.message['message'].split()[2]
+        stub.transfer_monitor.interval = 10 # the task does not move again before the timeout
+        fileCommands.watch_transfer.timeout = 0.2
+        try:
+            response, _ = command(connection, stub.argument_catalog, 'watch_transfer', slow, fails=True)
+        finally:
+            fileCommands.watch_transfer.timeout = 24 * 60 * 60
+        assert 'did not finish within 0.2 seconds' in response.error, response.error
+        connection.close()
+    finally:
+        loop.call_soon_threadsafe(stub.request_shutdown)
+        server_thread.join(timeout=5)
+
+    print(f"{args.files} path transfer task and a failing one, watched together: progress, final status and copied files ok in {elapsed:.2f} s")
+    print(f"  watch_transfer timeout: ok")
+    print(f"  getRecentTransferTasks calls, shared by both tasks: {polls}")
+    print(f"  bytes through this machine: 0, with download and upload: {2 * task.estimatedTotalBytes}")
+
+
+if __name__ == "__main__":
+    main()
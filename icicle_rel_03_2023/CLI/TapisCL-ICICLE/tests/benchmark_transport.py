@@ -0,0 +1,77 @@
+"""
+Round trip latency of a small one shot command over the unix socket and over loopback TCP, against a local server marked as
+authenticated, so no Tapis access is needed:
+    python tests/benchmark_transport.py
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+import benchmark_one_shot
+
+sys.path.insert(0, benchmark_one_shot.SRC)
+from TapisCLICICLE.client import oneShot, catalog
+from TapisCLICICLE.socketopts.framing import ONE_SHOT_PREAMBLE
+
+
+def round_trip(connect, request: dict) -> float:
+    start = time.perf_counter()
+    with connect() as connection:
+        oneShot.send_frame(connection, request, preamble=ONE_SHOT_PREAMBLE)
+        response = oneShot.receive_frame(connection)
+    elapsed = time.perf_counter() - start
+    if response.get('error'):
+        raise RuntimeError(response['error'])
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', nargs='*', default=['pwd'])
+    parser.add_argument('-n', '--runs', type=int, default=500)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env['TAPISCLICICLE_CACHE'] = tempfile.mkdtemp()
+    env['TAPISCLICICLE_SOCKET'] = os.path.join(env['TAPISCLICICLE_CACHE'], 'server.sock')
+    env['TAPISCLICICLE_TCP'] = '1' # TCP is opt in, and it is what unix sockets are compared against
+    stub = subprocess.Popen([sys.executable, '-c', benchmark_one_shot.STUB_SERVER], cwd=benchmark_one_shot.PACKAGE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        benchmark_one_shot.wait_for_server(env['TAPISCLICICLE_SOCKET'])
+        benchmark_one_shot.run_once(args.command, env) # caches the argument catalog, whose hash one shot requests must carry
+        with open(os.path.join(env['TAPISCLICICLE_CACHE'], 'catalog', 'arguments.json')) as f:
+            cached_catalog = json.load(f)
+        kwargs = vars(catalog.build_parser(cached_catalog['arguments'], print, only=args.command).parse_args(args.command))
+        request = {'schema_type':'CommandData', 'request_content':kwargs, 'catalog_hash':cached_catalog['hash']}
+        transports = {
+            'unix':lambda: _unix_connection(env['TAPISCLICICLE_SOCKET']),
+            'tcp':lambda: socket.create_connection(('127.0.0.1', benchmark_one_shot.PORT))
+        }
+        results = {name:[] for name in transports}
+        for _ in range(args.runs): # interleaved so drift affects both equally
+            for name, connect in transports.items():
+                results[name].append(round_trip(connect, request))
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    print(f"command: {' '.join(args.command)}  runs: {args.runs}")
+    for name, timings in results.items():
+        timings.sort()
+        print(f"{name:>4}: median {statistics.median(timings)*1e6:.0f} us, p95 {timings[int(len(timings)*0.95)-1]*1e6:.0f} us")
+
+
+def _unix_connection(path: str) -> socket.socket:
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(path)
+    return connection
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+What the command executor does with work that times out. Checks that a command coroutine waiting on an await is cancelled on its worker,
+that one stuck in a blocking call is cancelled once the call returns rather than carrying on, that a plain blocking function runs on and
+is counted as abandoned until it returns, and that work still queued behind a full pool never runs. No Tapis access is needed:
+    python tests/executor_timeout.py
+"""
+import time
+import threading
+
+from stress_connections import asyncio
+from utilities import commandExecutor, exceptions
+
+
+def wait_until(condition, timeout: float = 2) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+async def expect_timeout(awaitable):
+    try:
+        await awaitable
+    except exceptions.CommandTimeoutError:
+        return
+    raise AssertionError("the work did not time out")
+
+
+def main():
+    executor = commandExecutor.CommandExecutor(max_workers=2)
+    events = {name:threading.Event() for name in ('awaiting cancelled', 'blocking returned', 'resumed after blocking', 'queued ran')}
+
+    async def awaiting():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            events['awaiting cancelled'].set()
+            raise
+
+    async def blocking_then_awaiting():
+        time.sleep(0.5) # a tapipy request
+        events['blocking returned'].set()
+        await asyncio.sleep(0)
+        events['resumed after blocking'].set()
+
+    async def checks():
+        await expect_timeout(executor.run_coroutine(awaiting, timeout=0.1))
+        assert wait_until(events['awaiting cancelled'].is_set), "the timed out coroutine was not cancelled"
+        assert wait_until(lambda: not executor.abandoned), executor.stats()
+
+        await expect_timeout(executor.run_coroutine(blocking_then_awaiting, timeout=0.1))
+        assert executor.stats()['abandoned_workers'] == 1, executor.stats()
+        assert wait_until(events['blocking returned'].is_set) and wait_until(lambda: not executor.abandoned), executor.stats()
+        assert not events['resumed after blocking'].is_set(), "the timed out coroutine carried on after its blocking call"
+
+        await expect_timeout(executor.run_blocking(time.sleep, 0.5, timeout=0.1))
+        await expect_timeout(executor.run_blocking(time.sleep, 0.5, timeout=0.1))
+        stats = executor.stats()
+        assert stats['abandoned_workers'] == 2 and stats['available_workers'] == 0, stats
+        await expect_timeout(executor.run_blocking(events['queued ran'].set, timeout=0.1)) # both workers are still asleep
+        assert wait_until(lambda: not executor.abandoned), executor.stats()
+        time.sleep(0.1)
+        assert not events['queued ran'].is_set(), "work that timed out in the queue still ran"
+        return executor.stats()
+
+    stats = asyncio.run(checks())
+    executor.shutdown()
+    assert stats['timeouts'] == 5, stats
+    print(f"timed out coroutines cancelled, blocking work counted as abandoned until it returns, queued work dropped ok  executor_stats: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+A local HTTP stand-in for the content endpoint of the Tapis Files service, for the transfer tests. Serves the files of a StubTapis
+(remote_files), honours the range header as the Files service does (first byte, byte count), and can cap each connection's throughput
+to mimic the per-connection limit of the real service. With ignore_ranges it answers every request with the whole file, like a server or
+proxy that does not support ranges
+"""
+import time
+import threading
+from urllib.parse import unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class FilesStandIn(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, remote_files: dict[str, bytes], bytes_per_second: float | None = None, token: str = 'stub-token', ignore_ranges: bool = False):
+        super().__init__(('127.0.0.1', 0), ContentHandler)
+        self.remote_files = remote_files
+        self.bytes_per_second = bytes_per_second
+        self.ignore_ranges = ignore_ranges
+        self.token = token
+        self.requests = 0
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+class ContentHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    BLOCK = 64 * 1024
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests += 1
+        prefix = '/v3/files/content/'
+        if self.headers.get('X-Tapis-Token') != self.server.token:
+            return self.send_error(401)
+        if not self.path.startswith(prefix):
+            return self.send_error(404)
+        _, _, path = self.path[len(prefix):].partition('/')
+        contents = self.server.remote_files.get('/' + unquote(path), None)
+        if contents is None:
+            return self.send_error(404)
+        start, count = 0, len(contents)
+        ranged = bool(self.headers.get('range')) and not self.server.ignore_ranges
+        if ranged:
+            start, count = (int(value) for value in self.headers['range'].split(','))
+        body = memoryview(contents)[start:start + count]
+        self.send_response(206 if ranged else 200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        begin = time.perf_counter()
+        for offset in range(0, len(body), self.BLOCK):
+            self.wfile.write(body[offset:offset + self.BLOCK])
+            if self.server.bytes_per_second:
+                delay = (offset + self.BLOCK) / self.server.bytes_per_second - (time.perf_counter() - begin)
+                if delay > 0:
+                    time.sleep(delay)
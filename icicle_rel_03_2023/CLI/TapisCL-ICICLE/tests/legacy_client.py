@@ -0,0 +1,150 @@
+"""
+Clients from before the catalog hash exchange must keep working against the current server. Connects to a server in this process, with
+the stubbed Tapis from stress_connections, as a client from before the framed protocol, writing and reading plain json, and as a framed
+client at protocol version 2. Checks that both are sent the argument catalog without offering a hash and get through setup, and that the
+legacy client gets a listing command's rows, and a download's result without its progress, in a single response it can read. No Tapis
+access is needed:
+    python tests/legacy_client.py
+"""
+import os
+import json
+import time
+import socket
+import tempfile
+import threading
+
+from stress_connections import asyncio, catalog, StubServer, StubTapis, PORT
+from socketopts.framing import FRAME_MAGIC, FRAME_HEADER, PREAMBLE_SIZE, CATALOG_HASH_VERSION
+from files_standin import FilesStandIn
+
+LEGACY_SCHEMAS = ('CommandData', 'StartupData', 'ResponseData', 'FormRequest', 'FormResponse', 'AuthRequest', 'ConfirmationRequest')
+TIMEOUT = 3
+
+
+class LegacyClient:
+    """
+    the json stream of the baseline client. Messages are decoded one at a time off a buffer, so anything the server sends beyond what
+    was read is kept to be checked
+    """
+    def __init__(self):
+        self.connection = socket.create_connection(('127.0.0.1', PORT), timeout=TIMEOUT)
+        self.buffer = ''
+        self.decoder = json.JSONDecoder()
+
+    def send(self, data: dict):
+        self.connection.sendall(json.dumps(data).encode())
+
+    def receive(self) -> dict:
+        while True:
+            try:
+                message, end = self.decoder.raw_decode(self.buffer.lstrip())
+                self.buffer = self.buffer.lstrip()[end:]
+                assert message['schema_type'] in LEGACY_SCHEMAS, f"a legacy client cannot read {message['schema_type']}"
+                return message
+            except ValueError:
+                self.buffer += self.connection.recv(1024).decode()
+
+    def setup(self) -> dict:
+        startup = self.receive()
+        assert startup['schema_type'] == 'StartupData', startup
+        arguments = self.receive() # without offering a catalog hash
+        assert arguments['schema_type'] == 'ResponseData', arguments['schema_type']
+        self.send({'schema_type':'ResponseData', 'request_content':{'setup_success':True}})
+        return arguments['request_content']
+
+    def command(self, arguments: dict, *tokens: str) -> dict:
+        """
+        one command, answered by exactly one message
+        """
+        kwargs = vars(catalog.build_parser(arguments, lambda args: None, only=list(tokens)).parse_args(list(tokens)))
+        self.send({'schema_type':'CommandData', 'request_content':kwargs})
+        response = self.receive()
+        self.connection.settimeout(0.3)
+        try:
+            extra = self.buffer.strip() or self.connection.recv(1024)
+        except socket.timeout:
+            extra = None
+        finally:
+            self.connection.settimeout(TIMEOUT)
+        assert not extra, f"more than one message answered {tokens[0]}: {extra[:200]}"
+        return response
+
+
+class VersionTwoClient(LegacyClient):
+    """
+    a framed client that negotiated version 2, from before the catalog hash exchange
+    """
+    def __init__(self):
+        super().__init__()
+        self.connection.sendall(FRAME_MAGIC + bytes((2,)))
+        reply = self.receive_exactly(PREAMBLE_SIZE)
+        assert reply == FRAME_MAGIC + bytes((2,)), reply
+        self.send({'serializers':['json']})
+        assert self.receive() == {'serializer':'json'}
+
+    def receive_exactly(self, size: int) -> bytes:
+        data = b''
+        while len(data) < size:
+            chunk = self.connection.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("the server closed the connection")
+            data += chunk
+        return data
+
+    def send(self, data: dict):
+        payload = json.dumps(data).encode()
+        self.connection.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+
+    def receive(self) -> dict:
+        size, = FRAME_HEADER.unpack(self.receive_exactly(FRAME_HEADER.size))
+        return json.loads(self.receive_exactly(size))
+
+
+def check_client(stub: StubServer, client_type: type, contents: bytes):
+    client = client_type()
+    try:
+        arguments = client.setup()
+        assert arguments == json.loads(json.dumps(stub.argument_catalog)), f"{client_type.__name__} got a different catalog"
+        if client_type is not LegacyClient:
+            return
+        response = client.command(stub.argument_catalog, 'get_jobs', '--limit', '250')
+        assert response['schema_type'] == 'ResponseData' and not response['error'], response
+        assert len(response['message']['message']) == 250, len(response['message']['message'])
+        destination = os.path.join(tempfile.mkdtemp(), 'output.bin')
+        response = client.command(stub.argument_catalog, 'download', '/data/output.bin', 'stub-system', '--destination_file', destination)
+        assert response['schema_type'] == 'ResponseData' and not response['error'], response
+        with open(destination, 'rb') as f:
+            assert f.read() == contents, "downloaded bytes differ"
+    finally:
+        client.connection.close()
+
+
+def main():
+    assert CATALOG_HASH_VERSION > 2
+    contents = os.urandom(2**20)
+    stub = StubServer('127.0.0.1', PORT)
+    stub.initial = False
+    stub.username, stub.url = 'legacy', 'tacc.tapis.io'
+    stub.t = StubTapis('legacy', 0.01)
+    stub.t.remote_files['/data/output.bin'] = contents
+    stub.update_credentials(stub.t, stub.username, None)
+    loop = asyncio.new_event_loop()
+    server_thread = threading.Thread(target=loop.run_until_complete, args=(stub.main(),), daemon=True)
+
+    with FilesStandIn(stub.t.remote_files) as standin:
+        stub.t.base_url = standin.url
+        server_thread.start()
+        time.sleep(0.5)
+        try:
+            for client_type in (LegacyClient, VersionTwoClient):
+                check_client(stub, client_type, contents)
+        finally:
+            loop.call_soon_threadsafe(stub.request_shutdown)
+            server_thread.join(timeout=5)
+
+    print("legacy json and version 2 framed clients: sent the argument catalog without a hash, setup complete, listing and download each in "
+          "one response ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Stress test for per-connection execution contexts. Starts a server in this process against a stubbed Tapis, then opens 50 connections at once.
+Each connection authenticates as its own user through switch_tenant_to and runs whoami, cd and pwd in a loop. Every reply has to carry
+that connection's own user and working directory, even while the other connections' commands run alongside it on the command executor.
+No Tapis access is needed:
+    python tests/stress_connections.py
+"""
+import os
+import sys
+import time
+import uuid
+import types
+import socket
+import argparse
+import tempfile
+import threading
+import traceback
+from datetime import datetime, timezone
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+PACKAGE = os.path.join(SRC, 'TapisCLICICLE')
+PORT = 30001
+
+os.environ['TAPISCLICICLE_CACHE'] = tempfile.mkdtemp()
+os.environ['TAPISCLICICLE_SOCKET'] = os.path.join(os.environ['TAPISCLICICLE_CACHE'], 'server.sock')
+os.environ['TAPISCLICICLE_TCP'] = '1' # the test clients connect over TCP
+sys.path[:0] = [SRC, PACKAGE]
+import asyncio
+from server import server
+from socketopts import schemas, socketOpts
+from TapisCLICICLE.client import catalog
+
+
+class StubTapis:
+    """
+    the few tapipy calls the test commands make. Each call blocks for the given latency, like a request to Tapis would
+    """
+    def __init__(self, username: str, latency: float):
+        self.username = username
+        self.latency = latency
+        self.authenticator = types.SimpleNamespace(get_userinfo=self.get_userinfo)
+        self.files = types.SimpleNamespace(listFiles=self.list_files, getStatInfo=self.get_stat_info, createTransferTask=self.create_transfer_task,
+                                           getRecentTransferTasks=self.get_recent_transfer_tasks, getTransferTask=self.get_transfer_task)
+        self.base_url = 'http://127.0.0.1:0' # the files stand-in's address, for transfers
+        self.access_token = types.SimpleNamespace(access_token='stub-token')
+        self.remote_files: dict[str, bytes] = dict() # path: contents, served by the files stand-in
+        self.remote_modified: dict[str, str] = dict() # path: when it was last uploaded
+        self.upload_failures: dict[str, int] = dict() # path: how many more uploads of it fail
+        self.listings = 0 # listFiles calls made
+        self.transfer_tasks: dict[str, types.SimpleNamespace] = dict()
+        self.transfer_polls = 0 # getRecentTransferTasks calls made
+        self.jobs = types.SimpleNamespace(getJobStatus=self.get_job_status, getJobList=self.get_job_list)
+        self.pods = types.SimpleNamespace(get_pod=self.get_pod, start_pod=self.start_pod)
+        self.job_count = 1000
+        self.pod_status = 'STOPPED'
+        self.calls = 0 # stubbed Tapis calls made
+
+    def get_pod(self, pod_id: str):
+        time.sleep(self.latency)
+        self.calls += 1
+        return types.SimpleNamespace(pod_id=pod_id, pod_template='stub-template', status=self.pod_status)
+
+    def start_pod(self, pod_id: str):
+        time.sleep(self.latency)
+        self.calls += 1
+        self.pod_status = 'RUNNING'
+        return self.get_pod(pod_id)
+
+    def get_userinfo(self):
+        time.sleep(self.latency)
+        self.calls += 1
+        return {'username':self.username}
+
+    def upload(self, system_id: str, source_file_path: str, dest_file_path: str):
+        time.sleep(self.latency)
+        path = '/' + dest_file_path.lstrip('/')
+        if self.upload_failures.get(path, 0):
+            self.upload_failures[path] -= 1
+            raise ConnectionError(f"upload of {path} was reset")
+        with open(source_file_path, 'rb') as f:
+            self.remote_files[path] = f.read()
+        self.remote_modified[path] = datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+
+    def list_files(self, systemId: str, path: str, limit: int = 1000, offset: int = 0, recurse: bool = False):
+        """
+        the remote files under path, as the files service lists them: without the leading slash, and only direct children unless recurse
+        """
+        time.sleep(self.latency)
+        self.listings += 1
+        root = '/' + path.strip('/') + '/'
+        paths = sorted(name for name in self.remote_files if name.startswith(root) and (recurse or '/' not in name[len(root):]))
+        return [types.SimpleNamespace(type='file', path=name.lstrip('/'), name=name.rsplit('/', 1)[-1], size=len(self.remote_files[name]),
+                                      lastModified=self.remote_modified.get(name, '1970-01-01T00:00:00Z'))
+                for name in paths[offset:offset + limit]]
+
+    def create_transfer_task(self, elements: list[dict]):
+        """
+        a transfer task between paths of remote_files, whatever the systems. It moves a quarter of its bytes each time the tasks are listed
+        """
+        time.sleep(self.latency)
+        paths = [('/' + element['sourceURI'].split('/', 3)[3], '/' + element['destinationURI'].split('/', 3)[3]) for element in elements]
+        task = types.SimpleNamespace(uuid=str(uuid.uuid4()), status='ACCEPTED', paths=paths, totalTransfers=len(paths), completeTransfers=0,
+                                     estimatedTotalBytes=sum(len(self.remote_files.get(source, b'')) for source, _ in paths),
+                                     totalBytesTransferred=0, errorMessage=None)
+        self.transfer_tasks[task.uuid] = task
+        return task
+
+    def advance_transfer(self, task: types.SimpleNamespace):
+        if task.status in ('COMPLETED', 'FAILED'):
+            return
+        missing = [source for source, _ in task.paths if source not in self.remote_files]
+        if missing:
+            task.status, task.errorMessage = 'FAILED', f"{missing[0]} not found"
+            return
+        task.status = 'IN_PROGRESS'
+        task.totalBytesTransferred = min(task.estimatedTotalBytes, task.totalBytesTransferred + task.estimatedTotalBytes // 4 + 1)
+        task.completeTransfers = task.totalTransfers * task.totalBytesTransferred // max(task.estimatedTotalBytes, 1)
+        if task.totalBytesTransferred == task.estimatedTotalBytes:
+            for source, destination in task.paths:
+                self.remote_files[destination] = self.remote_files[source]
+            task.status, task.completeTransfers = 'COMPLETED', task.totalTransfers
+
+    def get_recent_transfer_tasks(self, limit: int = 1000, offset: int = 0):
+        time.sleep(self.latency)
+        self.transfer_polls += 1
+        for task in self.transfer_tasks.values():
+            self.advance_transfer(task)
+        return list(reversed(self.transfer_tasks.values()))[offset:offset + limit]
+
+    def get_transfer_task(self, transferTaskId: str, includeSummary: bool = False):
+        time.sleep(self.latency)
+        if transferTaskId not in self.transfer_tasks:
+            raise ValueError(f"Transfer task {transferTaskId} not found")
+        return self.transfer_tasks[transferTaskId]
+
+    def get_stat_info(self, systemId: str, path: str):
+        time.sleep(self.latency)
+        if path not in self.remote_files:
+            raise ValueError(f"{path} not found on {systemId}")
+        return types.SimpleNamespace(path=path, size=len(self.remote_files[path]))
+
+    def get_job_status(self, jobUuid: str, **kwargs):
+        time.sleep(self.latency)
+        if jobUuid.startswith('missing'):
+            raise ValueError(f"Job {jobUuid} not found")
+        return {'status':'FINISHED'}
+
+    def get_job_list(self, limit: int = 100, skip: int = 0, **kwargs):
+        """
+        one page of job_count jobs, paged like the jobs service
+        """
+        time.sleep(self.latency)
+        return [types.SimpleNamespace(uuid=f"job-{index}", name=f"stub job {index}", appId='stub-app', appVersion='0.1', execSystemId='stub-system',
+                                      status='FINISHED', owner=self.username, description='a stubbed job ' * 10)
+                for index in range(skip, min(skip + limit, self.job_count))]
+
+
+class StubServer(server.Server):
+    """
+    password grant against the stub: every connection that switches tenant becomes the user named after it
+    """
+    latency = 0.01
+
+    async def password_grant(self, link: str, connection):
+        self.t = StubTapis(f"user-{connection.name}", self.latency)
+        self.username = self.t.username
+        self.url = link
+        return f"Authenticated as {self.username}"
+
+    def refresh_tenant_directory(self):
+        return 0
+
+
+class StressClient(socketOpts.ClientSocketOpts):
+    def __init__(self, name: str, arguments: dict, catalog_hash: str):
+        super().__init__(name)
+        self.name = name
+        self.arguments = arguments
+        self.catalog_hash = catalog_hash
+        self.connection = socket.create_connection(('127.0.0.1', PORT))
+
+    def setup(self):
+        self.negotiate_framing()
+        self.receive()
+        self.send(schemas.ResponseData(request_content={'catalog_hash':self.catalog_hash}))
+        self.send(schemas.ResponseData(request_content={'setup_success':True}))
+
+    def command(self, *tokens: str) -> schemas.ResponseData:
+        parser = catalog.build_parser(self.arguments, lambda args: None, only=list(tokens))
+        self.send(schemas.CommandData(request_content=vars(parser.parse_args(list(tokens)))))
+        response = self.receive()
+        if response.error:
+            raise RuntimeError(response.error)
+        return response
+
+
+def connection_worker(client: StressClient, rounds: int, barrier: threading.Barrier, failures: list):
+    try:
+        client.setup()
+        barrier.wait()
+        username = client.command('switch_tenant_to', 'stub.tapis.io', '--auth', 'password').active_username
+        directory = f"/home/{username}"
+        for index in range(rounds):
+            whoami = client.command('whoami')
+            if whoami.message['message'] != {'username':username} or whoami.active_username != username:
+                failures.append(f"{client.name} is {username} but whoami said {whoami.message['message']}")
+            directory = f"{directory}/{index}" # each cd goes one level deeper, so the path is read as absolute
+            client.command('cd', directory, f"system-{username}")
+            pwd = client.command('pwd')
+            if pwd.message['message'] != directory or pwd.pwd != directory:
+                failures.append(f"{client.name} went to {directory} but pwd said {pwd.message['message']}")
+        client.command('exit')
+    except Exception:
+        failures.append(f"{client.name} failed\n{traceback.format_exc()}")
+    finally:
+        client.connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-c', '--connections', type=int, default=50)
+    parser.add_argument('-r', '--rounds', type=int, default=5)
+    parser.add_argument('-l', '--latency', type=float, default=0.01, help="seconds each stubbed Tapis call blocks for")
+    args = parser.parse_args()
+
+    StubServer.latency = args.latency
+    stub = StubServer('127.0.0.1', PORT)
+    stub.initial = False
+    stub.username, stub.url = 'session', 'tacc.tapis.io'
+    stub.t = StubTapis('session', args.latency)
+    stub.update_credentials(stub.t, stub.username, None)
+    loop = asyncio.new_event_loop()
+    server_thread = threading.Thread(target=loop.run_until_complete, args=(stub.main(),), daemon=True)
+    server_thread.start()
+    time.sleep(0.5)
+
+    failures = []
+    barrier = threading.Barrier(args.connections)
+    clients = [StressClient(f"stress-{index}", stub.argument_catalog, stub.catalog_hash) for index in range(args.connections)]
+    threads = [threading.Thread(target=connection_worker, args=(client, args.rounds, barrier, failures)) for client in clients]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    loop.call_soon_threadsafe(stub.request_shutdown)
+    server_thread.join(timeout=5)
+
+    blocking_calls = args.connections * args.rounds * 2
+    print(f"connections: {args.connections}  rounds: {args.rounds}  commands: {args.connections * (args.rounds * 3 + 2)}")
+    print(f"wall time: {elapsed:.2f} s  (stubbed Tapis time if run one at a time: {blocking_calls * args.latency:.2f} s)")
+    for failure in failures[:10]:
+        print(failure)
+    print(f"{len(failures)} isolation failures")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+A client whose own server is not running must start one, never attach to whatever listens on the shared loopback port. With a foreign
+listener on the TCP port and no socket at this user's path, checks that transport.connect refuses rather than connecting over TCP, that
+the client then starts its own server and connects to it over the unix socket, and that the foreign listener saw no connection. Also
+checks that the server only listens on TCP when it is enabled. No Tapis access is needed:
+    python tests/transport_isolation.py
+"""
+import os
+import sys
+import time
+import socket
+import tempfile
+import threading
+
+from stress_connections import asyncio, StubServer, SRC
+sys.path.insert(0, SRC)
+from TapisCLICICLE.client.cli import CLI
+from TapisCLICICLE.socketopts import transport
+
+PORT = 30002
+
+
+class ForeignListener:
+    """
+    another user's process holding the TCP port, counting the connections it is sent
+    """
+    def __init__(self, port: int):
+        self.sock = socket.create_server(('127.0.0.1', port))
+        self.accepted = 0
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        while True:
+            try:
+                connection, _ = self.sock.accept()
+            except OSError:
+                return
+            self.accepted += 1
+            connection.close()
+
+
+class IsolationClient(CLI):
+    """
+    just the connection setup of the client, starting its server in this process instead of a detached one
+    """
+    def __init__(self, ip: str, port: int):
+        self.ip, self.port = ip, port
+        self.debug = False
+        self.server = None
+
+    def initialize_server(self):
+        self.server = StubServer(self.ip, self.port)
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_until_complete, args=(self.server.main(),), daemon=True).start()
+        return None # no pipe, so the client waits on the ready file
+
+
+def main():
+    os.environ.pop(transport.TCP_VARIABLE, None) # the stress test helpers enable it, this test is about the default
+    os.environ['TAPISCLICICLE_SOCKET'] = os.path.join(tempfile.mkdtemp(), 'server.sock')
+    foreign = ForeignListener(PORT)
+    try:
+        transport.connect('127.0.0.1', PORT)
+    except OSError:
+        pass
+    else:
+        raise AssertionError("connected without a server on this user's socket")
+
+    client = IsolationClient('127.0.0.1', PORT)
+    client.connection_initialization()
+    try:
+        assert client.server is not None, "the client did not start its own server"
+        assert client.connection.connection.family == socket.AF_UNIX, client.connection.connection
+        assert client.server.sock is None, "the server listens on TCP without it being enabled"
+        time.sleep(0.2)
+        assert foreign.accepted == 0, f"the foreign listener got {foreign.accepted} connections"
+    finally:
+        client.connection.close()
+        client.loop.call_soon_threadsafe(client.server.request_shutdown)
+        foreign.sock.close()
+
+    print("missing socket: no TCP fallback, own server started and reached over its unix socket, foreign listener untouched ok")
+
+
+if __name__ == "__main__":
+    main()
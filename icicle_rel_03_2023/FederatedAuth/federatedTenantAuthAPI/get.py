@@ -1,14 +1,102 @@
 import requests
 import json
+import os
+import time
 
 
-def get_client_code(tenant: str) -> str:
+TENANT_AUTH_URL = r"https://raw.githubusercontent.com/sdsc-hpc-training-org/hello_icicle_auth_clients/main/icicle_rel_03_2023/FederatedAuth/tenantAuth.json"
+PACKAGED_TENANT_AUTH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tenantAuth.json")
+CACHE_FILE = os.path.join(os.environ.get("TAPIS_FEDERATED_AUTH_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "TapisFederatedAuthClientAPI")), "tenantAuth.json")
+MAX_AGE = 24 * 60 * 60 # seconds a cached copy is used without asking GitHub
+MISS_RECHECK = 5 * 60 # an unknown tenant triggers at most one revalidation per this many seconds
+REQUEST_TIMEOUT = 5
+
+
+_cached = None
+
+
+def is_offline() -> bool:
+    return os.environ.get("TAPIS_FEDERATED_AUTH_OFFLINE", "").lower() in ("1", "true", "yes")
+
+
+def _read_json(path: str):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(cache: dict):
+    os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+    temporary_file = f"{CACHE_FILE}.tmp"
+    with open(temporary_file, "w") as f:
+        json.dump(cache, f)
+    os.replace(temporary_file, CACHE_FILE)
+
+
+def _load_cache() -> dict:
+    """
+    the on-disk copy, or the snapshot packaged with the library if there is none yet
+    """
+    global _cached
+    if _cached is None:
+        _cached = _read_json(CACHE_FILE)
+    if not _cached or "clients" not in _cached:
+        _cached = {"clients":_read_json(PACKAGED_TENANT_AUTH) or dict(), "etag":None, "last_modified":None, "checked_at":0}
+    return _cached
+
+
+def _revalidate(cache: dict) -> dict:
+    """
+    conditional GET against GitHub. A 304 only bumps the check time, any failure keeps the copy we already have
+    """
+    global _cached
+    headers = dict()
+    if cache.get("etag"):
+        headers["If-None-Match"] = cache["etag"]
+    if cache.get("last_modified"):
+        headers["If-Modified-Since"] = cache["last_modified"]
+    try:
+        response = requests.get(TENANT_AUTH_URL, headers=headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code == 304:
+            cache = dict(cache, checked_at=time.time())
+        elif response.status_code == 200:
+            cache = {"clients":json.loads(response.content),
+                     "etag":response.headers.get("ETag"),
+                     "last_modified":response.headers.get("Last-Modified"),
+                     "checked_at":time.time()}
+        else:
+            return cache
+    except (requests.RequestException, ValueError):
+        return cache
+    _cached = cache
+    try:
+        _write_cache(cache)
+    except OSError:
+        pass
+    return cache
+
+
+def get_client_map(offline: bool = False, refresh: bool = False) -> dict:
+    """
+    Retrieve the full tenant to client ID map. The cached copy is only
+    revalidated once it is older than MAX_AGE, and never when offline
+    """
+    cache = _load_cache()
+    if not (offline or is_offline()) and (refresh or time.time() - cache["checked_at"] > MAX_AGE):
+        cache = _revalidate(cache)
+    return cache["clients"]
+
+
+def get_client_code(tenant: str, offline: bool = False) -> str:
     """
     Retrieve a Tapis tenant's corresponding client ID 
     for federated authentication
     """
-    tenant_client_json = requests.get(r"https://raw.githubusercontent.com/sdsc-hpc-training-org/hello_icicle_auth_clients/main/icicle_rel_03_2023/FederatedAuth/tenantAuth.json")
-    client_data = json.loads(tenant_client_json.content)
+    client_data = get_client_map(offline=offline)
+    if tenant not in client_data and not (offline or is_offline()) and time.time() - _load_cache()["checked_at"] > MISS_RECHECK:
+        client_data = get_client_map(refresh=True) # the tenant may have been added since we last checked
     try:
         return client_data[tenant]
     except KeyError:
@@ -16,4 +104,4 @@ def get_client_code(tenant: str) -> str:
 
 
 if __name__ == "__main__":
-    print(get_client_code("icicle.tapis.io"))
\ No newline at end of file
+    print(get_client_code("icicle.tapis.io"))
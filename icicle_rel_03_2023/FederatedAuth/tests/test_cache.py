@@ -0,0 +1,65 @@
+import os
+import json
+import time
+import tempfile
+import unittest
+from unittest import mock
+
+from federatedTenantAuthAPI import get
+
+
+class FakeResponse:
+    def __init__(self, status_code, clients=None, headers=None):
+        self.status_code = status_code
+        self.content = json.dumps(clients or dict()).encode()
+        self.headers = headers or dict()
+
+
+class ClientCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.patches = [mock.patch.object(get, "CACHE_FILE", os.path.join(self.directory.name, "tenantAuth.json")),
+                        mock.patch.object(get, "_cached", None),
+                        mock.patch.dict(os.environ, {"TAPIS_FEDERATED_AUTH_OFFLINE":""})]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        self.directory.cleanup()
+
+    def test_warm_cache_costs_no_network(self):
+        response = FakeResponse(200, {"icicle.tapis.io":"abc"}, {"ETag":'"v1"'})
+        with mock.patch.object(get.requests, "get", return_value=response) as request:
+            self.assertEqual(get.get_client_code("icicle.tapis.io"), "abc")
+        self.assertEqual(request.call_count, 1)
+        get._cached = None # force a reload from disk, as a new process would
+        with mock.patch.object(get.requests, "get", side_effect=AssertionError("network used on a warm cache")) as request:
+            for _ in range(10):
+                self.assertEqual(get.get_client_code("icicle.tapis.io"), "abc")
+        request.assert_not_called()
+
+    def test_stale_cache_revalidates_with_etag(self):
+        with mock.patch.object(get.requests, "get", return_value=FakeResponse(200, {"icicle.tapis.io":"abc"}, {"ETag":'"v1"'})):
+            get.get_client_code("icicle.tapis.io")
+        get._cached["checked_at"] = time.time() - get.MAX_AGE - 1
+        with mock.patch.object(get.requests, "get", return_value=FakeResponse(304)) as request:
+            self.assertEqual(get.get_client_code("icicle.tapis.io"), "abc")
+        self.assertEqual(request.call_args.kwargs["headers"]["If-None-Match"], '"v1"')
+        self.assertGreater(get._cached["checked_at"], time.time() - 5)
+
+    def test_network_failure_falls_back_to_packaged_map(self):
+        with mock.patch.object(get.requests, "get", side_effect=get.requests.ConnectionError()):
+            self.assertEqual(get.get_client_code("icicle.tapis.io"), get._read_json(get.PACKAGED_TENANT_AUTH)["icicle.tapis.io"])
+
+    def test_offline_mode_never_touches_network(self):
+        with mock.patch.dict(os.environ, {"TAPIS_FEDERATED_AUTH_OFFLINE":"1"}):
+            with mock.patch.object(get.requests, "get") as request:
+                self.assertIsNotNone(get.get_client_code("icicle.tapis.io"))
+                self.assertIsNone(get.get_client_code("unknown.tapis.io"))
+        request.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()